@@ -0,0 +1,776 @@
+# -*- coding: utf-8 -*-
+"""
+OBJECTIVE:
+    Check and measure the performance of Launch_me_to_get_FRP.py without connecting to the LSA SAF repository.
+    Synthetic full-disk products (LSA-509_MTG_MTFRPPIXEL-ListProduct_MTG-FD_*.csv.gz) are generated and served
+    by a local mock of the repository, that can answer late (404), slowly (latency) or reject the credentials (401).
+
+EXAMPLES:
+
+    run Launch_me_to_benchmark_FRP.py --pixels 50000 --aois 1 10 40 100 --scenarios index
+        This example builds a synthetic full-disk product with 50000 active pixels, checks that the spatial index
+        returns exactly the same pixels than the mask filter over the full disk, and measures the time of both
+        methods for 1, 10, 40 and 100 areas of interest, and with polygons of 2000 vertices (--vertices) inside them.
+
+    run Launch_me_to_benchmark_FRP.py --profile outbreak --timesteps 36 --fires 20 --latency 0.05 --not-available 0.2
+        This example runs the single-fire, multi-fire (20 fires) and backfill scenarios over 6 hours (36 timesteps)
+        of products with a major outbreak (200000 pixels each), served with 50 ms of latency and with 20% of the
+        products not available at the first request. It reports the time of every stage (download, parse, save),
+        the peak memory and the end-to-end throughput.
+
+    run Launch_me_to_benchmark_FRP.py --profile outbreak --scenarios clusters
+        This example groups the 200000 pixels of a full-disk product with a major outbreak into fires, and tracks
+        them into the next timestep, measuring the time of both steps.
+
+    run Launch_me_to_benchmark_FRP.py --profile outbreak --timesteps 144 --scenarios reprocess --workers 1 8 16 32
+        This example reads one day (144 timesteps) of products with a major outbreak as --reprocess does, with 1, 8,
+        16 and 32 processes, and reports the throughput and the speed-up over one process.
+
+    run Launch_me_to_benchmark_FRP.py --profile outbreak --timesteps 36 --latency 0.5 --scenarios pipeline --prefetch 0 1 2 4
+        This example catches up 6 hours of products with a major outbreak, served with 500 ms of latency, through the
+        whole loop (download, read, save) with the stages one after the other (--prefetch 0) and overlapped in a
+        pipeline with 1, 2 and 4 timesteps between them, and reports the throughput and the speed-up.
+"""
+
+# %% IMPORT THE LIBRARIES
+
+from datetime import datetime as datetime
+from datetime import timedelta as timedelta
+from datetime import timezone as timezone
+from pathlib import Path as Path
+
+import argparse as argparse
+import base64 as base64
+import contextlib as contextlib
+import http.server as http_server
+import numpy as np
+import os as os
+import pandas as pd
+import random as random
+import re as re
+import tempfile as tempfile
+import threading as threading
+import time as time
+import tracemalloc as tracemalloc
+
+import Launch_me_to_get_FRP as frp_tool
+
+
+# %% DEFINE THE CONSTANTS
+
+# Active pixels per full-disk product
+PROFILES = {
+    "winter": 2000,      # Quiet winter day
+    "summer": 20000,     # Usual summer day
+    "outbreak": 200000,  # Major outbreak (e.g. Africa in the dry season)
+}
+
+# Credentials accepted by the mock repository
+MOCK_CREDENTIALS = ("benchmark", "benchmark")
+
+
+# %% DEFINE THE ANCILLARY FUNCTIONS
+
+def f_parser():
+    # Get the arguments from the console
+    print(f"         Running: {f_parser.__name__}()")
+
+    parser = argparse.ArgumentParser(
+        description="Check and measure the performance of Launch_me_to_get_FRP.py offline."
+    )
+
+    parser.add_argument(
+        "--scenarios",
+        type=str,
+        nargs="+",
+        choices=["index", "clusters", "single", "multi", "backfill", "reprocess", "pipeline"],
+        required=False,
+        default=["index", "clusters", "single", "multi", "backfill"],
+        help="Scenarios to run (default: index clusters single multi backfill)"
+    )
+
+    parser.add_argument(
+        "--profile",
+        type=str,
+        choices=sorted(PROFILES),
+        required=False,
+        default="summer",
+        help=f"Active pixels per product: {', '.join(f'{k} ({v})' for k, v in PROFILES.items())} (default: summer)"
+    )
+
+    parser.add_argument(
+        "--pixels",
+        type=int,
+        required=False,
+        default=None,
+        help="Active pixels per product (overrides --profile)"
+    )
+
+    parser.add_argument(
+        "--aois",
+        type=int,
+        nargs="+",
+        required=False,
+        default=[1, 10, 40, 100],
+        help="Numbers of areas of interest to benchmark in the index scenario (default: 1 10 40 100)"
+    )
+
+    parser.add_argument(
+        "--vertices",
+        type=int,
+        required=False,
+        default=2000,
+        help="Vertices of the polygons of the areas of interest in the index scenario (default: 2000)"
+    )
+
+    parser.add_argument(
+        "--timesteps",
+        type=int,
+        required=False,
+        default=36,
+        help="Timesteps (products) of the single-fire, multi-fire and backfill scenarios (default: 36)"
+    )
+
+    parser.add_argument(
+        "--fires",
+        type=int,
+        required=False,
+        default=20,
+        help="Fires of the multi-fire scenario (default: 20)"
+    )
+
+    parser.add_argument(
+        "--max-workers",
+        dest="max_workers",
+        type=int,
+        required=False,
+        default=4,
+        help="Simultaneous downloads of the backfill scenario (default: 4)"
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        required=False,
+        default=sorted({1, os.cpu_count() or 1}),
+        help=f"Processes of the reprocess scenario, measured one after the other (default: 1 and the number of cores, {os.cpu_count() or 1} here)"
+    )
+
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        nargs="+",
+        required=False,
+        default=[0, 2],
+        help="Timesteps prefetched between the stages of the pipeline scenario, measured one after the other (default: 0 2)"
+    )
+
+    parser.add_argument(
+        "--latency",
+        type=float,
+        required=False,
+        default=0.0,
+        help="Seconds that the mock repository waits before answering every request (default: 0)"
+    )
+
+    parser.add_argument(
+        "--not-available",
+        dest="not_available",
+        type=float,
+        required=False,
+        default=0.0,
+        help="Fraction of products that are not available (404) at the first request (default: 0)"
+    )
+
+    parser.add_argument(
+        "--rate-limit",
+        dest="rate_limit",
+        type=float,
+        required=False,
+        default=0.0,
+        help="Requests per second allowed by the rate limiter of the tool (default: 0, no limit)"
+    )
+
+    parser.add_argument(
+        "--interrupted",
+        type=float,
+        required=False,
+        default=0.0,
+        help="Fraction of downloads that the mock repository interrupts in the middle of the transfer (default: 0)"
+    )
+
+    parser.add_argument(
+        "--auth-failures",
+        dest="auth_failures",
+        type=float,
+        required=False,
+        default=0.0,
+        help="Fraction of requests rejected by the mock repository as unauthorized (401) (default: 0)"
+    )
+
+    parser.add_argument(
+        "--repetitions",
+        type=int,
+        required=False,
+        default=5,
+        help="Repetitions of every measure of the index scenario (the best one is reported) (default: 5)"
+    )
+
+    parser.add_argument(
+        "--seed",
+        type=int,
+        required=False,
+        default=379,
+        help="Seed of the random generator (default: 379)"
+    )
+
+    args = parser.parse_args()
+    return args
+
+
+def f_synthetic_product(number_of_pixels, seed, timestep=0):
+    # Build a synthetic full-disk product {column: array}: active pixels grouped in fires over
+    # Europe, Africa and South America, with float32 coordinates and FRP (as in the columnar cache).
+    # The fires depend only on the seed, and their pixels also on the timestep, so consecutive
+    # timesteps of the same seed have the same fires burning in different pixels
+    print(f"         Running: {f_synthetic_product.__name__}()")
+
+    rng = np.random.default_rng(seed)
+
+    # Centres of the fires inside the MTG disk
+    number_of_fires = max(1, number_of_pixels // 50)
+    fire_lat = rng.uniform(-35, 60, number_of_fires)
+    fire_lon = rng.uniform(-75, 50, number_of_fires)
+
+    # Pixels around the centres (~1 km pixels, fires of a few km)
+    rng = np.random.default_rng([seed, timestep])
+    fire = rng.integers(0, number_of_fires, number_of_pixels)
+    product = {
+        "LATITUDE": (fire_lat[fire] + rng.normal(0, 0.03, number_of_pixels)).astype(np.float32),
+        "LONGITUDE": (fire_lon[fire] + rng.normal(0, 0.03, number_of_pixels)).astype(np.float32),
+        "FRP": rng.lognormal(3, 1, number_of_pixels).astype(np.float32),
+    }
+
+    return product
+
+
+def f_write_synthetic_product(route, acquisition_time, number_of_pixels, seed):
+    # Write a synthetic full-disk product as the repository provides it (compressed csv, named after its acquisition time)
+    product = f_synthetic_product(number_of_pixels, seed)
+    rng = np.random.default_rng(seed)
+
+    frp = pd.DataFrame(product)
+    frp["FRP_UNCERTAINTY"] = (frp["FRP"] * rng.uniform(0.05, 0.3, number_of_pixels)).astype(np.float32)
+    frp["PIXEL_SIZE"] = rng.uniform(0.9, 3.5, number_of_pixels).astype(np.float32)
+    frp["CONFIDENCE"] = rng.integers(1, 4, number_of_pixels)
+    frp["ACQTIME"] = acquisition_time.strftime("%Y%m%d%H%M%S")
+
+    _, filename = frp_tool.f_define_the_filename(acquisition_time)
+    frp.to_csv(os.path.join(route, filename), index=False, compression="gzip")
+
+    return filename
+
+
+def f_start_mock_repository(route, latency=0.0, not_available=0.0, auth_failures=0.0, seed=379, interrupted=0.0):
+    """
+    Serve the products of a directory as the LSA SAF repository does (any path ending with the
+    filename, HTTP basic authentication, GET, HEAD and Range requests, and listings of the day
+    directories for any path ending with /), with injectable failures.
+
+    Returns
+    -------
+    server : ThreadingHTTPServer
+        The server (running in a thread). server.url is its address and server.counters
+        counts the answers by status code.
+    """
+    print(f"         Running: {f_start_mock_repository.__name__}()")
+
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    expected_auth = "Basic " + base64.b64encode(":".join(MOCK_CREDENTIALS).encode()).decode()
+    late = {name for name in os.listdir(route) if rng.random() < not_available} # 404 at the first request
+    counters = {}
+
+    class MockRepositoryHandler(http_server.BaseHTTPRequestHandler):
+
+        def log_message(self, *args):
+            pass
+
+        def f_answer(self, send_body):
+            time.sleep(latency)
+            filename = self.path.rstrip("/").rsplit("/", 1)[-1]
+            route_to_file = os.path.join(route, filename)
+
+            with lock:
+                if self.headers.get("Authorization") != expected_auth or rng.random() < auth_failures:
+                    status_code = 401
+                elif self.path.endswith("/"): # Listing of a day directory
+                    status_code = "listing"
+                elif not os.path.isfile(route_to_file):
+                    status_code = 404
+                elif filename in late:
+                    late.discard(filename)
+                    status_code = 404
+                else:
+                    status_code = 200
+                counters[status_code] = counters.get(status_code, 0) + 1
+
+            if status_code == "listing":
+                day = "".join(self.path.rstrip("/").rsplit("/", 3)[-3:])
+                names = sorted(name for name in os.listdir(route) if day in name)
+                content = "".join(f'<a href="{name}">{name}</a>\n' for name in names).encode()
+                self.send_response(200 if names else 404)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(content)
+                return
+
+            if status_code != 200:
+                self.send_response(status_code)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            with open(route_to_file, "rb") as f:
+                content = f.read()
+
+            # Resume from the requested byte (Range: bytes=N-)
+            start = re.match(r"bytes=(\d+)-$", self.headers.get("Range", ""))
+            start = int(start.group(1)) if start else None
+            if start is not None:
+                with lock:
+                    counters[200] -= 1
+                    status_code = 416 if start >= len(content) else 206
+                    counters[status_code] = counters.get(status_code, 0) + 1
+
+            if status_code == 416:
+                self.send_response(416)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            elif status_code == 206:
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{len(content) - 1}/{len(content)}")
+                content = content[start:]
+            else:
+                self.send_response(200)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+
+            if not send_body:
+                return
+            with lock:
+                cut = len(content) > 1 and rng.random() < interrupted
+                if cut:
+                    counters["interrupted"] = counters.get("interrupted", 0) + 1
+            if cut: # The connection is closed in the middle of the transfer
+                self.wfile.write(content[:len(content) // 2])
+                self.close_connection = True
+                return
+            self.wfile.write(content)
+
+        def do_GET(self):
+            self.f_answer(send_body=True)
+
+        def do_HEAD(self):
+            self.f_answer(send_body=False)
+
+    server = http_server.ThreadingHTTPServer(("127.0.0.1", 0), MockRepositoryHandler)
+    server.daemon_threads = True
+    server.url = f"http://127.0.0.1:{server.server_port}"
+    server.counters = counters
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
+def f_define_the_directories(route):
+    # Same directories than Launch_me_to_get_FRP.py, inside a temporary directory
+    print(f"         Running: {f_define_the_directories.__name__}()")
+
+    route = Path(route)
+    directories = {
+        "General": route,
+        "Ancillary": route / "Ancillary",
+        "Outputs": route / "Outputs",
+        "Raw_data": route / "Outputs" / "Raw_data",
+        "Columnar": route / "Outputs" / "Raw_data_columnar",
+        "Repository": route / "Repository",
+    }
+    for directory_path in directories.values():
+        directory_path.mkdir(parents=True, exist_ok=True)
+
+    return directories
+
+
+def f_random_aois(number_of_aois, product, seed):
+    # Build areas of interest of 0.1°-2° centred on random pixels of the product (so that they are not empty)
+    print(f"         Running: {f_random_aois.__name__}()")
+
+    rng = np.random.default_rng(seed)
+
+    pixels = rng.integers(0, len(product["LATITUDE"]), number_of_aois)
+    half_size = rng.uniform(0.05, 1, number_of_aois)
+
+    aois = []
+    for i, (pixel, half) in enumerate(zip(pixels, half_size)):
+        lat = float(product["LATITUDE"][pixel])
+        lon = float(product["LONGITUDE"][pixel])
+        aois.append({"name": f"aoi_{i}", "bbox": [lon - half, lat - half, lon + half, lat + half]})
+
+    return aois
+
+
+def f_random_polygons(aois, number_of_vertices, seed):
+    # Add to every area of interest a star-shaped polygon inscribed in its bbox, with many vertices
+    # (as a real perimeter), loaded and prepared as Launch_me_to_get_FRP.py does
+    print(f"         Running: {f_random_polygons.__name__}()")
+
+    rng = np.random.default_rng(seed)
+
+    polygons = []
+    for aoi in aois:
+        W, S, E, N = aoi["bbox"]
+        angles = np.sort(rng.uniform(0, 2 * np.pi, number_of_vertices))
+        radius = rng.uniform(0.4, 1, number_of_vertices)
+        lon = (W + E) / 2 + radius * (E - W) / 2 * np.cos(angles)
+        lat = (S + N) / 2 + radius * (N - S) / 2 * np.sin(angles)
+        wkt = "POLYGON ((" + ", ".join(f"{x} {y}" for x, y in zip(lon, lat)) + f", {lon[0]} {lat[0]}))"
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            geometry, bbox = frp_tool.f_load_polygon(wkt)
+        polygons.append({"name": aoi["name"], "bbox": bbox, "polygon": geometry})
+
+    return polygons
+
+
+def f_mask_filter(product, lonlat_bbox):
+    # Reference: filter the full disk with four boolean masks (as f_get_frp used to do)
+    lon = product["LONGITUDE"]
+    lat = product["LATITUDE"]
+    W, S, E, N = np.array(lonlat_bbox, dtype=lat.dtype)
+
+    return np.flatnonzero((lon >= W) & (lon <= E) & (lat >= S) & (lat <= N))
+
+
+def f_check_spatial_index(product, aois, polygons=()):
+    # Check that the spatial index returns exactly the same pixels than the mask filter
+    # (and than the polygon over the full disk, for the areas of interest with a polygon)
+    print(f"         Running: {f_check_spatial_index.__name__}()")
+
+    import shapely as shapely
+
+    index = frp_tool.f_build_spatial_index(product)
+
+    for aoi in aois:
+        expected = f_mask_filter(product, aoi["bbox"])
+        obtained = frp_tool.f_query_bbox(index, aoi["bbox"])
+        if not np.array_equal(expected, obtained):
+            raise AssertionError(f"          - The spatial index does not match the mask filter for {aoi['name']}")
+
+    # Pixels just on the limits of the bbox are inside (as in the mask filter)
+    pixel = 0
+    lat = float(product["LATITUDE"][pixel])
+    lon = float(product["LONGITUDE"][pixel])
+    edges = [[lon, lat, lon, lat], [lon - 1, lat, lon, lat + 1], [lon, lat - 1, lon + 1, lat]]
+    for lonlat_bbox in edges:
+        if not np.array_equal(f_mask_filter(product, lonlat_bbox), frp_tool.f_query_bbox(index, lonlat_bbox)):
+            raise AssertionError(f"          - The spatial index does not match the mask filter for {lonlat_bbox}")
+
+    for aoi in polygons:
+        expected = np.flatnonzero(shapely.intersects_xy(aoi["polygon"], product["LONGITUDE"], product["LATITUDE"]))
+        obtained = frp_tool.f_query_aoi(index, product, aoi)
+        if not np.array_equal(expected, obtained):
+            raise AssertionError(f"          - The spatial index does not match the polygon of {aoi['name']}")
+
+    print(f"          - OK: the spatial index matches the mask filter in {len(aois) + len(edges)} bboxes"
+          f" and the polygons over the full disk in {len(polygons)} polygons")
+
+
+def f_best_time(function, repetitions):
+    # Run a function several times and return the best time (in seconds)
+    times = []
+    for _ in range(repetitions):
+        time_start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - time_start)
+
+    return min(times)
+
+
+def f_benchmark_spatial_index(product, numbers_of_aois, number_of_vertices, repetitions, seed):
+    # Measure the time to query the areas of interest with the mask filter and with the spatial index,
+    # and with the spatial index plus polygons (of number_of_vertices vertices) inscribed in the bboxes
+    print(f"         Running: {f_benchmark_spatial_index.__name__}()")
+
+    time_index = f_best_time(lambda: frp_tool.f_build_spatial_index(product), repetitions)
+    print(f"          - Pixels: {len(product['LATITUDE'])}. Time to build the index: {time_index*1e3:.2f} ms")
+    print(f"          - AOIs | Mask filter (ms) | Spatial index (ms) | Speed-up | Polygons of {number_of_vertices} vertices (ms)")
+
+    for number_of_aois in numbers_of_aois:
+        aois = f_random_aois(number_of_aois, product, seed)
+        polygons = f_random_polygons(aois, number_of_vertices, seed)
+        index = frp_tool.f_build_spatial_index(product)
+
+        time_mask = f_best_time(lambda: [f_mask_filter(product, aoi["bbox"]) for aoi in aois], repetitions)
+        time_query = f_best_time(lambda: [frp_tool.f_query_bbox(index, aoi["bbox"]) for aoi in aois], repetitions)
+        time_polygons = f_best_time(lambda: [frp_tool.f_query_aoi(index, product, aoi) for aoi in polygons], repetitions)
+
+        print(f"          - {number_of_aois:>4} | {time_mask*1e3:>16.2f} | {time_query*1e3:>18.2f} | "
+              f"{time_mask/max(time_query, 1e-9):>7.1f}x | {time_polygons*1e3:>10.2f}")
+
+
+def f_benchmark_clusters(product, repetitions, seed):
+    # Measure the time to group the pixels of the full disk into fires and to track them into the next timestep
+    print(f"         Running: {f_benchmark_clusters.__name__}()")
+
+    acquisition_time = datetime(2025, 8, 15, 12, 0, tzinfo=timezone.utc)
+    next_product = f_synthetic_product(len(product["LATITUDE"]), seed, timestep=1) # Next timestep: the same fires go on
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        time_cluster = f_best_time(lambda: frp_tool.f_cluster_pixels(product["LATITUDE"], product["LONGITUDE"], product["FRP"]), repetitions)
+
+        tracker = frp_tool.f_open_tracker()
+        _, clusters = frp_tool.f_cluster_pixels(product["LATITUDE"], product["LONGITUDE"], product["FRP"])
+        names = frp_tool.f_track_clusters(tracker, clusters, acquisition_time)
+        _, next_clusters = frp_tool.f_cluster_pixels(next_product["LATITUDE"], next_product["LONGITUDE"], next_product["FRP"])
+
+        time_start = time.perf_counter()
+        next_names = frp_tool.f_track_clusters(tracker, next_clusters, acquisition_time + timedelta(minutes=10))
+        time_track = time.perf_counter() - time_start
+
+    print(f"          - Pixels: {len(product['LATITUDE'])}. Fires: {len(names)}")
+    print(f"          - Time to group the full disk into fires: {time_cluster*1e3:.1f} ms")
+    print(f"          - Time to track them into the next timestep: {time_track*1e3:.1f} ms "
+          f"({np.isin(next_names, names).mean()*100:.1f}% of the fires continued)")
+
+
+def f_benchmark_reprocess(timesteps, aois, directories, numbers_of_workers):
+    # Measure the reprocessing of the downloaded products (--reprocess) with every number of processes,
+    # and its speed-up over the first one. The results are consumed in order, as Launch_me_to_get_FRP.py saves them
+    print(f"         Running: {f_benchmark_reprocess.__name__}()")
+
+    print(f"          - Scenario: reprocess ({len(timesteps)} timesteps, {len(aois)} areas of interest)")
+    # The generated products are read where they are, as if they had been downloaded
+    directories = {**directories, "Raw_data": directories["Repository"]}
+
+    time_reference = None
+    for workers in numbers_of_workers:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            time_start = time.perf_counter()
+            for acquisition_time, results, pixels in frp_tool.f_reprocess(timesteps, directories, aois, workers):
+                pass
+            elapsed = time.perf_counter() - time_start
+        time_reference = time_reference or elapsed
+        print(f"            {workers:>3} processes  {elapsed:8.2f} s  ({len(timesteps)/elapsed:7.2f} timesteps/s, "
+              f"speed-up: {time_reference/elapsed:5.2f}x)")
+
+
+def f_benchmark_pipeline(timesteps, aois, directories, args):
+    # Measure the whole loop (download, read, save) of the library (f_iter_timesteps) against the mock repository
+    # with every prefetch depth, and its speed-up over the first one. Every depth starts without downloaded products
+    print(f"         Running: {f_benchmark_pipeline.__name__}()")
+
+    print(f"          - Scenario: pipeline ({len(timesteps)} timesteps, {len(aois)} areas of interest)")
+
+    time_reference = None
+    for prefetch in args.prefetch:
+        with tempfile.TemporaryDirectory() as route_scenario:
+            directories_scenario = f_define_the_directories(route_scenario)
+            server = f_start_mock_repository(directories["Repository"], args.latency, args.not_available,
+                                             args.auth_failures, args.seed, args.interrupted)
+            frp_tool.LSASAF_URL = server.url
+
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                frp_client = frp_tool.f_open_frp_client(directories_scenario, MOCK_CREDENTIALS, waiting_time=1,
+                                                        rate_limit=args.rate_limit, account_cooldown=0)
+                stores = {aoi["name"]: frp_tool.f_open_store(directories_scenario["Outputs"], aoi["name"]) for aoi in aois}
+
+                # A timestep that cannot be downloaded (e.g. 401 from the repository) stops the iteration: it is
+                # counted as an error, and the iteration goes on from the next timestep
+                time_start = time.perf_counter()
+                processed = 0
+                errors = 0
+                done = set()
+                while True:
+                    try:
+                        for dt, results, _ in frp_tool.f_iter_timesteps(frp_client, aois, timesteps[0], timesteps[-1] + timedelta(minutes=10),
+                                                                        processed=done, prefetch=prefetch):
+                            for aoi_name, (number_of_pixels, frp) in results.items():
+                                frp_tool.f_save_frp(stores[aoi_name], dt, frp, number_of_pixels)
+                            done.add(dt)
+                            processed += 1
+                        break
+                    except RuntimeError:
+                        errors += 1
+                        done.add(min(dt for dt in timesteps if dt not in done))
+                elapsed = time.perf_counter() - time_start
+
+                for store in stores.values():
+                    frp_tool.f_close_store(store)
+                frp_tool.f_close_frp_client(frp_client)
+
+            server.shutdown()
+            server.server_close()
+
+        time_reference = time_reference or elapsed
+        print(f"            prefetch {prefetch:>2}  {elapsed:8.2f} s  ({processed/elapsed:7.2f} timesteps/s, "
+              f"speed-up: {time_reference/elapsed:5.2f}x)")
+        if errors:
+            print(f"            Errors: {errors} timesteps could not be downloaded")
+
+
+def f_run_scenario(name, timesteps, aois, directories, client, max_workers=None):
+    # Run the loop of Launch_me_to_get_FRP.py (download, parse, save) over the timesteps, against the mock repository,
+    # measuring every stage, the peak memory and the end-to-end throughput.
+    # If max_workers is defined, the products are downloaded in parallel first (backfill)
+    print(f"         Running: {f_run_scenario.__name__}()")
+
+    timings = {"download": 0.0, "parse": 0.0, "save": 0.0}
+    errors = 0
+
+    tracemalloc.start()
+    time_start = time.perf_counter()
+
+    # The output of the tool is not shown (it would be the bottleneck)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+
+        latency = frp_tool.f_load_latency(directories)
+        cache = frp_tool.f_open_columnar_cache(directories)
+        stores = {aoi["name"]: frp_tool.f_open_store(directories["Outputs"], aoi["name"]) for aoi in aois}
+
+        listings = frp_tool.f_open_listings()
+
+        if max_workers is not None:
+            time_stage = time.perf_counter()
+            frp_tool.f_backfill(timesteps, directories, max_workers, client, listings=listings)
+            timings["download"] += time.perf_counter() - time_stage
+
+        for dt in timesteps:
+            link_to_download_file, filename = frp_tool.f_define_the_filename(dt)
+
+            time_stage = time.perf_counter()
+            try:
+                available = frp_tool.f_call_to_lsasaf(link_to_download_file, filename, directories, None, 1, client, dt,
+                                                      latency, listings=listings)
+            except RuntimeError:
+                available = False # e.g. 401 from the repository
+            timings["download"] += time.perf_counter() - time_stage
+            if not available:
+                errors += 1
+                continue
+
+            time_stage = time.perf_counter()
+            results = frp_tool.f_get_frp_aois(directories["Raw_data"], filename, aois, cache)
+            timings["parse"] += time.perf_counter() - time_stage
+
+            time_stage = time.perf_counter()
+            for aoi_name, (number_of_pixels, frp) in results.items():
+                frp_tool.f_save_frp(stores[aoi_name], dt, frp, number_of_pixels)
+            timings["save"] += time.perf_counter() - time_stage
+
+        for store in stores.values():
+            frp_tool.f_close_store(store)
+
+    elapsed = time.perf_counter() - time_start
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    downloaded = sum(entry.stat().st_size for entry in os.scandir(directories["Raw_data"]) if entry.is_file())
+    processed = len(timesteps) - errors
+
+    print(f"          - Scenario: {name} ({len(timesteps)} timesteps, {len(aois)} areas of interest)")
+    for stage, seconds in timings.items():
+        print(f"            {stage:<10} {seconds:>8.2f} s  ({seconds/max(len(timesteps), 1)*1e3:>8.1f} ms/timestep)")
+    print(f"            {'total':<10} {elapsed:>8.2f} s")
+    print(f"            Peak memory (Python heap): {peak_memory/1e6:.1f} MB")
+    print(f"            Throughput: {processed/elapsed:.2f} timesteps/s, {downloaded/1e6/elapsed:.2f} MB/s")
+    if errors:
+        print(f"            Errors: {errors} timesteps could not be downloaded")
+
+    return {"timings": timings, "elapsed": elapsed, "peak_memory": peak_memory, "errors": errors}
+
+
+# %% DEFINE THE MAIN FUNCTION
+def main():
+
+    # Get the arguments
+    args = f_parser()
+    number_of_pixels = args.pixels if args.pixels is not None else PROFILES[args.profile]
+
+    # Check and measure the spatial index against the mask filter
+    if "index" in args.scenarios:
+        product = f_synthetic_product(number_of_pixels, args.seed)
+        aois = f_random_aois(max(args.aois), product, args.seed)
+        f_check_spatial_index(product, aois, f_random_polygons(aois[:10], args.vertices, args.seed))
+        f_benchmark_spatial_index(product, args.aois, args.vertices, args.repetitions, args.seed)
+
+    # Measure the clustering and the tracking of the fires over the full disk
+    if "clusters" in args.scenarios:
+        product = f_synthetic_product(number_of_pixels, args.seed)
+        f_benchmark_clusters(product, args.repetitions, args.seed)
+
+    scenarios = [scenario for scenario in args.scenarios if scenario not in ("index", "clusters")]
+    if not scenarios:
+        return
+
+    # Retries against the mock repository do not need to wait as against the real one
+    frp_tool.PROBE_BACKOFF = 0.05
+
+    with tempfile.TemporaryDirectory() as route:
+        directories = f_define_the_directories(route)
+
+        # Generate the products (one per timestep) and serve them
+        print(f"          - Generating {args.timesteps} products with {number_of_pixels} pixels each")
+        start_time = datetime(2025, 8, 15, 12, 0, tzinfo=timezone.utc)
+        timesteps = [start_time + timedelta(minutes=10 * i) for i in range(args.timesteps)]
+        for i, dt in enumerate(timesteps):
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                f_write_synthetic_product(directories["Repository"], dt, number_of_pixels, args.seed + i)
+
+        sample = f_synthetic_product(number_of_pixels, args.seed)
+        fires = f_random_aois(args.fires, sample, args.seed)
+
+        # Measure the reprocessing of the products with a pool of processes
+        if "reprocess" in scenarios:
+            f_benchmark_reprocess(timesteps, fires, directories, args.workers)
+
+        # Measure the whole loop with every prefetch depth of the pipeline
+        if "pipeline" in scenarios:
+            f_benchmark_pipeline(timesteps, fires, directories, args)
+
+        for scenario in [scenario for scenario in scenarios if scenario not in ("reprocess", "pipeline")]:
+            # Every scenario starts without downloaded products, caches nor results
+            with tempfile.TemporaryDirectory() as route_scenario:
+                directories_scenario = f_define_the_directories(route_scenario)
+                server = f_start_mock_repository(directories["Repository"], args.latency, args.not_available,
+                                                 args.auth_failures, args.seed, args.interrupted)
+                frp_tool.LSASAF_URL = server.url
+                limiter = frp_tool.f_open_rate_limiter(directories_scenario, args.rate_limit) if args.rate_limit > 0 else None
+                client = frp_tool.f_open_session(credentials=MOCK_CREDENTIALS, limiter=limiter, cooldown=0)
+
+                if scenario == "single":
+                    f_run_scenario("single-fire", timesteps, fires[:1], directories_scenario, client)
+                elif scenario == "multi":
+                    f_run_scenario("multi-fire", timesteps, fires, directories_scenario, client)
+                elif scenario == "backfill":
+                    f_run_scenario("backfill", timesteps, fires[:1], directories_scenario, client, args.max_workers)
+
+                print(f"            Answers of the repository: {dict(sorted(server.counters.items(), key=lambda item: str(item[0])))}")
+                frp_tool.f_close_session(client)
+                if limiter is not None:
+                    print(f"            Waited {limiter['waited']:.2f} s for the rate limit")
+                    limiter["connection"].close()
+                server.shutdown()
+                server.server_close()
+
+    # Endscript
+    print()
+    print("         Endscript")
+
+
+# %% RING BELL
+if __name__ == "__main__":
+
+    main()
@@ -1,5 +1,4 @@
 # -*- coding: utf-8 -*-
-print(
 """
 TRACKING:
     https://doi.org/10.5281/zenodo.18681165
@@ -24,14 +23,59 @@ INFORMATION:
 EXAMPLES:
     
     run Launch_me_to_get_FRP.py --name Example --north 42.7 --south 41.7 --east -5.5 --west -8.0 --start 2025-08-15T14:10:00Z --end 2025-08-15T16:30:00Z --no-show-map --no-show-graph --waiting-time 100 --beeper-off
-        This example gets the FRP between two dates in UTC (2025-08-15T14:10:00Z and 2025-08-15T16:30:00Z) for a bbox defined by the specified coordinates and saves the results in a csv named "Example.csv". It will not show a map with the bbox (--no-show-map) nor a graph with the results (--no-show-graph). In case that the requests reach the present moment (i.e. the data is not available because has not been acquired yet by the satellite, or has not reached the repository) it will retry every 100 seconds (--waiting-time 100), instead of every 300 seconds (which is the default value). The beeper that warns when new data is available is deactivated (--beeper-off).
+        This example gets the FRP between two dates in UTC (2025-08-15T14:10:00Z and 2025-08-15T16:30:00Z) for a bbox defined by the specified coordinates and saves the results in a csv named "Example.csv". It will not show a map with the bbox (--no-show-map) nor a graph with the results (--no-show-graph). In case that the requests reach the present moment (i.e. the data is not available because has not been acquired yet by the satellite, or has not reached the repository) it will retry waiting up to 100 seconds between tries (--waiting-time 100), instead of up to 300 seconds (which is the default value). The beeper that warns when new data is available is deactivated (--beeper-off).
 
     run Launch_me_to_get_FRP.py --north 42.7 --south 41.7 --east -5.5 --west -8.0 --start 2025-08-15T14:10:00+02:00 --end 2025-08-15T16:30:00+02:00
-        This example gets the FRP between two dates in UTC+02:00 (as in Spain in summer) (2025-08-15T14:10:00+02:00 and 2025-08-15T16:30:00+02:00) for a bbox defined by the specified coordinates and saves the results in a csv with a default name (bacause there is no --name). It will show a map with the bbox and a graph with the results (because these are the default options). In case that the requests reach the present moment, it will retry every 300 seconds and beep when the download is successful. 
+        This example gets the FRP between two dates in UTC+02:00 (as in Spain in summer) (2025-08-15T14:10:00+02:00 and 2025-08-15T16:30:00+02:00) for a bbox defined by the specified coordinates and saves the results in a csv with a default name (bacause there is no --name). It will show a map with the bbox and a graph with the results (because these are the default options). In case that the requests reach the present moment, it will retry waiting up to 300 seconds between tries and beep when the download is successful. 
 
     run Launch_me_to_get_FRP.py --north 40.8 --south 40.7 --east -7.8 --west -7.95 --start 2025-07-15T12:30:00+01:00
         This example gets the FRP non-stop from 2025-07-15T12:30:00+01:00 forward, as no end time (--end) is defined.
+
+    run Launch_me_to_get_FRP.py --name Backfill --north 42.7 --south 41.7 --east -5.5 --west -8.0 --start 2025-08-01T00:00:00Z --end 2025-08-08T00:00:00Z --no-show-map --no-show-graph --backfill --max-workers 4
+        This example downloads a whole week of past data with 4 simultaneous downloads (--backfill --max-workers 4) before processing it in chronological order. It reports the download throughput (files/s and MB/s). The number of simultaneous downloads is limited to 8 to stay inside the quotas of the repository.
+
+    run Launch_me_to_get_FRP.py --aoi-file Inputs/Fires_2025.csv --start 2025-06-01T00:00:00Z --end 2025-10-01T00:00:00Z --no-show-map --no-show-graph --reprocess --workers 32
+        This example reprocesses a whole fire season (June to September) for new areas of interest, reading the products already downloaded with 32 processes (--reprocess --workers 32; by default, one per core) instead of one. The products are sent to the processes in small batches, every process returns only the number of pixels and the FRP of every area of interest (and their pixels, if needed), and the results are saved in chronological order, as in a normal run. It reports the throughput (timesteps/s and rows/s). The timesteps that were not downloaded yet are requested afterwards, in order (or add --backfill to download them first in parallel).
+
+    run Launch_me_to_get_FRP.py --aoi fire_379 -8.0 41.7 -5.5 42.7 --aoi fire_380 -7.95 40.7 -7.8 40.8 --aoi-file Fires.csv --start 2025-08-15T14:10:00Z --end 2025-08-15T16:30:00Z
+        This example gets the FRP of several fires at once (multi-fire mode). Every full-disk file is downloaded and read only once per timestep, whatever the number of fires. The fires are defined with --aoi NAME WEST SOUTH EAST NORTH (that can be repeated) and/or with --aoi-file, a CSV separated by ";" with the columns name;west;south;east;north. The results of every fire are saved in their own csv (e.g. "fire_379.csv").
+
+    run Launch_me_to_get_FRP.py --name Monitor --north 42.7 --south 41.7 --east -5.5 --west -8.0 --start 2025-07-15T12:30:00+01:00 --raw-cache-max-mb 2000 --raw-cache-max-days 30 --raw-region -10 35 5 44.5
+        This example monitors a fire non-stop keeping the downloaded products under control: they never take more than 2000 MB (--raw-cache-max-mb 2000) and they are deleted 30 days after their last use (--raw-cache-max-days 30), the least recently used first. Only the pixels inside Iberia (--raw-region WEST SOUTH EAST NORTH) are kept from every product, which reduces the disk used by orders of magnitude. These trimmed products are kept in their own subdirectory (e.g. "Outputs/Raw_data/Region_-10.0_35.0_5.0_44.5"), and every bbox must be inside the region.
+
+    run Launch_me_to_get_FRP.py --daemon --control-file Fires.csv --no-show-map --no-show-graph
+        This example runs the script as a daemon that monitors non-stop every fire listed in the control file (--control-file, "Inputs/Fires.csv" by default), a CSV separated by ";" with the columns name;west;south;east;north;start;end (start and end are optional: without start, the fire is monitored from now on; without end, non-stop). Fires can be added, changed or removed while the daemon runs, just by editing the file (it is checked every 5 seconds). Every timestep is downloaded and read only once for all the fires, and their results are saved (e.g. "fire_379.csv") as soon as the product is published. This replaces one sleeping process per fire. A timestep that fails (e.g. if the repository rejects every account) is logged and left as a gap, and the daemon goes on with the next one. Stop it with Ctrl+C: it stops within seconds, without waiting for the timestep that it was waiting for (the download in progress, if any, is resumed in the next run).
+
+    run Launch_me_to_get_FRP.py --name Pedrogao --north 40.1 --south 39.8 --east -8.0 --west -8.4 --start 2025-08-15T14:10:00Z --end 2025-08-15T16:30:00Z --save-pixels --track-fires
+        This example keeps, besides the total FRP, every active pixel of every timestep (--save-pixels) in "Pedrogao_pixels.csv", and tells apart the fires inside the bbox (--track-fires): adjacent pixels are grouped into fires, and every fire is followed from one timestep to the next with the same FIRE_ID (named after the timestep when it was first detected, e.g. 202508151410_0). The centroid, the number of pixels and the FRP of every fire are saved in "Pedrogao_fires.csv". The grouping is fast enough (a fraction of a second for the full disk) to be used with a bbox that covers the whole MTG disk.
+
+    run Launch_me_to_get_FRP.py --polygon Perimeter Perimeter.geojson --polygon Municipality "POLYGON ((-8.2 39.9, -8.0 39.9, -8.1 40.05, -8.2 39.9))" --start 2025-08-15T14:10:00Z --end 2025-08-15T16:30:00Z
+        This example gets the FRP inside real polygons instead of bboxes (e.g. burn perimeters or municipalities), defined with --polygon NAME POLYGON (that can be repeated): a GeoJSON file (every polygon in it is joined), a WKT file or a WKT string, in decimal degrees. Polygons can also be listed in --aoi-file (and in the control file of the daemon) in a "polygon" column, instead of the bbox. The pixels are filtered first by the bbox of the polygon and only then by the polygon itself, so even polygons with thousands of vertices cost almost the same as a bbox.
+
+    run Launch_me_to_get_FRP.py --seed-tiles -10 35 5 44.5 --seed-zooms 3 10
+        This example downloads the tiles of the map of Iberia (--seed-tiles WEST SOUTH EAST NORTH) for zooms 3 to 10 (--seed-zooms 3 10, the default) into "Ancillary/Tiles", and exits. The map of the areas of interest is drawn with these tiles, so later runs in the same region show it without any network access (e.g. in air-gapped machines). The tiles are downloaded with contextily, that keeps them in "Ancillary/Tiles"; the least recently used are deleted when the tiles take more than --tile-cache-max-mb (default: 200). The map window does not block the script: the tiles of its basemap are fetched by another thread and drawn once they arrive, so the downloads start at once, and if it cannot be shown (e.g. without network nor tiles) the script goes on without it.
+
+    run Launch_me_to_get_FRP.py --build-cube --start 2025-06-01T00:00:00Z --end 2025-10-01T00:00:00Z --workers 8
+        This example builds a gridded FRP cube from the products already downloaded for a whole fire season (--build-cube, with a pool of --workers processes), and exits: the number of active pixels and the sum of the FRP of every cell of a global grid of 0.05° (--cube-resolution, every resolution has its own cube) at every timestep, kept in "Outputs/Cube_0.05". Only the cells with fire are stored, appended timestep by timestep to raw binary files that are memory-mapped, so new questions ("total FRP over Portugal in August", "hourly FRP for this province") are answered from the cube in milliseconds with f_query_cube (see below), for any bbox or polygon, without reading the products again. The areas are then taken at the resolution of the cube (the cells whose centre is inside them). Add --cube to any run (or to the daemon) to add every new timestep to the cube as soon as it is read.
+
+    run Launch_me_to_get_FRP.py --name Catch_up --north 42.7 --south 41.7 --east -5.5 --west -8.0 --start 2025-08-15T00:00:00Z --no-show-map --prefetch 4
+        This example catches up a whole day after an outage through a pipeline: while the results of a timestep are saved (and plotted), the next ones are read and downloaded, each stage in its own thread, with up to 4 timesteps waiting between two stages (--prefetch 4, 2 by default). A stage that gets ahead waits for the next one, so the catch-up runs at the speed of the slowest stage (usually the downloads) instead of the sum of all of them, and the products never pile up on disk nor in memory. The results are still saved in chronological order. Use --prefetch 0 to run the stages one after the other.
+
+LIBRARY:
+    The script can also be imported from Python (e.g. by an ingestion service), without the console nor any csv:
         
+      import Launch_me_to_get_FRP as frp_mtg
+      frp_client = frp_mtg.f_open_frp_client()
+      aoi = frp_mtg.f_define_an_aoi("fire_379", bbox=[-8.0, 41.7, -5.5, 42.7])
+      for result in frp_mtg.f_iter_frp(frp_client, aoi, "2025-08-15T14:10:00Z", "2025-08-15T16:30:00Z", pixels=True):
+          print(result["acquisition_time"], result["pixels"], result["frp"], result["data"])
+      arrays = frp_mtg.f_get_frp_arrays(frp_client, [aoi], "2025-08-01T00:00:00Z", "2025-08-08T00:00:00Z", backfill=True)
+      cube = frp_mtg.f_open_cube(frp_client["directories"])
+      hourly = frp_mtg.f_query_cube(cube, aoi, "2025-08-01T00:00:00Z", "2025-09-01T00:00:00Z", freq="1h")
+      frp_mtg.f_close_frp_client(frp_client)
+
+    f_iter_frp yields the results of every timestep as soon as its product is processed (without an end, non-stop): the acquisition time (UTC), the number of pixels, the sum of the FRP (MW) and, with pixels=True, the pixels themselves. f_get_frp_arrays gets a whole range at once as NumPy arrays (NaN where a timestep is missing). Both accept one area of interest or a list of them (every product is read only once for all of them), and the options of the console (e.g. backfill=True, or workers=8 to read the products already downloaded with a pool of processes). The console itself is a thin wrapper over them. f_query_cube gets the FRP of any area from the gridded FRP cube (see --build-cube), by timestep or by bins of any length (freq, e.g. "1h" or "1D", with the mean and maximum FRP and the energy of every bin).
+
 WARNINGS:
     The directory must contain a ".credentials.ini" file with your credentials to log in into Gitlab.
     This file must follow the next structure:
@@ -40,6 +84,20 @@ WARNINGS:
       username = username@example.org
       password = MyPa5sWoRd
 
+    Backup accounts can be added in more sections whose name starts with "gitlab" (e.g. [gitlab_backup], with its own username and password), in order of preference. If the repository rejects (401, 403) or throttles (429) an account, it is left aside for --account-cooldown seconds (default: 900, or as long as the repository asks) and the next account is used at once. Every request to the repository (also from other processes of the same computer, e.g. a daemon and a backfill) goes through the same rate limiter, kept in "Ancillary/rate_limiter.sqlite": --rate-limit requests per second on average (default: 4) with bursts of up to --rate-burst requests (default: 8). Raise them carefully, and use --rate-limit 0 to disable the limiter.
+
+    When a timestep is not available yet, the script waits until the moment when it should be published (acquisition time plus the publication delay observed in previous runs, ~15 min by default), minus one minute, so that the observed delay can also get shorter. From then on, it asks the repository with light HEAD requests (that do not download the file), waiting more and more between them (from 30 seconds up to --waiting-time seconds, with some randomness), and downloads the file as soon as it is available. The observed delays are kept in "Ancillary/publication_latency.json".
+
+    Before asking for a timestep, the script reads the listing of its day directory in the repository (one request per day, kept for --listing-ttl seconds, or for the whole run once the day is over), so most timesteps need a single request and the backfill never asks for files that do not exist. Timesteps older than 2 hours that are not in the listing are missing in the repository: they are skipped (and left as gaps) instead of being asked for again and again. If the listing is not available, the files are asked for one by one, as before. Use --no-listing to always ask for the files.
+
+    Only the libraries needed to get the FRP are imported at launch. The plotting and GIS libraries are imported only when the map or the graph are shown, so headless runs (--no-show-map --no-show-graph, e.g. in cron or containers) start almost instantly, also out of Windows. Their start-up time is checked against a budget of 1 second, and --profile-startup reports the time to import every library. The warning when new data is available can be chosen with --notifier (beep, bell or none) or replaced by any command with --notifier-command (e.g. --notifier-command "notify-send FRP").
+
+    The connection to the repository is opened once and shared by every download. If the repository does not answer in --connect-timeout seconds (default: 10) or does not send the data in --read-timeout seconds (default: 60), or answers with an error of the server (5xx), the timestep is requested again after --waiting-time seconds. The products are downloaded by chunks into a partial file (".part"), so the memory used does not depend on their size. An interrupted download is resumed from where it stopped (also in the next try or run), and a product only gets its final name once it is complete and its compression is checked, so a truncated or corrupted file is never read. Products that were left corrupted on disk (e.g. by older versions) are detected, deleted and downloaded again.
+
+    Every product is also saved as a binary (columnar) copy in "Outputs/Raw_data_columnar": one typed file (.npy) for the coordinates (float32) and one for the FRP (float64). The copy is built by streaming the csv by chunks, so its memory does not grow with the size of the product either. Later runs (e.g. reprocessing a season for a new bbox) read this copy instead of decompressing the csv again, and the script reports the hits and misses of this cache at the end. Use --no-columnar-cache to always read the compressed csv instead: it is then decompressed by chunks, parsing only the coordinates and the FRP, and keeping only the pixels inside the bboxes, so the memory used does not grow with the size of the product (e.g. during large outbreaks in Africa).
+
+    The time of every stage of every timestep (download, parse, save, plot) is logged in "Outputs/frp_mtg_metrics.jsonl" (one JSON line per stage), with the requests sent, the 404s, the bytes downloaded, the rows parsed per second and how late the product was published. A summary is kept in "Outputs/frp_mtg.prom", in the Prometheus text format. Point --metrics-dir to the textfile directory of node_exporter to alert on the near real time latency (e.g. on frp_mtg_lag_seconds, the seconds from the acquisition until the results are saved). Use --no-metrics to disable them.
+
     This repository sets quotas and limitations for the downloads, and you could be temporally blocked after a few unsuccessful pushes (for instance, trying to retrieve FRP data that is not avaialable yet, with a too low --waiting-time). If you plan to use this tool for operational purposes, we strongly recommend you to have a backup user/password.
     
     Note that FRP from MTG is in its demonstration phase, and is thus not fully operational (See "https://lsa-saf.eumetsat.int/en/data/products/fire-products/").
@@ -47,39 +105,161 @@ WARNINGS:
     Note that due to its spatial resolution, perimeters estimated through FRP from MTG are wider than real. Make sure that your bbox is not too narrow.
     Note that the spatial coverage of MTG includes Europe, Africa and South America.
     
-    If you define a name that already exists, the results will be attached to the end of the previously generated file, corrupting it.
+    The results are also kept in a database indexed by timestep ("<name>.sqlite", next to "<name>.csv"). If you define a name that already exists, the run is resumed: the timesteps already saved are skipped, the missing ones (gaps) are filled, and a timestep is never written twice (not even in the csv of the pixels and of the fires, where the fires keep their FIRE_ID). Restarting a long run after a crash costs nothing.
+
+    Besides the FRP of every timestep, the script keeps its statistics in "<name>_stats.csv" (and in the database), updated at every timestep without reading the series again: the fire radiative energy (FRE, in MJ) since --start and since the beginning of the day (UTC), the mean and the maximum FRP of the last hour and of the last 24 hours, the peak FRP, and the number of missing timesteps. The energy is integrated with the trapezoidal rule. Through gaps of up to 30 minutes the FRP is interpolated linearly; longer gaps add no energy (they are counted as missing timesteps).
 """
-)
-print("RUN THE SCRIPT:")
-print()
 
 # %% IMPORT THE LIBRARIES
-print("         Import the libraries")
+
+# Only the libraries needed to get the FRP are imported here. The plotting and GIS libraries
+# (matplotlib, geopandas, contextily, pyproj, shapely, IPython) and the notifiers (winsound)
+# are imported inside the functions that use them, so that headless runs start fast.
+import time as time
+TIME_LAUNCH = time.perf_counter() # To measure the start-up time
 
 from datetime import datetime as datetime
 from datetime import timedelta as timedelta
 from datetime import timezone as timezone
-from IPython.display import display as display
-from IPython.display import clear_output as clear_output
 from pathlib import Path as Path
-from shapely.geometry import box as box
+from requests.adapters import HTTPAdapter as HTTPAdapter
+
+from concurrent.futures import ProcessPoolExecutor as ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor as ThreadPoolExecutor
+from concurrent.futures import as_completed as as_completed
+from collections import deque as deque
 
 import argparse as argparse
+import asyncio as asyncio
 import configparser as configparser
-import contextily as ctx
 import csv as csv
-import geopandas as gpd
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+import functools as functools
+import gzip as gzip
+import json as json
+import numpy as np
 import os as os
 import pandas as pd
-import pyproj as pyproj
+import queue as queue
+import random as random
+import re as re
 import requests as requests
-import time as time
+import shutil as shutil
+import sqlite3 as sqlite3
+import subprocess as subprocess
 import sys as sys
-import winsound as winsound
+import threading as threading
+import zlib as zlib
+
+
+# %% DEFINE THE CONSTANTS
+
+# Repository of the LSA SAF products (it can be replaced by a mirror or by a local mock repository)
+LSASAF_URL = "https://datalsasaf.lsasvcs.ipma.pt"
+
+# Seconds from the launch until the first download for headless runs (--no-show-map --no-show-graph)
+STARTUP_BUDGET = 1.0
+
+# Maximum number of simultaneous downloads allowed in backfill mode.
+# The LSA SAF repository sets quotas, so do not raise it without a good reason.
+MAX_WORKERS_LSASAF = 8
+
+# Requests per second (on average) and burst of requests allowed to the repository. The limit is shared by every
+# download, thread and process of this host (a token bucket in Ancillary/rate_limiter.sqlite)
+RATE_LIMIT = 4.0
+RATE_BURST = MAX_WORKERS_LSASAF
+
+# Seconds that an account is left aside after it is rejected (401, 403) or throttled (429) by the repository
+ACCOUNT_COOLDOWN = 900
 
-pyproj.datadir.set_data_dir(os.path.join(sys.prefix, 'share', 'proj'))
+# Default timeouts (in seconds) to connect to the repository and to wait for its answer
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 60
+
+# The products are downloaded in chunks of DOWNLOAD_CHUNK bytes (so the memory used does not depend on their size).
+# An interrupted download is resumed (HTTP Range) up to DOWNLOAD_RESUMES times before giving up until the next try
+DOWNLOAD_CHUNK = 64 * 1024
+DOWNLOAD_RESUMES = 3
+
+# Nominal delay (in minutes) from the acquisition until the timestep is available in the repository.
+# Used until enough latencies have been observed (PUBLICATION_MIN_OBSERVATIONS)
+PUBLICATION_DELAY = 15
+PUBLICATION_MIN_OBSERVATIONS = 5
+
+# Percentile of the observed latencies when the repository starts being asked for a timestep
+PUBLICATION_PERCENTILE = 10
+
+# Minutes before that percentile when the repository is asked for the first time, so that the latencies
+# observed can also move earlier (a timestep found at the first try only gives an upper bound of its latency)
+PUBLICATION_EARLY_PROBE = 1
+
+# First waiting time (in seconds) after a timestep is not available. It doubles in every try, up to --waiting-time
+PROBE_BACKOFF = 30
+
+# Timesteps more recent than this are probed (HEAD) before being requested. Older ones are requested directly
+PROBE_WINDOW = timedelta(hours=2)
+
+# Initial capacity of the in-memory time series of the graph, and maximum number of points drawn per line
+PLOT_CAPACITY = 1024
+PLOT_MAX_POINTS = 2000
+
+# Rows of the compressed csv decompressed and parsed at once by the streaming reader
+STREAM_CHUNKSIZE = 100000
+
+# Timesteps sent at once to every process when reprocessing the downloaded products (--reprocess).
+# Larger chunks send fewer messages between processes; smaller ones balance the work better at the end
+REPROCESS_CHUNKSIZE = 8
+
+# Timesteps that can wait between two stages of the pipeline (download, read, save). While the results of a timestep
+# are saved, the next ones are read and downloaded. 0 runs the stages one after the other
+PREFETCH = 2
+
+# Columns of the product needed to get the FRP inside the bboxes
+FRP_COLUMNS = ("LATITUDE", "LONGITUDE", "FRP")
+
+# Resolution (in degrees) of the cells of the gridded FRP cube (--cube). Its time bins are the timesteps (10 min)
+CUBE_RESOLUTION = 0.05
+
+# Files of the cube ({name: type}), appended at every timestep: acquisition times (seconds since 1970), end of every
+# timestep in the data files, and the cells with active pixels of every timestep (cell, number of pixels, FRP)
+CUBE_FILES = {"times": np.int64, "offsets": np.int64, "cells": np.int32, "pixels": np.int32, "frp": np.float32}
+
+# Prefix of the metrics exported for Prometheus
+METRICS_PREFIX = "frp_mtg"
+
+# Seconds between two checks of the control file of the daemon (--daemon)
+CONTROL_POLL = 5
+
+# Tables of the store saved by timestep besides the FRP ({table: columns}): the active pixels (<name>_pixels.csv),
+# the fires (<name>_fires.csv) and the cells occupied by every fire, to resume their tracking (no csv)
+TIMESTEP_TABLES = {
+    "pixels": {"Date_UTC": "TEXT", "LATITUDE": "REAL", "LONGITUDE": "REAL", "FRP": "REAL", "FIRE_ID": "TEXT"},
+    "fires": {"Date_UTC": "TEXT", "FIRE_ID": "TEXT", "LATITUDE": "REAL", "LONGITUDE": "REAL", "PIXELS": "INTEGER", "FRP_MTG_MW": "REAL"},
+    "fire_cells": {"Date_UTC": "TEXT", "CELL": "INTEGER", "FIRE_ID": "TEXT"},
+}
+
+# Size (in degrees of latitude, ~2.8 km) of the cells where the active pixels are hashed to group them into fires.
+# Pixels in the same or in touching cells belong to the same fire. It must be larger than the pixels (1-3 km)
+CLUSTER_CELL = 0.025
+
+# Rolling windows of the statistics of the FRP ({label: span}), and longest gap (missing timesteps)
+# that the fire radiative energy is integrated through (linearly). Longer gaps add no energy
+ROLLING_WINDOWS = {"1H": timedelta(hours=1), "24H": timedelta(hours=24)}
+FRE_MAX_GAP = timedelta(minutes=30)
+
+# Seconds that the listing of a day directory of the repository is trusted before it is requested again
+# (only while the day can still get new timesteps. Later, it is complete and it is requested only once)
+LISTING_TTL = 30
+
+# Basemap of the map of the areas of interest (--show-map): the OpenStreetMap tiles downloaded by contextily are
+# kept in Ancillary/Tiles, so that the map is drawn without network access once its tiles are there. The least
+# recently used tiles are deleted when they take more than --tile-cache-max-mb
+TILE_CACHE_MAX_MB = 200
+
+# Seconds that the end of a run (or the start of the daemon) waits for the basemap, if it is not drawn yet
+TILE_WAIT = 10
+
+# Maximum number of tiles that can be seeded at once (--seed-tiles), to respect the tile usage policy of OpenStreetMap
+TILE_SEED_MAX = 10000
 
 
 # %% DEFINE THE ANCILLARY FUNCTIONS
@@ -133,36 +313,71 @@ def f_parser():
     parser.add_argument(
         "--north",
         type=float,
-        required=True,
+        required=False,
+        default=None,
         help="North latitude in decimal degrees (e.g. 43.18) (float)"
     )
 
     parser.add_argument(
         "--south",
         type=float,
-        required=True,
+        required=False,
+        default=None,
         help="South latitude in decimal degrees (e.g. 43.12) (float)"
     )
 
     parser.add_argument(
         "--east",
         type=float,
-        required=True,
+        required=False,
+        default=None,
         help="East longitude in decimal degrees (e.g. -5.72) (float)"
     )
 
     parser.add_argument(
         "--west",
         type=float,
-        required=True,
+        required=False,
+        default=None,
         help="West longitude in decimal degrees (e.g. -5.82) (float)"
     )
 
+    # Several areas of interest (optional). Each one gets its own results file
+    parser.add_argument(
+        "--aoi",
+        dest="aois",
+        nargs=5,
+        action="append",
+        metavar=("NAME", "WEST", "SOUTH", "EAST", "NORTH"),
+        default=None,
+        help="Named bbox in decimal degrees (e.g. --aoi fire_379 -5.82 43.12 -5.72 43.18). Can be repeated"
+    )
+
+    parser.add_argument(
+        "--aoi-file",
+        dest="aoi_file",
+        type=str,
+        required=False,
+        default=None,
+        help="CSV (separated by ;) with the columns name;west;south;east;north, one bbox per line, and optionally polygon (WKT or GeoJSON file)"
+    )
+
+    parser.add_argument(
+        "--polygon",
+        dest="polygons",
+        nargs=2,
+        action="append",
+        metavar=("NAME", "POLYGON"),
+        default=None,
+        help="Named polygon in decimal degrees: a GeoJSON or WKT file, or a WKT string (e.g. --polygon fire_379 Perimeter.geojson). Can be repeated"
+    )
+
     parser.add_argument(
         "--start",
         type=f_valid_datetime_tz,
-        required=True,
-        help="Start datetime in ISO 8601 format with time zone (e.g.: 2024-01-01T14:30:00+02:00 or 2024-01-01T02:30:00Z)"
+        required=False,
+        default=None,
+        help="Start datetime in ISO 8601 format with time zone (e.g.: 2024-01-01T14:30:00+02:00 or 2024-01-01T02:30:00Z). Required unless --daemon"
     )
     
     parser.add_argument(
@@ -179,7 +394,7 @@ def f_parser():
         type=int,
         required=False,
         default=300,
-        help="Seconds until the next push"
+        help="Maximum seconds between two tries when the data is not available yet (default: 300)"
     )
     
     # Flag to activate show-map (optional)
@@ -200,6 +415,38 @@ def f_parser():
     
     # Default value for show-map
     parser.set_defaults(show_map=True)
+
+    # Tiles of the map (optional)
+    parser.add_argument(
+        "--tile-cache-max-mb",
+        dest="tile_cache_max_mb",
+        type=float,
+        required=False,
+        default=TILE_CACHE_MAX_MB,
+        help=f"Maximum size of the cache of tiles of the map. The least recently used are deleted (default: {TILE_CACHE_MAX_MB})"
+    )
+
+    parser.add_argument(
+        "--seed-tiles",
+        dest="seed_tiles",
+        nargs=4,
+        type=float,
+        metavar=("WEST", "SOUTH", "EAST", "NORTH"),
+        required=False,
+        default=None,
+        help="Download the tiles of the map of a region into the cache (e.g. before going offline) and exit"
+    )
+
+    parser.add_argument(
+        "--seed-zooms",
+        dest="seed_zooms",
+        nargs=2,
+        type=int,
+        metavar=("MIN", "MAX"),
+        required=False,
+        default=[3, 10],
+        help="Zooms of the tiles seeded with --seed-tiles (default: 3 10)"
+    )
     
     # Flag to activate show-graph (optional)
     parser.add_argument(
@@ -238,283 +485,3197 @@ def f_parser():
     
     # Default value for show-map
     parser.set_defaults(beeper=True)
-    
-    args = parser.parse_args()
-    return args
-
 
-def f_check_coordinates(lonlat_bbox):
-    print(f"         Running: {f_check_coordinates.__name__}()")
-    
-    W, S, E, N = lonlat_bbox
-    
-    if W>E:
-        raise ValueError("West cannot be easterlier than East :S")
+    # Notifier (optional)
+    parser.add_argument(
+        "--notifier",
+        dest="notifier",
+        type=str,
+        choices=sorted(NOTIFIERS) + ["none"],
+        required=False,
+        default="beep",
+        help="How to warn when new data is available: beep (winsound, or the terminal bell out of Windows), bell (terminal bell) or none (default: beep)"
+    )
 
-    if S>N:
-        raise ValueError("North cannot be southerlier than South :S")
+    parser.add_argument(
+        "--notifier-command",
+        dest="notifier_command",
+        type=str,
+        required=False,
+        default=None,
+        help="Command to run (instead of the notifier) when new data is available (e.g. \"notify-send FRP\")"
+    )
 
+    # Start-up profile (optional)
+    parser.add_argument(
+        "--profile-startup",
+        dest="profile_startup",
+        action="store_true",
+        help="Measure the time to import the libraries of the headless path and exit (default: False)"
+    )
 
-def f_check_start_datetime(start_time):
-    # Check the start time
-    print(f"         Running: {f_check_start_datetime.__name__}()")
-            
-    if start_time >= datetime.now(tz=timezone.utc):
-        raise ValueError("Take it easy, McFly. Ignition cannot be in the future")
-    
-    if (start_time.minute not in {0, 10, 20, 30, 40, 50}
-        or start_time.second != 0
-        or start_time.microsecond != 0):
-          
-        print("          - WARNING: MTG captures data every 10 min. Start time modified:")
-        print(f"              FROM {start_time.isoformat()}")
-        new_minute_value = start_time.minute//10*10
-        start_time = start_time.replace(minute=new_minute_value, second=0, microsecond=0)
-        print(f"              TO {start_time.isoformat()}")
+    # Flag to activate the columnar cache (optional)
+    parser.add_argument(
+        "--columnar-cache",
+        dest="columnar_cache",
+        action="store_true",
+        help="Keep a binary (columnar) copy of every product to read it faster next time (default: True)"
+    )
 
-    return start_time
+    # Flag to deactivate the columnar cache (optional)
+    parser.add_argument(
+        "--no-columnar-cache",
+        dest="columnar_cache",
+        action="store_false",
+        help="Always read the compressed csv (default: True)"
+    )
 
+    # Default value for columnar-cache
+    parser.set_defaults(columnar_cache=True)
 
-def f_show_the_bbox(bbox):
-    # Show the area of interest (aka bbox)
-    print(f"         Running: {f_show_the_bbox.__name__}()")
-    
-    try:            
-               
-        # Create the geometry for the bbox
-        geom = box(*bbox)
-        gdf = gpd.GeoDataFrame({'geometry': [geom]}, crs="EPSG:4326")
-        
-        # Convert to metric projection (Web Mercator) to use with contextily
-        gdf_web = gdf.to_crs(epsg=3857)
-        
-        # Graphicate
-        ax = gdf_web.plot(edgecolor='red', facecolor='none', linewidth=2, figsize=(8, 8))
-        ctx.add_basemap(ax, source=ctx.providers.OpenStreetMap.Mapnik)
-        plt.title("Bounding Box")
-        plt.show()
-        
-    except Exception as e:
-        print(f"         Error: {e}")
-        # Abort in case of critical error
-        sys.exit(1)
+    # Limits of the directory with the downloaded products (optional)
+    parser.add_argument(
+        "--raw-cache-max-mb",
+        dest="raw_cache_max_mb",
+        type=float,
+        required=False,
+        default=None,
+        help="Maximum size (MB) of the downloaded products. The least recently used are deleted (default: no limit)"
+    )
 
+    parser.add_argument(
+        "--raw-cache-max-days",
+        dest="raw_cache_max_days",
+        type=float,
+        required=False,
+        default=None,
+        help="Maximum days since a downloaded product was last used. Older ones are deleted (default: no limit)"
+    )
 
-def f_define_the_directories():
-    """
-    Returns
-    -------
-    Directories : dict
-        Dictionary with the routes to the defined directories.
-    """
-    print(f"         Running: {f_define_the_directories.__name__}()")
-    
-    Directory_general = Path(__file__).resolve().parent.parent
+    parser.add_argument(
+        "--raw-region",
+        dest="raw_region",
+        type=float,
+        nargs=4,
+        metavar=("WEST", "SOUTH", "EAST", "NORTH"),
+        required=False,
+        default=None,
+        help="Keep only the pixels inside this bbox of every downloaded product, instead of the full disk (e.g. -10 35 5 44.5 for Iberia)"
+    )
 
-    Directories = {
-        "General": Directory_general,
-        "Ancillary": Directory_general / "Ancillary",
-        "Inputs": Directory_general / "Inputs",
-        "Outputs": Directory_general / "Outputs",
-        "Raw_data": Directory_general / "Outputs" / "Raw_data",
-        "Scripts": Directory_general / "Scripts",
-    }  # Add new lines if nedded
-    
-    # Make sure that these directories exist. If not, create them.
-    for directory_name, directory_path in Directories.items():
-        if not directory_path.exists():
-            directory_path.mkdir(parents=True)
-            print(f"          - Created directory: {directory_name} → {directory_path}")
+    # Timeouts (optional)
+    parser.add_argument(
+        "--connect-timeout",
+        dest="connect_timeout",
+        type=float,
+        required=False,
+        default=CONNECT_TIMEOUT,
+        help=f"Seconds to wait for the connection to the repository (default: {CONNECT_TIMEOUT})"
+    )
 
-    return Directories
+    parser.add_argument(
+        "--read-timeout",
+        dest="read_timeout",
+        type=float,
+        required=False,
+        default=READ_TIMEOUT,
+        help=f"Seconds to wait for the answer of the repository (default: {READ_TIMEOUT})"
+    )
 
+    # Listings of the repository (optional)
+    parser.add_argument(
+        "--listing",
+        dest="listing",
+        action="store_true",
+        help="Find the available timesteps in the listing of every day directory of the repository, instead of asking for every file (default: True)"
+    )
 
-def f_define_the_filename(datetime):
-    # Define the web route to the file (link_to_filename), and its name (filename), following the next convention:
-    # https://datalsasafwd.lsasvcs.ipma.pt/PRODUCTS/<satellite>/<product>/<format>/<year>/<month>/<day>/filename
-    # filename: LSA-509_MTG_MTFRPPIXEL-ListProduct_MTG-FD_YYYYMMDDHHMM.csv.gz
-    print(f"         Running: {f_define_the_filename.__name__}()") 
-    
-    Anc_web = "https://datalsasaf.lsasvcs.ipma.pt"
-    Anc_section = "PRODUCTS"
-    Anc_satellite = "MTG"
-    Anc_product = "MTFRPPixel"
-    Anc_format = "NATIVE"
-    Anc_YYYY = str(datetime.year).zfill(4)
-    Anc_MM = str(datetime.month).zfill(2)
-    Anc_DD = str(datetime.day).zfill(2)
-    Anc_HH = str(datetime.hour).zfill(2)
-    Anc_mm = str(datetime.minute).zfill(2)
+    parser.add_argument(
+        "--no-listing",
+        dest="listing",
+        action="store_false",
+        help="Ask the repository for every file"
+    )
 
-    webRoute = os.path.join(Anc_web,
-                            Anc_section,
-                            Anc_satellite,
-                            Anc_product,
-                            Anc_format,
-                            Anc_YYYY,
-                            Anc_MM,
-                            Anc_DD).replace("\\", "/")
+    parser.set_defaults(listing=True)
 
-    filename = "LSA-509_MTG_MTFRPPIXEL-ListProduct_MTG-FD_{}{}{}{}{}.csv.gz".format(
-        Anc_YYYY, Anc_MM, Anc_DD, Anc_HH, Anc_mm
+    parser.add_argument(
+        "--listing-ttl",
+        dest="listing_ttl",
+        type=float,
+        required=False,
+        default=LISTING_TTL,
+        help=f"Seconds that the listing of the current day is trusted before it is requested again (default: {LISTING_TTL})"
     )
 
-    link_to_download_file = os.path.join(webRoute,filename).replace("\\", "/")
-   
-    return link_to_download_file, filename
+    # Rate limit and accounts (optional)
+    parser.add_argument(
+        "--rate-limit",
+        dest="rate_limit",
+        type=float,
+        required=False,
+        default=RATE_LIMIT,
+        help=f"Requests per second to the repository, shared by every download and process of this host (default: {RATE_LIMIT}, 0: no limit)"
+    )
 
+    parser.add_argument(
+        "--rate-burst",
+        dest="rate_burst",
+        type=int,
+        required=False,
+        default=RATE_BURST,
+        help=f"Requests that can be sent at once before the rate limit applies (default: {RATE_BURST})"
+    )
 
-def f_get_credentials(filename=".credentials.ini"):
-    # Get credentials from an ini file located in the same directory than the script
-    print(f"         Running: {f_get_credentials.__name__}()")
-    
-    config = configparser.ConfigParser()
+    parser.add_argument(
+        "--account-cooldown",
+        dest="account_cooldown",
+        type=int,
+        required=False,
+        default=ACCOUNT_COOLDOWN,
+        help=f"Seconds that an account is left aside after it is rejected (401, 403) or throttled (429) (default: {ACCOUNT_COOLDOWN})"
+    )
 
-    cred_path = Path(__file__).parent / filename
+    # Backfill (optional)
+    parser.add_argument(
+        "--backfill",
+        dest="backfill",
+        action="store_true",
+        help="Download in parallel all the past timesteps before processing them (default: False)"
+    )
+
+    parser.add_argument(
+        "--max-workers",
+        dest="max_workers",
+        type=int,
+        required=False,
+        default=4,
+        help=f"Simultaneous downloads in backfill mode (default: 4, max: {MAX_WORKERS_LSASAF})"
+    )
+
+    # Pipeline (optional)
+    parser.add_argument(
+        "--prefetch",
+        dest="prefetch",
+        type=int,
+        required=False,
+        default=PREFETCH,
+        help=f"Timesteps downloaded and read in advance while the results of the current one are saved (default: {PREFETCH}). 0 runs the download, the reading and the saving one after the other"
+    )
+
+    # Reprocess (optional)
+    parser.add_argument(
+        "--reprocess",
+        dest="reprocess",
+        action="store_true",
+        help="Read the products already downloaded with a pool of processes (one per core), e.g. to reprocess a season for new bboxes (default: False)"
+    )
+
+    parser.add_argument(
+        "--workers",
+        dest="workers",
+        type=int,
+        required=False,
+        default=os.cpu_count() or 1,
+        help=f"Processes that read the products in reprocess mode (default: number of cores, {os.cpu_count() or 1} here)"
+    )
+
+    # Gridded FRP cube (optional)
+    parser.add_argument(
+        "--cube",
+        dest="cube",
+        action="store_true",
+        help="Add every timestep read (the full disk, by cells) to the gridded FRP cube (Outputs/Cube_<resolution>) (default: False)"
+    )
+
+    parser.add_argument(
+        "--build-cube",
+        dest="build_cube",
+        action="store_true",
+        help="Add to the gridded FRP cube the products already downloaded from --start to --end (or now) with a pool of --workers processes, and exit"
+    )
+
+    parser.add_argument(
+        "--cube-resolution",
+        dest="cube_resolution",
+        type=float,
+        required=False,
+        default=CUBE_RESOLUTION,
+        help=f"Size (in degrees) of the cells of the gridded FRP cube. Every resolution has its own cube (default: {CUBE_RESOLUTION})"
+    )
+
+    # Metrics (optional)
+    parser.add_argument(
+        "--metrics",
+        dest="metrics",
+        action="store_true",
+        help="Log the timings of every stage (JSON lines) and export them for Prometheus (default: True)"
+    )
+
+    parser.add_argument(
+        "--no-metrics",
+        dest="metrics",
+        action="store_false",
+        help="Do not log nor export the timings"
+    )
+
+    parser.set_defaults(metrics=True)
+
+    parser.add_argument(
+        "--metrics-dir",
+        dest="metrics_dir",
+        type=str,
+        required=False,
+        default=None,
+        help="Directory of the metrics files, e.g. the textfile directory of node_exporter (default: Outputs)"
+    )
+
+    # Daemon (optional)
+    parser.add_argument(
+        "--daemon",
+        dest="daemon",
+        action="store_true",
+        help="Monitor non-stop the fires listed in the control file, that can be added or removed at runtime (default: False)"
+    )
+
+    parser.add_argument(
+        "--control-file",
+        dest="control_file",
+        type=str,
+        required=False,
+        default=None,
+        help="CSV (separated by ;) with the columns name;west;south;east;north;start;end of the fires of the daemon (default: Inputs/Fires.csv)"
+    )
+
+    # Pixels and fires (optional)
+    parser.add_argument(
+        "--save-pixels",
+        dest="save_pixels",
+        action="store_true",
+        help="Save every active pixel of every timestep (<name>_pixels.csv), not only the sum of the FRP (default: False)"
+    )
+
+    parser.add_argument(
+        "--track-fires",
+        dest="track_fires",
+        action="store_true",
+        help="Group the active pixels into fires, and track them from one timestep to the next (<name>_fires.csv) (default: False)"
+    )
+
+    args = parser.parse_args()
+
+    if args.start is None and not args.daemon and args.seed_tiles is None and not args.profile_startup:
+        parser.error("the following arguments are required: --start (unless --daemon, --seed-tiles or --profile-startup)")
+    if args.reprocess and args.daemon:
+        parser.error("argument --reprocess: not allowed with argument --daemon")
+    if args.build_cube and args.daemon:
+        parser.error("argument --build-cube: not allowed with argument --daemon")
+    if args.prefetch < 0:
+        parser.error("argument --prefetch: it cannot be negative")
+
+    return args
+
+
+def f_check_coordinates(lonlat_bbox):
+    print(f"         Running: {f_check_coordinates.__name__}()")
+    
+    W, S, E, N = lonlat_bbox
+    
+    if W>E:
+        raise ValueError("West cannot be easterlier than East :S")
+
+    if S>N:
+        raise ValueError("North cannot be southerlier than South :S")
+
+
+def f_load_polygon(polygon):
+    # Load a polygon in decimal degrees (lon, lat) from a GeoJSON file (every polygon in it is joined),
+    # a WKT file or a WKT string, and prepare it, so that the pixels inside it are found fast.
+    # Return the polygon and its bbox ([W, S, E, N])
+    print(f"         Running: {f_load_polygon.__name__}()")
+
+    import shapely as shapely
+
+    try:
+        if os.path.isfile(polygon):
+            with open(polygon, "r", encoding="utf-8") as f:
+                text = f.read()
+            if polygon.lower().endswith((".geojson", ".json")):
+                geojson = json.loads(text)
+                features = geojson.get("features", [geojson]) if geojson.get("type") != "Feature" else [geojson]
+                geometries = [shapely.geometry.shape(feature.get("geometry", feature)) for feature in features]
+                geometry = shapely.union_all(geometries)
+            else:
+                geometry = shapely.from_wkt(text)
+        else:
+            geometry = shapely.from_wkt(polygon)
+    except shapely.errors.ShapelyError as e:
+        raise ValueError(f"The polygon cannot be read: {e}") from e
+
+    if geometry.is_empty or geometry.geom_type not in ("Polygon", "MultiPolygon"):
+        raise ValueError(f"The polygon must be a Polygon or a MultiPolygon, not {geometry.geom_type}")
+    if not geometry.is_valid:
+        raise ValueError(f"The polygon is not valid: {shapely.is_valid_reason(geometry)}")
+
+    shapely.prepare(geometry)
+
+    return geometry, [float(c) for c in geometry.bounds]
+
+
+def f_aoi_from_row(row):
+    # Define an area of interest from a row of a CSV (--aoi-file or the control file of the daemon):
+    # its name, and its bbox (west, south, east, north) or its polygon (WKT or GeoJSON file)
+    polygon = (row.get("polygon") or "").strip()
+
+    aoi = {"name": row["name"].strip()}
+    if polygon:
+        aoi["polygon"], aoi["bbox"] = f_load_polygon(polygon)
+    else:
+        aoi["bbox"] = [float(row["west"]), float(row["south"]), float(row["east"]), float(row["north"])]
+
+    return aoi
+
+
+def f_define_the_aois(args):
+    """
+    Returns
+    -------
+    aois : list
+        List of dictionaries with the name and the bbox ([W, S, E, N] in decimal degrees)
+        of every area of interest: the one defined by --north/--south/--east/--west (named
+        after --name), the ones defined by --aoi and the ones listed in --aoi-file. The
+        areas defined by a polygon (--polygon or --aoi-file) also have it (prepared).
+    """
+    print(f"         Running: {f_define_the_aois.__name__}()")
+
+    aois = []
+
+    # Area defined by --north, --south, --east and --west
+    coordinates = [args.west, args.south, args.east, args.north]
+    if any(c is not None for c in coordinates):
+        if any(c is None for c in coordinates):
+            raise ValueError("Define the four coordinates of the bbox: --north, --south, --east and --west")
+        aois.append({"name": args.name, "bbox": coordinates})
+
+    # Areas defined by --aoi
+    for name, W, S, E, N in (args.aois or []):
+        aois.append({"name": name, "bbox": [float(W), float(S), float(E), float(N)]})
+
+    # Areas defined by --polygon
+    for name, polygon in (args.polygons or []):
+        geometry, bbox = f_load_polygon(polygon)
+        aois.append({"name": name, "bbox": bbox, "polygon": geometry})
+
+    # Areas listed in --aoi-file
+    if args.aoi_file is not None:
+        with open(args.aoi_file, "r", encoding="utf-8") as f:
+            reader = csv.DictReader(f, delimiter=";")
+            for row in reader:
+                aois.append(f_aoi_from_row(row))
+
+    if not aois:
+        raise ValueError("Define at least one area of interest: --north/--south/--east/--west, --aoi, --polygon or --aoi-file")
+
+    names = [aoi["name"] for aoi in aois]
+    if len(names) != len(set(names)):
+        raise ValueError("The names of the areas of interest must be unique")
+
+    # Validate the coordinates
+    for aoi in aois:
+        f_check_coordinates(aoi["bbox"])
+
+    print(f"          - {len(aois)} areas of interest: {', '.join(names)}")
+
+    return aois
+
+
+def f_notify_beep():
+    # Beep with winsound (only in Windows). Elsewhere, ring the terminal bell
+    try:
+        import winsound as winsound
+    except ImportError:
+        f_notify_bell()
+        return
+
+    winsound.Beep(1000, 500)  # BEEEP freq=1000 Hz, duration=500 ms
+
+
+def f_notify_bell():
+    # Ring the terminal bell
+    print("\a", end="", flush=True)
+
+
+# Notifiers available from the console (--notifier). Any function without arguments can be used as notifier
+NOTIFIERS = {
+    "beep": f_notify_beep,
+    "bell": f_notify_bell,
+}
+
+
+def f_define_the_notifier(args):
+    # Return the function to call when new data is available (None if the notifications are off)
+    print(f"         Running: {f_define_the_notifier.__name__}()")
+
+    if not args.beeper or args.notifier == "none":
+        return None
+
+    if args.notifier_command is not None:
+        return lambda: subprocess.Popen(args.notifier_command, shell=True)
+
+    return NOTIFIERS[args.notifier]
+
+
+def f_report_startup():
+    # Report the time from the launch of the script until now (i.e. the first download) against its budget
+    print(f"         Running: {f_report_startup.__name__}()")
+
+    elapsed = time.perf_counter() - TIME_LAUNCH
+    print(f"          - Start-up time: {elapsed:.2f} s (budget: {STARTUP_BUDGET:.2f} s)")
+    if elapsed > STARTUP_BUDGET:
+        print("          - WARNING: Start-up over budget. Check it with --profile-startup")
+
+
+def f_profile_startup(number_of_modules=15):
+    # Import the script (headless path) in a new interpreter with "-X importtime" and report the
+    # libraries that take the longest to import, and the total time against the start-up budget
+    print(f"         Running: {f_profile_startup.__name__}()")
+
+    script = Path(__file__).resolve()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {script.stem}"],
+        cwd=script.parent, capture_output=True, text=True
+    )
+
+    # Lines: "import time: self [us] | cumulative [us] | imported package", indented 2 spaces per level.
+    # A package is listed after the ones it imports, so the libraries imported directly by the
+    # script are the ones one level below, between the previous top-level import and the script
+    modules = []
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, package = line.removeprefix("import time:").split("|")
+        level = (len(package) - len(package.lstrip()) - 1) // 2
+        if level == 0 and package.strip() == script.stem:
+            total = int(cumulative) / 1e6
+            break
+        elif level == 0:
+            modules = []
+        elif level == 1:
+            modules.append((int(cumulative) / 1e6, package.strip()))
+    for seconds, package in sorted(modules, reverse=True)[:number_of_modules]:
+        print(f"          - {package:<30} {seconds:.3f} s")
+    print(f"          - Total import time: {total:.2f} s (budget: {STARTUP_BUDGET:.2f} s)")
+
+    return total
+
+
+def f_check_start_datetime(start_time):
+    # Check the start time
+    print(f"         Running: {f_check_start_datetime.__name__}()")
+            
+    if start_time >= datetime.now(tz=timezone.utc):
+        raise ValueError("Take it easy, McFly. Ignition cannot be in the future")
+    
+    if (start_time.minute not in {0, 10, 20, 30, 40, 50}
+        or start_time.second != 0
+        or start_time.microsecond != 0):
+          
+        print("          - WARNING: MTG captures data every 10 min. Start time modified:")
+        print(f"              FROM {start_time.isoformat()}")
+        new_minute_value = start_time.minute//10*10
+        start_time = start_time.replace(minute=new_minute_value, second=0, microsecond=0)
+        print(f"              TO {start_time.isoformat()}")
+
+    return start_time
+
+
+def f_show_the_bbox(bboxes, tile_cache=None):
+    # Show the areas of interest (aka bboxes) over a basemap of OpenStreetMap (contextily), without blocking: the
+    # window is shown at once with the bboxes, and the tiles are fetched by another thread (from the cache of tiles,
+    # if any) and drawn when they arrive (f_update_the_map), so the downloads of the FRP do not wait for them.
+    # The map is optional: if it cannot be shown, the script goes on without it.
+    # Return the map (to be updated with f_update_the_map), or None
+    print(f"         Running: {f_show_the_bbox.__name__}()")
+    
+    try:            
+
+        # Import the GIS and plotting libraries (only when the map is shown)
+        from shapely.geometry import box as box
+
+        import contextily as ctx
+        import geopandas as gpd
+        import matplotlib.pyplot as plt
+        import pyproj as pyproj
+
+        pyproj.datadir.set_data_dir(os.path.join(sys.prefix, 'share', 'proj'))
+
+        # Keep the tiles on disk, so the map of the same region is drawn again without network access
+        if tile_cache is not None:
+            ctx.set_cache_dir(str(tile_cache["route"]))
+               
+        # Create the geometry for every bbox
+        geoms = [box(*bbox) for bbox in bboxes]
+        gdf = gpd.GeoDataFrame({'geometry': geoms}, crs="EPSG:4326")
+        
+        # Convert to metric projection (Web Mercator) to use with contextily
+        gdf_web = gdf.to_crs(epsg=3857)
+        
+        # Graphicate (without blocking)
+        ax = gdf_web.plot(edgecolor='red', facecolor='none', linewidth=2, figsize=(8, 8))
+        plt.title("Bounding Box")
+        plt.show(block=False)
+        plt.pause(0.001)
+        
+    except Exception as e:
+        print(f"          - WARNING: the map cannot be shown: {e}")
+        return None
+
+    bbox_map = {
+        "ax": ax,
+        "tile_cache": tile_cache,
+        "basemap": None, # (image, extent), once the tiles are fetched
+        "error": None,
+        "ready": threading.Event(),
+    }
+    west, east = ax.get_xlim()
+    south, north = ax.get_ylim()
+    threading.Thread(target=f_fetch_the_basemap, args=(bbox_map, west, south, east, north), name="map", daemon=True).start()
+
+    return bbox_map
+
+
+def f_fetch_the_basemap(bbox_map, west, south, east, north):
+    # Fetch the tiles of OpenStreetMap that cover the map (in Web Mercator) as one image, in the thread of the map.
+    # contextily takes them from its cache (if any) or downloads them (and keeps them in the cache)
+    import contextily as ctx
+
+    try:
+        bbox_map["basemap"] = ctx.bounds2img(west, south, east, north, zoom="auto", source=ctx.providers.OpenStreetMap.Mapnik)
+    except Exception as e:
+        bbox_map["error"] = e
+    finally:
+        bbox_map["ready"].set()
+
+
+def f_update_the_map(bbox_map, timeout=0):
+    # Draw the basemap once its tiles are fetched (waiting up to timeout seconds for them), in this thread, as
+    # matplotlib needs. Return the map while the basemap is not drawn yet, and None once it is (or if it failed)
+    if bbox_map is None or not bbox_map["ready"].wait(timeout):
+        return bbox_map
+
+    print(f"         Running: {f_update_the_map.__name__}()")
+
+    if bbox_map["error"] is not None:
+        print(f"          - WARNING: the basemap cannot be shown: {bbox_map['error']}")
+        return None
+
+    try:
+        import contextily as ctx
+        import matplotlib.pyplot as plt
+
+        ax = bbox_map["ax"]
+        x_lim, y_lim = ax.get_xlim(), ax.get_ylim()
+        image, extent = bbox_map["basemap"]
+        ax.imshow(image, extent=extent, interpolation="bilinear", zorder=0)
+        ax.set_xlim(x_lim)
+        ax.set_ylim(y_lim)
+        ctx.add_attribution(ax, "(C) OpenStreetMap contributors")
+        ax.figure.canvas.draw_idle()
+        plt.pause(0.001)
+
+    except Exception as e:
+        print(f"          - WARNING: the basemap cannot be shown: {e}")
+
+    if bbox_map["tile_cache"] is not None:
+        f_enforce_tile_cache(bbox_map["tile_cache"])
+
+    return None
+
+
+def f_open_tile_cache(directories, max_mb=TILE_CACHE_MAX_MB):
+    """
+    Open the cache of the tiles of the basemap (Ancillary/Tiles), where contextily keeps
+    every tile that it downloads.
+
+    Returns
+    -------
+    tile_cache : dict
+        Dictionary with the route to the cache and its maximum size (bytes).
+    """
+    print(f"         Running: {f_open_tile_cache.__name__}()")
+
+    tile_cache = {
+        "route": Path(directories["Ancillary"]) / "Tiles",
+        "max_bytes": None if max_mb is None else max_mb * 1e6,
+    }
+    tile_cache["route"].mkdir(parents=True, exist_ok=True)
+
+    return tile_cache
+
+
+def f_seed_tiles(tile_cache, lonlat_bbox, zoom_min, zoom_max):
+    # Download into the cache every tile of a region for a range of zooms (e.g. before going offline)
+    print(f"         Running: {f_seed_tiles.__name__}()")
+
+    import contextily as ctx
+
+    ctx.set_cache_dir(str(tile_cache["route"]))
+
+    f_check_coordinates(lonlat_bbox)
+    W, S, E, N = lonlat_bbox
+    number_of_tiles = sum(ctx.howmany(W, S, E, N, zoom, verbose=False, ll=True) for zoom in range(zoom_min, zoom_max + 1))
+    if number_of_tiles > TILE_SEED_MAX:
+        raise ValueError(f"Too many tiles ({number_of_tiles}, max: {TILE_SEED_MAX}). Reduce the region or the zooms")
+
+    print(f"          - Seeding {number_of_tiles} tiles (zooms {zoom_min} to {zoom_max}) in {tile_cache['route']}")
+    for zoom in range(zoom_min, zoom_max + 1):
+        ctx.bounds2img(W, S, E, N, zoom=zoom, source=ctx.providers.OpenStreetMap.Mapnik, ll=True)
+        print(f"          - Zoom {zoom}: done")
+
+    f_enforce_tile_cache(tile_cache)
+
+
+def f_enforce_tile_cache(tile_cache):
+    # Delete the least recently used tiles until the cache is below its maximum size. contextily keeps every tile
+    # in a directory of its own (with an output.pkl), that is deleted as a whole. The tiles read least recently
+    # (last access time, as joblib does) are the first to be deleted
+    print(f"         Running: {f_enforce_tile_cache.__name__}()")
+
+    if tile_cache["max_bytes"] is None:
+        return
+
+    tiles = []
+    for route_output in tile_cache["route"].rglob("output.pkl"):
+        size = sum(entry.stat().st_size for entry in route_output.parent.iterdir() if entry.is_file())
+        tiles.append((route_output.stat().st_atime, size, route_output.parent))
+    total = sum(size for _, size, _ in tiles)
+    if total <= tile_cache["max_bytes"]:
+        return
+
+    deleted = 0
+    for _, size, route_tile in sorted(tiles, key=lambda tile: tile[0]):
+        if total <= tile_cache["max_bytes"]:
+            break
+        shutil.rmtree(route_tile, ignore_errors=True)
+        total -= size
+        deleted += 1
+    print(f"          - {deleted} tiles deleted from the cache (least recently used)")
+
+
+def f_define_the_directories():
+    """
+    Returns
+    -------
+    Directories : dict
+        Dictionary with the routes to the defined directories.
+    """
+    print(f"         Running: {f_define_the_directories.__name__}()")
+    
+    Directory_general = Path(__file__).resolve().parent.parent
+
+    Directories = {
+        "General": Directory_general,
+        "Ancillary": Directory_general / "Ancillary",
+        "Inputs": Directory_general / "Inputs",
+        "Outputs": Directory_general / "Outputs",
+        "Raw_data": Directory_general / "Outputs" / "Raw_data",
+        "Columnar": Directory_general / "Outputs" / "Raw_data_columnar",
+        "Scripts": Directory_general / "Scripts",
+    }  # Add new lines if nedded
+    
+    # Make sure that these directories exist. If not, create them.
+    for directory_name, directory_path in Directories.items():
+        if not directory_path.exists():
+            directory_path.mkdir(parents=True)
+            print(f"          - Created directory: {directory_name} → {directory_path}")
+
+    return Directories
+
+
+def f_define_the_filename(datetime):
+    # Define the web route to the file (link_to_filename), and its name (filename), following the next convention:
+    # https://datalsasafwd.lsasvcs.ipma.pt/PRODUCTS/<satellite>/<product>/<format>/<year>/<month>/<day>/filename
+    # filename: LSA-509_MTG_MTFRPPIXEL-ListProduct_MTG-FD_YYYYMMDDHHMM.csv.gz
+    print(f"         Running: {f_define_the_filename.__name__}()") 
+    
+    Anc_web = LSASAF_URL
+    Anc_section = "PRODUCTS"
+    Anc_satellite = "MTG"
+    Anc_product = "MTFRPPixel"
+    Anc_format = "NATIVE"
+    Anc_YYYY = str(datetime.year).zfill(4)
+    Anc_MM = str(datetime.month).zfill(2)
+    Anc_DD = str(datetime.day).zfill(2)
+    Anc_HH = str(datetime.hour).zfill(2)
+    Anc_mm = str(datetime.minute).zfill(2)
+
+    webRoute = os.path.join(Anc_web,
+                            Anc_section,
+                            Anc_satellite,
+                            Anc_product,
+                            Anc_format,
+                            Anc_YYYY,
+                            Anc_MM,
+                            Anc_DD).replace("\\", "/")
+
+    filename = "LSA-509_MTG_MTFRPPIXEL-ListProduct_MTG-FD_{}{}{}{}{}.csv.gz".format(
+        Anc_YYYY, Anc_MM, Anc_DD, Anc_HH, Anc_mm
+    )
+
+    link_to_download_file = os.path.join(webRoute,filename).replace("\\", "/")
+   
+    return link_to_download_file, filename
+
+
+def f_define_the_timesteps(start_time, end_time):
+    # Define every timestep (10 min) from start_time (included) to end_time (excluded)
+    print(f"         Running: {f_define_the_timesteps.__name__}()")
+
+    timesteps = []
+    dt = start_time
+    while dt < end_time:
+        timesteps.append(dt)
+        dt = dt + timedelta(minutes=10)
+
+    return timesteps
+
+
+def f_open_metrics(directories, route_to_the_metrics=None):
+    """
+    Open the metrics of the run: every stage (download, parse, save, plot) of every timestep
+    is logged as a JSON line (frp_mtg_metrics.jsonl) and summarised in a text file in the
+    Prometheus exposition format (frp_mtg.prom), e.g. for the textfile collector of node_exporter.
+
+    Returns
+    -------
+    metrics : dict
+        Dictionary with the routes to both files, the summary of every stage
+        ({stage: {"count", "seconds"}}), the counters, the last values (gauges) and a
+        lock (the stages of the pipeline record their metrics from their own threads).
+    """
+    print(f"         Running: {f_open_metrics.__name__}()")
+
+    route = Path(route_to_the_metrics) if route_to_the_metrics is not None else directories["Outputs"]
+    route.mkdir(parents=True, exist_ok=True)
+
+    metrics = {
+        "route_log": route / f"{METRICS_PREFIX}_metrics.jsonl",
+        "route_prom": route / f"{METRICS_PREFIX}.prom",
+        "stages": {},
+        "counters": {
+            "requests_total": 0,
+            "not_available_total": 0,
+            "retries_total": 0,
+            "download_bytes_total": 0,
+            "parsed_rows_total": 0,
+            "timesteps_total": 0,
+        },
+        "gauges": {},
+        "lock": threading.Lock(),
+    }
+
+    print(f"          - Metrics in: {metrics['route_log']}")
+    print(f"                        {metrics['route_prom']}")
+
+    return metrics
+
+
+def f_record_metric(metrics, stage, seconds, **fields):
+    # Log the duration (and any other field) of a stage as a JSON line and add it to the summary of the stage
+    if metrics is None:
+        return
+
+    record = {"time_utc": datetime.now(tz=timezone.utc).isoformat(), "stage": stage, "seconds": round(seconds, 6), **fields}
+
+    with metrics["lock"]:
+        summary = metrics["stages"].setdefault(stage, {"count": 0, "seconds": 0.0, "last": 0.0})
+        summary["count"] += 1
+        summary["seconds"] += seconds
+        summary["last"] = seconds
+
+        with open(metrics["route_log"], "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+
+def f_update_metrics(metrics, counters=None, gauges=None, aoi=None):
+    # Add to the counters ({counter: increment}) and set the gauges ({gauge: value}, labelled by area of interest
+    # if aoi is defined) of the metrics. Always under their lock, as the stages of the pipeline update them from
+    # their own threads
+    if metrics is None:
+        return
+
+    with metrics["lock"]:
+        for counter, increment in (counters or {}).items():
+            metrics["counters"][counter] += increment
+        for gauge, value in (gauges or {}).items():
+            if aoi is None:
+                metrics["gauges"][gauge] = value
+            else:
+                metrics["gauges"].setdefault(gauge, {})[aoi] = value
+
+
+def f_export_metrics(metrics):
+    # Write the summary of the metrics in the Prometheus exposition format.
+    # It is written under a temporary name and renamed, so the collector never reads a half-written file.
+    # The metrics are copied under their lock, so they do not change while they are written
+    if metrics is None:
+        return
+
+    print(f"         Running: {f_export_metrics.__name__}()")
+
+    with metrics["lock"]:
+        stages = {stage: dict(summary) for stage, summary in metrics["stages"].items()}
+        counters = dict(metrics["counters"])
+        gauges = {gauge: dict(value) if isinstance(value, dict) else value for gauge, value in metrics["gauges"].items()}
+
+    lines = [
+        f"# HELP {METRICS_PREFIX}_stage_seconds Time spent in every stage of the timesteps",
+        f"# TYPE {METRICS_PREFIX}_stage_seconds summary",
+    ]
+    for stage, summary in sorted(stages.items()):
+        lines.append(f'{METRICS_PREFIX}_stage_seconds_sum{{stage="{stage}"}} {summary["seconds"]:.6f}')
+        lines.append(f'{METRICS_PREFIX}_stage_seconds_count{{stage="{stage}"}} {summary["count"]}')
+    lines.append(f"# TYPE {METRICS_PREFIX}_stage_last_seconds gauge")
+    for stage, summary in sorted(stages.items()):
+        lines.append(f'{METRICS_PREFIX}_stage_last_seconds{{stage="{stage}"}} {summary["last"]:.6f}')
+
+    for counter, value in counters.items():
+        lines.append(f"# TYPE {METRICS_PREFIX}_{counter} counter")
+        lines.append(f"{METRICS_PREFIX}_{counter} {value}")
+
+    # Gauges: {name: value} or {name: {label value: value}} (labelled by area of interest)
+    for gauge, value in sorted(gauges.items()):
+        lines.append(f"# TYPE {METRICS_PREFIX}_{gauge} gauge")
+        if isinstance(value, dict):
+            for aoi, aoi_value in sorted(value.items()):
+                lines.append(f'{METRICS_PREFIX}_{gauge}{{aoi="{aoi}"}} {aoi_value}')
+        else:
+            lines.append(f"{METRICS_PREFIX}_{gauge} {value}")
+
+    with metrics["lock"]:
+        route_temporary = f"{metrics['route_prom']}.tmp-{os.getpid()}"
+        with open(route_temporary, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(route_temporary, metrics["route_prom"])
+
+
+def f_get_credentials(filename=".credentials.ini"):
+    # Get credentials from an ini file located in the same directory than the script.
+    # Every section whose name starts with "gitlab" ([gitlab], [gitlab_backup], ...) is an account, in order of preference.
+    # Return a list of (username, password)
+    print(f"         Running: {f_get_credentials.__name__}()")
+    
+    config = configparser.ConfigParser()
+
+    cred_path = Path(__file__).parent / filename
+
+    if not cred_path.exists():
+        raise FileNotFoundError(
+            f"           - Credentials file not found: {cred_path}"
+        )
+
+    config.read(cred_path)
+
+    sections = [section for section in config.sections() if section.lower().startswith("gitlab")]
+    try:
+        accounts = [(config[section]["username"], config[section]["password"]) for section in sections]
+        
+    except KeyError as e:
+        raise KeyError(
+            f"           - Missing keys (username, password) in a [gitlab] section of the credentials file: {e}"
+        ) from e
+
+    if not accounts:
+        raise KeyError(
+            "           - Missing [gitlab] section in credentials file"
+        )
+    
+    return accounts
+
+
+def f_open_rate_limiter(directories, rate=RATE_LIMIT, burst=RATE_BURST):
+    """
+    Open the rate limiter of the requests to the repository: a token bucket kept in a SQLite
+    database (Ancillary/rate_limiter.sqlite), so that it is shared by every download, thread
+    and process of this host. It also keeps the accounts that are cooling down.
+
+    Returns
+    -------
+    limiter : dict
+        Dictionary with the route to the database, its connection, the rate (requests per
+        second) and the burst (requests at once), and the seconds waited for a token.
+    """
+    print(f"         Running: {f_open_rate_limiter.__name__}()")
+
+    route = Path(directories["Ancillary"]) / "rate_limiter.sqlite"
+    connection = sqlite3.connect(route, timeout=60, isolation_level=None, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("CREATE TABLE IF NOT EXISTS bucket (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+    connection.execute("CREATE TABLE IF NOT EXISTS cooldowns (username TEXT PRIMARY KEY, until REAL NOT NULL)")
+
+    limiter = {
+        "route": route,
+        "connection": connection,
+        "lock": threading.Lock(),
+        "rate": rate,
+        "burst": max(1, burst),
+        "waited": 0.0,
+    }
+
+    print(f"          - Requests to the repository limited to {rate} per second (bursts of {limiter['burst']})")
+
+    return limiter
+
+
+def f_acquire_token(limiter):
+    # Wait until the token bucket has a token and take it (one per request). The bucket is refilled at the rate of
+    # the limiter, up to its burst. The database is locked (BEGIN IMMEDIATE) while the bucket is updated, so every
+    # thread and process of this host sees the same bucket
+    if limiter is None:
+        return
+
+    while True:
+        with limiter["lock"]:
+            connection = limiter["connection"]
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = connection.execute("SELECT tokens, updated FROM bucket WHERE name = 'lsasaf'").fetchone()
+                tokens = limiter["burst"] if row is None else min(limiter["burst"], row[0] + max(now - row[1], 0) * limiter["rate"])
+                wait = 0.0 if tokens >= 1 else (1 - tokens) / limiter["rate"]
+                tokens = tokens - 1 if tokens >= 1 else tokens
+                connection.execute("INSERT OR REPLACE INTO bucket (name, tokens, updated) VALUES ('lsasaf', ?, ?)", (tokens, now))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+        if wait == 0:
+            return
+        limiter["waited"] += wait
+        time.sleep(wait)
+
+
+def f_get_cooldowns(client):
+    # Return the accounts that are cooling down now ({username: until, as a timestamp}),
+    # shared with the other processes through the rate limiter (if any)
+    now = time.time()
+    if client["limiter"] is None:
+        with client["lock"]:
+            return {username: until for username, until in client["cooldowns"].items() if until > now}
+
+    with client["limiter"]["lock"]:
+        rows = client["limiter"]["connection"].execute("SELECT username, until FROM cooldowns WHERE until > ?", (now,)).fetchall()
+    return dict(rows)
+
+
+def f_cool_down_account(client, username, seconds):
+    # Leave an account aside for some seconds (shared with the other processes through the rate limiter, if any)
+    until = time.time() + seconds
+    if client["limiter"] is None:
+        with client["lock"]:
+            client["cooldowns"][username] = until
+        return
+
+    with client["limiter"]["lock"]:
+        client["limiter"]["connection"].execute(
+            "INSERT INTO cooldowns (username, until) VALUES (?, ?) "
+            "ON CONFLICT(username) DO UPDATE SET until = MAX(until, excluded.until)", (username, until))
+
+
+def f_request(client, method, url, **kwargs):
+    # Send a request to the repository through the shared session: wait for a token of the rate limiter (if any)
+    # and use the first account (in order of preference) that is not cooling down. If the repository rejects (401,
+    # 403) or throttles (429) an account, it cools down (for --account-cooldown seconds, or as long as the repository
+    # asks) and the request is sent again with the next account. If every account is cooling down, the answer of
+    # the repository is returned, and the next request waits until the first account is available again.
+    # Raise requests.exceptions.RequestException if the repository does not answer (or the downloads are stopped)
+    while True:
+        cooldowns = f_get_cooldowns(client)
+        available = [account for account in client["accounts"] if account[0] not in cooldowns]
+        if not available:
+            wait = min(cooldowns.values()) - time.time()
+            print(f"          - Every account is cooling down. Waiting {wait:.0f} seconds")
+            if client["stop"].wait(max(wait, 0)):
+                raise requests.exceptions.RequestException("The downloads were stopped")
+            continue
+        account = available[0]
+
+        f_acquire_token(client["limiter"])
+        req = client["session"].request(method, url, auth=account, timeout=client["timeout"], **kwargs)
+
+        if req.status_code not in (401, 403, 429):
+            return req
+
+        # The account is rejected or throttled: leave it aside
+        retry_after = req.headers.get("Retry-After", "")
+        seconds = int(retry_after) if req.status_code == 429 and retry_after.isdigit() else client["cooldown"]
+        f_cool_down_account(client, account[0], seconds)
+        print(f"          - Account {account[0]} got code {req.status_code}. Cooling it down for {seconds} seconds")
+
+        if len(available) == 1: # No other account
+            return req
+        req.close()
+        print("          - Trying with the next account")
+
+
+def f_open_session(connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, pool_size=MAX_WORKERS_LSASAF, credentials=None, limiter=None, cooldown=ACCOUNT_COOLDOWN):
+    """
+    Open a long-lived session to the gitlab repository. It keeps the connections alive
+    (no new TCP+TLS handshake per request), shares a pool of connections between
+    concurrent downloads, and loads the credentials only once. Every request is sent
+    through f_request (rate limiter and failover between the accounts).
+
+    Returns
+    -------
+    client : dict
+        Dictionary with the session, the timeouts to use in every request, the accounts
+        (in order of preference), the accounts cooling down, the rate limiter (or None),
+        the cooldown of the rejected accounts (seconds) and the event that stops every
+        download and every wait for the repository (e.g. when the daemon stops).
+    """
+    print(f"         Running: {f_open_session.__name__}()")
+
+    # Get the users and passwords to access gitlab repository (only once), unless they are given
+    # (one (username, password) or a list of them)
+    accounts = f_get_credentials() if credentials is None else credentials
+    if isinstance(accounts[0], str):
+        accounts = [accounts]
+    if len(accounts) > 1:
+        print(f"          - {len(accounts)} accounts. The next one is used if the repository rejects the previous one")
+
+    session = requests.Session()
+
+    # Pool of connections. Retries are handled by the scheduler, not by the adapter
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    client = {
+        "session": session,
+        "timeout": (connect_timeout, read_timeout),
+        "accounts": [tuple(account) for account in accounts],
+        "cooldowns": {},
+        "lock": threading.Lock(),
+        "limiter": limiter,
+        "cooldown": cooldown,
+        "stop": threading.Event(),
+    }
+
+    return client
+
+
+def f_close_session(client):
+    # Close the connections of the session
+    print(f"         Running: {f_close_session.__name__}()")
+
+    client["session"].close()
+
+
+def f_open_raw_cache(directories, max_mb=None, max_days=None, region=None):
+    """
+    Define the limits of the directory with the downloaded products (Raw_data).
+    If a region is defined, only the pixels inside it are kept, in a subdirectory of
+    Raw_data (and of Raw_data_columnar) named after the region, so that a trimmed
+    product is never mistaken for a full-disk one. directories is updated accordingly.
+
+    Returns
+    -------
+    raw_cache : dict
+        Dictionary with the route, the maximum size (bytes), the maximum age (seconds),
+        the region ([W, S, E, N] or None), and the products downloaded but not read yet
+        (filenames, set), that are never deleted, with their lock.
+    """
+    print(f"         Running: {f_open_raw_cache.__name__}()")
+
+    if region is not None:
+        f_check_coordinates(region)
+        region_name = "Region_{}_{}_{}_{}".format(*region)
+        for directory_name in ("Raw_data", "Columnar"):
+            directories[directory_name] = directories[directory_name] / region_name
+            directories[directory_name].mkdir(parents=True, exist_ok=True)
+        print(f"          - Keeping only the pixels inside {region} in {directories['Raw_data']}")
+
+    raw_cache = {
+        "route": directories["Raw_data"],
+        "route_columnar": directories["Columnar"],
+        "max_bytes": None if max_mb is None else max_mb * 1e6,
+        "max_age": None if max_days is None else max_days * 86400,
+        "region": region,
+        "pending": set(),
+        "lock": threading.Lock(),
+    }
+
+    return raw_cache
+
+
+def f_check_region(raw_cache, aois):
+    # Check that every area of interest is inside the region kept in the downloaded products
+    print(f"         Running: {f_check_region.__name__}()")
+
+    if raw_cache["region"] is None:
+        return
+
+    W, S, E, N = raw_cache["region"]
+    for aoi in aois:
+        w, s, e, n = aoi["bbox"]
+        if w < W or s < S or e > E or n > N:
+            raise ValueError(f"{aoi['name']} is not inside the region kept in the downloaded products (--raw-region)")
+
+
+def f_trim_to_region(route_to_the_file, region):
+    # Keep only the pixels of a compressed csv that are inside the region (the file is rewritten atomically).
+    # The csv is read and written by chunks, so the memory used does not depend on the size of the product.
+    # Every column is kept as text, so the pixels kept are written exactly as they were
+    W, S, E, N = region
+
+    route_temporary = f"{route_to_the_file}.tmp-{os.getpid()}"
+    with pd.read_csv(route_to_the_file, compression='gzip', dtype=str, keep_default_na=False,
+                     chunksize=STREAM_CHUNKSIZE) as reader, gzip.open(route_temporary, "wt", newline="") as f:
+        for number, chunk in enumerate(reader):
+            lon = pd.to_numeric(chunk['LONGITUDE'])
+            lat = pd.to_numeric(chunk['LATITUDE'])
+            chunk[(lon >= W) & (lon <= E) & (lat >= S) & (lat <= N)].to_csv(f, index=False, header=number == 0)
+    os.replace(route_temporary, route_to_the_file)
+
+
+def f_check_gzip(route_to_the_file):
+    # Return True if the compressed file is complete and not corrupted: it is decompressed (by chunks, without
+    # keeping anything) to its end, where gzip checks the CRC and the size of the data
+    try:
+        with gzip.open(route_to_the_file, "rb") as f:
+            while f.read(DOWNLOAD_CHUNK):
+                pass
+    except (OSError, EOFError, zlib.error):
+        return False
+
+    return True
+
+
+def f_check_product(route_to_download_file, directories):
+    # Return True if a downloaded product can be used. Products downloaded before their integrity was checked
+    # (or damaged on disk) are decompressed once to check them, unless they already have a columnar copy.
+    # A corrupted product is deleted, so it is downloaded again instead of breaking every run
+    name_of_the_file = os.path.basename(route_to_download_file)
+    if os.path.isdir(os.path.join(directories["Columnar"], name_of_the_file.removesuffix(".csv.gz"))):
+        return True
+
+    if f_check_gzip(route_to_download_file):
+        return True
+
+    print(f"          - {name_of_the_file} is corrupted. Deleting it to download it again")
+    try:
+        os.remove(route_to_download_file)
+    except FileNotFoundError:
+        pass
+
+    return False
+
+
+def f_touch_product(route_to_download_file):
+    # Mark a downloaded product as used now (the least recently used products are the first to be deleted)
+    try:
+        os.utime(route_to_download_file)
+    except FileNotFoundError:
+        pass
+
+
+def f_hold_product(raw_cache, filename):
+    # Keep a downloaded product that has not been read yet (e.g. in a backfill, or in the pipeline) out of
+    # f_enforce_raw_cache, until it is released with f_release_product
+    if raw_cache is not None:
+        with raw_cache["lock"]:
+            raw_cache["pending"].add(filename)
+
+
+def f_release_product(raw_cache, filename):
+    # Let a product that has been read be deleted again by f_enforce_raw_cache
+    if raw_cache is not None:
+        with raw_cache["lock"]:
+            raw_cache["pending"].discard(filename)
+
+
+def f_enforce_raw_cache(raw_cache):
+    # Delete the downloaded products (and their columnar copies) that were used too long ago, and then
+    # the least recently used ones until the total size is below the limit.
+    # The products downloaded but not read yet (pending) are never deleted, even if the limit is exceeded meanwhile
+    print(f"         Running: {f_enforce_raw_cache.__name__}()")
+
+    if raw_cache["max_bytes"] is None and raw_cache["max_age"] is None:
+        return
+
+    with raw_cache["lock"]:
+        pending = set(raw_cache["pending"])
+
+    products = []
+    for entry in os.scandir(raw_cache["route"]):
+        if not (entry.is_file() and entry.name.endswith(".csv.gz")):
+            continue # Partial downloads (.part) and subdirectories are not products
+        if entry.name in pending:
+            continue
+        route_columnar = os.path.join(raw_cache["route_columnar"], entry.name.removesuffix(".csv.gz"))
+        size = entry.stat().st_size
+        if os.path.isdir(route_columnar):
+            size += sum(column.stat().st_size for column in os.scandir(route_columnar))
+        products.append((entry.stat().st_mtime, size, entry.path, route_columnar))
+
+    products.sort() # Least recently used first
+    total = sum(size for _, size, _, _ in products)
+    now = time.time()
+    deleted = 0
+
+    for last_use, size, route, route_columnar in products:
+        too_old = raw_cache["max_age"] is not None and now - last_use > raw_cache["max_age"]
+        too_large = raw_cache["max_bytes"] is not None and total > raw_cache["max_bytes"]
+        if not (too_old or too_large):
+            continue
+        os.remove(route)
+        shutil.rmtree(route_columnar, ignore_errors=True)
+        total -= size
+        deleted += 1
+
+    if deleted:
+        print(f"          - Deleted {deleted} products. Raw data: {total/1e6:.1f} MB")
+
+
+def f_parse_content_range(content_range):
+    # Parse the Content-Range header of a partial answer ("bytes start-end/total") or of a 416 ("bytes */total").
+    # Return (start, end, total), with None for the unknown parts ("*"), or None if there is no valid header
+    if content_range is None:
+        return None
+
+    match = re.fullmatch(r"\s*bytes\s+(?:(\d+)-(\d+)|\*)/(\d+|\*)\s*", content_range)
+    if match is None:
+        return None
+    start, end, total = (None if value in (None, "*") else int(value) for value in match.groups())
+    if start is not None and (end < start or (total is not None and end >= total)):
+        return None
+
+    return start, end, total
+
+
+def f_remove_partial(route_temporary):
+    # Delete a partial download (if any), so the file is downloaded again from the start
+    if os.path.isfile(route_temporary):
+        os.remove(route_temporary)
+
+
+def f_download_file(link_to_download_file, filename, directories, client, raw_cache=None):
+    # Request the FRP data to its repository in gitlab (no waiting) and save it.
+    # The file is streamed by chunks into a partial file (.part), and only renamed to its final name once it is
+    # complete (as long as the Content-Length) and its gzip is not corrupted, so a product on disk is always valid.
+    # An interrupted download is resumed from where it stopped (HTTP Range), also in the next try or run, but only
+    # if the repository sends exactly the rest of the file (Content-Range). Otherwise, the partial file is discarded.
+    # Return the status code of the request and the number of bytes downloaded (0 if nothing was downloaded)
+    # The status code is 0 if the repository did not answer (timeout or connection error) or the file was not valid
+    print(f"         Running: {f_download_file.__name__}()")
+
+    # Define the route to download the file (including its name and format)
+    Route_to_download_file = os.path.join(directories["Raw_data"], filename)
+    Route_temporary = f"{Route_to_download_file}.part"
+
+    # If the file already exists in the directory, do not request it again
+    if os.path.isfile(Route_to_download_file) and f_check_product(Route_to_download_file, directories):
+        f_touch_product(Route_to_download_file)
+        return 200, 0
+
+    number_of_bytes = 0
+    for resume in range(DOWNLOAD_RESUMES + 1):
+        offset = os.path.getsize(Route_temporary) if os.path.isfile(Route_temporary) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else None
+
+        # Request the file (or the rest of it) through the shared session
+        try:
+            with f_request(client, "GET", link_to_download_file, headers=headers, stream=True) as req:
+                status_code = req.status_code
+
+                content_range = f_parse_content_range(req.headers.get("Content-Range"))
+
+                if status_code == 416: # The partial file is already complete (if its size is the size of the file)
+                    if content_range is None or content_range[2] != offset:
+                        print("          - The partial file is not part of this product. Downloading it again")
+                        f_remove_partial(Route_temporary)
+                        continue
+                    status_code = 200
+                    expected_size = offset
+                elif status_code in (200, 206):
+                    # Resume only if the repository sends exactly the rest of the file. Otherwise, start again
+                    if status_code == 206 and (content_range is None or content_range[0] != offset):
+                        print(f"          - Unexpected Content-Range ({req.headers.get('Content-Range')}). Downloading the whole file again")
+                        f_remove_partial(Route_temporary)
+                        continue
+                    if status_code == 200:
+                        offset = 0
+
+                    # The size is only known if the repository says it, and does not compress the answer on the fly
+                    content_length = req.headers.get("Content-Length")
+                    encoded = req.headers.get("Content-Encoding", "identity") != "identity"
+                    if status_code == 206:
+                        expected_size = content_range[2] if content_range[2] is not None else content_range[1] + 1
+                    else:
+                        expected_size = int(content_length) if content_length and not encoded else None
+
+                    with open(Route_temporary, "ab" if offset else "wb") as f:
+                        for chunk in req.iter_content(chunk_size=DOWNLOAD_CHUNK):
+                            if client["stop"].is_set(): # Stopped: the partial file is resumed in the next run
+                                return 0, number_of_bytes
+                            f.write(chunk)
+                            number_of_bytes += len(chunk)
+                    status_code = 200
+                else:
+                    return status_code, number_of_bytes
+
+        except requests.exceptions.RequestException as e:
+            if not os.path.isfile(Route_temporary) or os.path.getsize(Route_temporary) == offset:
+                print(f"          - No answer from the repository: {e}")
+                return 0, number_of_bytes
+            print(f"          - Download interrupted at {os.path.getsize(Route_temporary)/1e6:.2f} MB. Resuming it")
+            continue
+
+        # Check that the file is complete before checking its content
+        if expected_size is not None and os.path.getsize(Route_temporary) < expected_size:
+            print(f"          - Download interrupted at {os.path.getsize(Route_temporary)/1e6:.2f} MB "
+                  f"of {expected_size/1e6:.2f} MB. Resuming it")
+            continue
+        break
+    else:
+        return 0, number_of_bytes # It will be resumed in the next try
+
+    # A file that is longer than expected or not a valid gzip is deleted, so it is downloaded again from scratch
+    if (expected_size is not None and os.path.getsize(Route_temporary) != expected_size) or not f_check_gzip(Route_temporary):
+        print(f"          - {filename} was not downloaded correctly. Deleting it to download it again")
+        os.remove(Route_temporary)
+        return 0, number_of_bytes
+
+    # Make the product visible (only when it is complete and valid)
+    if raw_cache is not None and raw_cache["region"] is not None:
+        f_trim_to_region(Route_temporary, raw_cache["region"])
+    os.replace(Route_temporary, Route_to_download_file)
+
+    return status_code, number_of_bytes
+
+
+def f_load_latency(directories):
+    """
+    Load the publication latencies (minutes from the acquisition until the timestep is
+    available in the repository) observed in previous runs.
+
+    Returns
+    -------
+    latency : dict
+        Dictionary with the route to the file that keeps the latencies and their histogram
+        ({minutes: number of timesteps}).
+    """
+    print(f"         Running: {f_load_latency.__name__}()")
+
+    latency = {
+        "route": os.path.join(directories["Ancillary"], "publication_latency.json"),
+        "histogram": {},
+    }
+
+    if os.path.isfile(latency["route"]):
+        with open(latency["route"], "r", encoding="utf-8") as f:
+            latency["histogram"] = json.load(f).get("histogram", {})
+
+    observations = sum(latency["histogram"].values())
+    if observations:
+        print(f"          - {observations} latencies observed. "
+              f"P10: {f_predict_latency(latency, 10)} min, "
+              f"P50: {f_predict_latency(latency, 50)} min, "
+              f"P90: {f_predict_latency(latency, 90)} min")
+
+    return latency
+
+
+def f_predict_latency(latency, percentile=PUBLICATION_PERCENTILE):
+    # Minutes after the acquisition when the timestep should be available in the repository:
+    # the percentile of the observed latencies, or the nominal delay while there are too few observations
+    histogram = latency["histogram"]
+
+    if sum(histogram.values()) < PUBLICATION_MIN_OBSERVATIONS:
+        return PUBLICATION_DELAY
+
+    minutes = sorted(int(m) for m in histogram)
+    counts = np.array([histogram[str(m)] for m in minutes])
+    cumulative = np.cumsum(counts) / counts.sum()
+
+    return minutes[int(np.searchsorted(cumulative, percentile / 100))]
+
+
+def f_record_latency(latency, acquisition_time, upper_bound=False):
+    # Add the latency of a timestep that has just become available to the histogram and save it.
+    # If it was available at the first try, the latency is an upper bound (it was published before)
+    print(f"         Running: {f_record_latency.__name__}()")
+
+    minutes = int((datetime.now(tz=timezone.utc) - acquisition_time).total_seconds() // 60)
+    latency["histogram"][str(minutes)] = latency["histogram"].get(str(minutes), 0) + 1
+    print(f"          - Available {'at most ' if upper_bound else ''}{minutes} min after the acquisition")
+
+    # Write it under a temporary name and rename it, so the file is never half-written
+    route_temporary = f"{latency['route']}.tmp-{os.getpid()}"
+    with open(route_temporary, "w", encoding="utf-8") as f:
+        json.dump({"histogram": latency["histogram"]}, f, indent=1, sort_keys=True)
+    os.replace(route_temporary, latency["route"])
+
+
+def f_open_listings(ttl=LISTING_TTL):
+    """
+    Prepare the cache of the listings of the day directories of the repository
+    (.../NATIVE/YYYY/MM/DD/), that tell which timesteps exist without asking for them.
+
+    Returns
+    -------
+    listings : dict
+        Dictionary with the listing of every day directory requested ({link: (moment when it
+        was requested, set of filenames)}), the time to live of the listings of the days that
+        are not complete yet, and the number of listings requested.
+    """
+    print(f"         Running: {f_open_listings.__name__}()")
+
+    listings = {
+        "days": {},
+        "ttl": ttl,
+        "requests": 0,
+    }
+
+    return listings
+
+
+def f_list_day(link_to_the_day, client, listings, complete=False):
+    # Return the set of products in a day directory of the repository, from the cache if it is still valid
+    # (forever if the day is complete). Return None if the listing cannot be used (no answer, error, or no
+    # product in it, e.g. if the day directory does not exist yet), so that the files are asked one by one
+    cached = listings["days"].get(link_to_the_day)
+    if cached is not None and (complete or time.monotonic() - cached[0] < listings["ttl"]):
+        return cached[1]
+
+    print(f"         Running: {f_list_day.__name__}()")
+
+    listings["requests"] += 1
+    try:
+        req = f_request(client, "GET", link_to_the_day)
+    except requests.exceptions.RequestException as e:
+        print(f"          - No answer from the repository: {e}")
+        return None
+
+    if req.status_code != 200:
+        return None
+
+    filenames = set(re.findall(r"LSA-509_MTG_MTFRPPIXEL-ListProduct_MTG-FD_\d{12}\.csv\.gz", req.text))
+    if not filenames:
+        return None
+
+    listings["days"][link_to_the_day] = (time.monotonic(), filenames)
+    print(f"          - {len(filenames)} timesteps available in {link_to_the_day}")
+
+    return filenames
+
+
+def f_check_listing(link_to_download_file, client, listings, acquisition_time):
+    # Check in the listing of its day directory whether a timestep exists in the repository.
+    # Return True (it exists), False (it does not exist yet) or None (unknown: ask for the file)
+    if listings is None:
+        return None
+
+    link_to_the_day, filename = link_to_download_file.rsplit("/", 1)
+
+    # The day is complete once its last timestep should have been published
+    end_of_the_day = acquisition_time.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    complete = datetime.now(tz=timezone.utc) - end_of_the_day > PROBE_WINDOW
+
+    filenames = f_list_day(link_to_the_day + "/", client, listings, complete)
+    if filenames is None:
+        return None
+
+    return filename in filenames
+
+
+def f_probe_file(link_to_download_file, client):
+    # Ask the repository whether the file exists without downloading it (HEAD request)
+    # Return the status code (0 if the repository did not answer). If HEAD is not allowed, return 200
+    # so that the file is requested directly
+    print(f"         Running: {f_probe_file.__name__}()")
+
+    try:
+        req = f_request(client, "HEAD", link_to_download_file, allow_redirects=True)
+    except requests.exceptions.RequestException as e:
+        print(f"          - No answer from the repository: {e}")
+        return 0
+
+    if req.status_code in (405, 501): # HEAD not allowed
+        return 200
+
+    return req.status_code
+
+
+def f_scheduler(waiting_time, stop=None):
+    # Wait until the next try, or until stop (if any) is set
+    print(f"         Running: {f_scheduler.__name__}()")
+    
+    print(f"          - Waiting {waiting_time:.0f} seconds")
+    print(f"          - New try at {datetime.now()+timedelta(seconds=waiting_time)}")
+
+    if stop is None:
+        time.sleep(waiting_time)
+    else:
+        stop.wait(waiting_time)
+    
+    
+def f_call_to_lsasaf(link_to_download_file, filename, directories, notifier, waiting_time, client, acquisition_time, latency, raw_cache=None, metrics=None, listings=None):
+    # Request the FRP data to its repository in gitlab and save it.
+    # If it is not available yet, wait (in a loop, not recursively) until it is:
+    #  1. Sleep until the moment when the timestep should be available (acquisition + observed latency).
+    #  2. From then on, ask with cheap HEAD requests, waiting more and more between them
+    #     (exponential backoff with jitter, up to waiting_time seconds).
+    #  3. Download the file only once the repository says it exists.
+    # If there are listings, the listing of the day directory tells whether the file exists (instead of asking for it).
+    # Return True when the file is available, and False if it is missing in the repository (a listing of an old
+    # timestep does not have it), so it is not asked for again and again, or if the downloads are stopped meanwhile.
+    # The time waiting, the requests, the 404s and the download (bytes and seconds) are recorded in the metrics (if any)
+    print(f"         Running: {f_call_to_lsasaf.__name__}()") 
+
+    time_start = time.perf_counter()
+
+    # Define the route to download the file (including its name and format)
+    Route_to_download_file = os.path.join(directories["Raw_data"],filename)
+        
+    # Check if the file already exists in the directory. Note that the product
+    # that this section downloads is the whole view from the satellite, not just 
+    # the area within the bbox. If it already exists, return to the main function.
+    if os.path.isfile(Route_to_download_file) and f_check_product(Route_to_download_file, directories):
+        print(f"          - {filename} already exists in {directories['Raw_data']}. Not requesting it.")
+        f_touch_product(Route_to_download_file)
+        f_record_metric(metrics, "download", time.perf_counter() - time_start, timestep=acquisition_time, cached=True)
+        return True
+
+    # Moment when the timestep should be available in the repository (asked a bit earlier, so that
+    # the latencies observed can also move earlier)
+    expected_time = acquisition_time + timedelta(minutes=f_predict_latency(latency) - PUBLICATION_EARLY_PROBE)
+
+    attempt = 0
+    waited = False
+    requests_sent = 0
+    not_available = 0
+    download_seconds = 0.0
+    while True:
+        if client["stop"].is_set():
+            print(f"          - Downloads stopped. {filename} is not requested any more")
+            return False
+        now = datetime.now(tz=timezone.utc)
+
+        # Too early: wait until the expected moment (no request at all)
+        if now < expected_time:
+            print(f"          - Timestep expected at {expected_time}")
+            f_scheduler((expected_time - now).total_seconds(), client["stop"])
+            waited = True
+            continue
+
+        # Look for the timestep in the listing of its day (if any). Otherwise, recent timesteps are probed
+        # first (HEAD). Older ones are most likely available, so they are requested directly
+        listed = f_check_listing(link_to_download_file, client, listings, acquisition_time)
+        if listed is False and now - acquisition_time >= PROBE_WINDOW:
+            print(f"          - {filename} is missing in the repository")
+            return False
+        elif listed is not None:
+            status_code = 200 if listed else 404
+        elif now - acquisition_time < PROBE_WINDOW:
+            status_code = f_probe_file(link_to_download_file, client)
+            requests_sent += 1
+        else:
+            status_code = 200
+
+        # Request the file (and write it in the appropriate directory if it exists in the repository)
+        if status_code==200:
+            time_download = time.perf_counter()
+            status_code, number_of_bytes = f_download_file(link_to_download_file, filename, directories, client, raw_cache)
+            download_seconds += time.perf_counter() - time_download
+            requests_sent += 1
+    
+        # If the file exists in the repository
+        if status_code==200: # 200 is the code for "everything went OK"
+            # The latency is accurate if the timestep was seen unavailable (404) before, and an upper bound if it was
+            # available at the first try after waiting for it (not if it was requested late, e.g. in a backfill, even
+            # if the repository failed meanwhile)
+            latency_observed = not_available > 0 or waited
+            if latency_observed:
+                f_record_latency(latency, acquisition_time, upper_bound=not_available == 0)
+            if metrics is not None:
+                available_after = (datetime.now(tz=timezone.utc) - acquisition_time).total_seconds()
+                f_record_metric(metrics, "download", time.perf_counter() - time_start, timestep=acquisition_time,
+                                cached=False, requests=requests_sent, not_available=not_available, retries=attempt,
+                                bytes=number_of_bytes, download_seconds=round(download_seconds, 6),
+                                available_after_seconds=round(available_after, 1), latency_observed=latency_observed)
+                gauges = {
+                    "download_seconds": round(download_seconds, 6),
+                    "download_bytes_per_second": round(number_of_bytes / max(download_seconds, 1e-9), 1),
+                }
+                if latency_observed: # Acquisition-to-available latency (accurate or upper bound, see above)
+                    gauges["publication_latency_seconds"] = round(available_after, 1)
+                f_update_metrics(metrics, counters={"requests_total": requests_sent, "not_available_total": not_available,
+                                                    "retries_total": attempt, "download_bytes_total": number_of_bytes},
+                                 gauges=gauges)
+            if notifier is not None: # If there is a notifier
+                notifier()
+            return True
+    
+        # If the file doesn't exist yet (is not yet available at the repository), or the repository cannot answer now:
+        # 0 means that the repository did not answer in time, 429 too many requests, and 5xx an error of the server
+        elif status_code in (404, 0, 429) or status_code >= 500:
+            print("          - Timestep not available yet")
+            not_available += status_code == 404
+            # Wait before the next try: exponential backoff (up to waiting_time) with jitter
+            backoff = min(waiting_time, PROBE_BACKOFF * 2**attempt)
+            attempt += 1
+            f_scheduler(random.uniform(backoff / 2, backoff), client["stop"])
+        
+        else: # If the error is neither 200 nor 404
+            raise RuntimeError(f"          - Error for {link_to_download_file}: code {status_code}")
+
+
+def f_backfill(timesteps, directories, max_workers, client, raw_cache=None, metrics=None, listings=None):
+    # Download in parallel (with a bounded pool of workers) the FRP data of a list of past timesteps
+    # If there are listings, only the timesteps in the listings of their days are requested (the rest get 404)
+    # Return a dictionary with the status code of every timestep
+    # The time, the files and the bytes downloaded are recorded in the metrics (if any)
+    print(f"         Running: {f_backfill.__name__}()")
+
+    # Keep the number of simultaneous downloads inside the quota of the repository
+    if max_workers > MAX_WORKERS_LSASAF:
+        print(f"          - WARNING: --max-workers {max_workers} is too high. Using {MAX_WORKERS_LSASAF}")
+        max_workers = MAX_WORKERS_LSASAF
+    max_workers = max(1, max_workers)
+
+    print(f"          - Requesting {len(timesteps)} timesteps with {max_workers} workers")
+
+    status_codes = {}
+    number_of_files = 0
+    number_of_bytes = 0
+    time_start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for dt in timesteps:
+            link_to_download_file, filename = f_define_the_filename(dt)
+            if f_check_listing(link_to_download_file, client, listings, dt) is False:
+                status_codes[dt] = 404 # Not in the repository (yet): not requested
+                continue
+            future = executor.submit(f_download_file, link_to_download_file, filename, directories, client, raw_cache)
+            futures[future] = dt
+
+        for future in as_completed(futures):
+            dt = futures[future]
+            status_code, size = future.result()
+            status_codes[dt] = status_code
+            if status_code == 200: # Not deleted until it is read
+                f_hold_product(raw_cache, f_define_the_filename(dt)[1])
+            if size > 0: # Only the files that were actually downloaded
+                number_of_files += 1
+                number_of_bytes += size
+
+    elapsed = max(time.perf_counter() - time_start, 1e-9)
+
+    # Report the throughput
+    missing = sorted(dt for dt, status_code in status_codes.items() if status_code != 200)
+    print(f"          - Downloaded {number_of_files} files ({number_of_bytes/1e6:.2f} MB) in {elapsed:.1f} s")
+    print(f"          - Throughput: {number_of_files/elapsed:.2f} files/s, {number_of_bytes/1e6/elapsed:.2f} MB/s")
+    if missing:
+        print(f"          - {len(missing)} timesteps not available yet. They will be requested again in order")
+
+    if metrics is not None:
+        f_record_metric(metrics, "backfill", elapsed, timesteps=len(timesteps), files=number_of_files,
+                        bytes=number_of_bytes, not_available=len(missing), workers=max_workers)
+        f_update_metrics(metrics, counters={"requests_total": len(futures), "download_bytes_total": number_of_bytes})
+        f_export_metrics(metrics)
+
+    return status_codes
+
+
+def f_open_columnar_cache(directories):
+    """
+    Returns
+    -------
+    cache : dict
+        Dictionary with the route to the columnar cache and its hit/miss statistics.
+    """
+    print(f"         Running: {f_open_columnar_cache.__name__}()")
+
+    cache = {
+        "route": directories["Columnar"],
+        "hits": 0,
+        "misses": 0,
+    }
+
+    return cache
+
+
+def f_report_columnar_cache(cache):
+    # Print the statistics of the columnar cache
+    print(f"         Running: {f_report_columnar_cache.__name__}()")
+
+    requests_to_cache = cache["hits"] + cache["misses"]
+    ratio = cache["hits"] / requests_to_cache * 100 if requests_to_cache else 0
+    print(f"          - Columnar cache: {cache['hits']} hits, {cache['misses']} misses ({ratio:.1f}% hits)")
+
+
+def f_convert_to_columnar(route_to_the_file, name_of_the_file, route_to_the_cache):
+    # Convert the compressed csv into a directory with one binary file (.npy) per column that is read (FRP_COLUMNS).
+    # The coordinates are stored as float32 and the FRP as float64 (so that its sums are exactly the same as
+    # from the csv), so that every column is typed, compact and can be memory-mapped. The directory is written
+    # under a temporary name and renamed at the end, so a half-written conversion is never read.
+    # The csv is streamed by chunks into raw files on disk, that are then sorted by latitude (so the spatial
+    # index of the product comes for free) into the .npy files by blocks, so the memory used does not grow with
+    # the size of the product (only the order of the rows is kept in memory).
+    print(f"         Running: {f_convert_to_columnar.__name__}()")
+
+    stem = name_of_the_file.removesuffix(".csv.gz")
+    route_final = os.path.join(route_to_the_cache, stem)
+    route_temporary = f"{route_final}.tmp-{os.getpid()}"
+    os.makedirs(route_temporary, exist_ok=True)
+
+    # Stream the columns, unsorted, into raw files
+    dtypes = {column: np.float64 if column == "FRP" else np.float32 for column in FRP_COLUMNS}
+    routes_raw = {column: os.path.join(route_temporary, f"{column}.raw") for column in FRP_COLUMNS}
+    number_of_rows = 0
+    files_raw = {column: open(route, "wb") for column, route in routes_raw.items()}
+    try:
+        for chunk in f_iter_frp_chunks(route_to_the_file, name_of_the_file):
+            for column, f in files_raw.items():
+                chunk[column].tofile(f)
+            number_of_rows += len(chunk["FRP"])
+    finally:
+        for f in files_raw.values():
+            f.close()
+
+    # Sort them by latitude into the .npy files, by blocks
+    if number_of_rows:
+        unsorted = {column: np.memmap(routes_raw[column], dtype=dtypes[column], mode="r", shape=(number_of_rows,))
+                    for column in FRP_COLUMNS}
+        order = np.argsort(unsorted["LATITUDE"], kind="stable")
+        for column in FRP_COLUMNS:
+            array = np.lib.format.open_memmap(os.path.join(route_temporary, f"{column}.npy"), mode="w+",
+                                              dtype=dtypes[column], shape=(number_of_rows,))
+            for start in range(0, number_of_rows, STREAM_CHUNKSIZE):
+                array[start:start + STREAM_CHUNKSIZE] = unsorted[column][order[start:start + STREAM_CHUNKSIZE]]
+            array.flush()
+            del array
+        del unsorted, order
+    else:
+        for column in FRP_COLUMNS:
+            np.save(os.path.join(route_temporary, f"{column}.npy"), np.empty(0, dtype=dtypes[column]))
+    for route in routes_raw.values():
+        os.remove(route)
+
+    # Make the converted product visible (only if no other process did it first)
+    if os.path.isdir(route_final):
+        shutil.rmtree(route_temporary, ignore_errors=True)
+    else:
+        os.replace(route_temporary, route_final)
+
+    return {column: np.load(os.path.join(route_final, f"{column}.npy"), mmap_mode="r") for column in FRP_COLUMNS}
+
+
+def f_iter_frp_chunks(route_to_the_file, name_of_the_file, lonlat_bboxes=None, columns=FRP_COLUMNS, chunksize=STREAM_CHUNKSIZE, stats=None):
+    # Generator that decompresses and parses the compressed csv by chunks (only the needed columns, as float32
+    # except the FRP, parsed as float64 so that its sums are exactly the same as with the whole csv)
+    # and yields a dictionary {column: array} with the pixels of every chunk that are inside any of the bboxes.
+    # The memory used does not depend on the size of the product, only on chunksize and on the pixels kept.
+    # The rows parsed (kept or not) are added to stats["rows"] (if any).
+    print(f"         Running: {f_iter_frp_chunks.__name__}()")
+
+    filename = os.path.join(route_to_the_file, name_of_the_file)
+
+    # Bboxes as columns: W, S, E, N with shape (number of bboxes,). Same type as the coordinates (float32)
+    if lonlat_bboxes is not None:
+        W, S, E, N = np.array(lonlat_bboxes, dtype=np.float32).reshape(-1, 4).T
+
+    with pd.read_csv(filename, compression='gzip', usecols=list(columns),
+                     dtype={column: np.float64 if column == "FRP" else np.float32 for column in columns},
+                     chunksize=chunksize) as reader:
+        for chunk in reader:
+            if stats is not None:
+                stats["rows"] += len(chunk)
+
+            if lonlat_bboxes is None:
+                yield {column: chunk[column].to_numpy() for column in columns}
+                continue
+
+            lon = chunk['LONGITUDE'].to_numpy()[:, None]
+            lat = chunk['LATITUDE'].to_numpy()[:, None]
+            inside = ((lon >= W) & (lon <= E) & (lat >= S) & (lat <= N)).any(axis=1)
+
+            if inside.any():
+                yield {column: chunk[column].to_numpy()[inside] for column in columns}
+
+
+def f_read_product(route_to_the_file, name_of_the_file, cache=None, lonlat_bboxes=None, stats=None):
+    # Read the FRP data of the full disk as a dictionary {column: array}.
+    # If there is a columnar cache, read it from there (memory-mapped) or fill it on a miss.
+    # Without cache, stream the compressed csv and keep only the pixels inside the bboxes (if any).
+    # The rows read are added to stats["rows"] (if any).
+    print(f"         Running: {f_read_product.__name__}()")
+
+    if cache is None:
+        chunks = list(f_iter_frp_chunks(route_to_the_file, name_of_the_file, lonlat_bboxes, stats=stats))
+        return {
+            column: np.concatenate([chunk[column] for chunk in chunks]) if chunks
+            else np.empty(0, dtype=np.float64 if column == "FRP" else np.float32)
+            for column in FRP_COLUMNS
+        }
+
+    route_cached = os.path.join(cache["route"], name_of_the_file.removesuffix(".csv.gz"))
+
+    product = None
+    if os.path.isdir(route_cached):
+        product = {}
+        for column_file in sorted(os.listdir(route_cached)):
+            column = column_file.removesuffix(".npy")
+            product[column] = np.load(os.path.join(route_cached, column_file), mmap_mode="r")
+
+        # Copies written by older versions keep the FRP as float32: convert the product again
+        if product["FRP"].dtype != np.float64:
+            product = None
+            shutil.rmtree(route_cached, ignore_errors=True)
+        else:
+            cache["hits"] += 1
+
+    if product is None:
+        cache["misses"] += 1
+        product = f_convert_to_columnar(route_to_the_file, name_of_the_file, cache["route"])
+
+    if stats is not None:
+        stats["rows"] += len(product["FRP"])
+
+    return product
+
+
+def f_build_spatial_index(product):
+    """
+    Index the pixels of a product by latitude (built once per product), so that every bbox
+    query only touches the pixels inside its band of latitudes instead of the full disk.
+
+    Returns
+    -------
+    index : dict
+        Dictionary with the latitudes and longitudes sorted by latitude, and the order
+        that sorts them (None if the product was already sorted, as in the columnar cache).
+    """
+    print(f"         Running: {f_build_spatial_index.__name__}()")
+
+    lat = product['LATITUDE']
+    lon = product['LONGITUDE']
+
+    if len(lat) < 2 or np.all(lat[1:] >= lat[:-1]):
+        order = None
+    else:
+        order = np.argsort(lat, kind="stable")
+        lat = lat[order]
+        lon = lon[order]
+
+    index = {
+        "order": order,
+        "lat": lat,
+        "lon": lon,
+    }
+
+    return index
+
+
+def f_query_bbox(index, lonlat_bbox):
+    # Return the rows of the product (sorted) with the pixels inside the bbox.
+    # A binary search finds the band of latitudes; only the longitudes inside it are checked.
+
+    # The limits take the type of the coordinates (float32 in the columnar cache), so they are compared exactly
+    W, S, E, N = np.array(lonlat_bbox, dtype=index["lat"].dtype)
+
+    first = np.searchsorted(index["lat"], S, side="left")
+    last = np.searchsorted(index["lat"], N, side="right")
+
+    lon_candidates = index["lon"][first:last]
+    rows = np.flatnonzero((lon_candidates >= W) & (lon_candidates <= E)) + first
+
+    if index["order"] is not None:
+        rows = np.sort(index["order"][rows])
+
+    return rows
+
+
+def f_query_aoi(index, product, aoi):
+    # Return the rows of the product (sorted) with the pixels inside an area of interest:
+    # inside its bbox (spatial index) and, if it has a polygon, inside it (also on its border, as in the bbox).
+    # Only the pixels inside the bbox are checked against the polygon
+    rows = f_query_bbox(index, aoi["bbox"])
+
+    if aoi.get("polygon") is not None and len(rows):
+        import shapely as shapely
+        rows = rows[shapely.intersects_xy(aoi["polygon"], product['LONGITUDE'][rows], product['LATITUDE'][rows])]
+
+    return rows
+
+
+def f_get_frp(route_to_the_file, name_of_the_file, lonlat_bbox, cache=None, metrics=None, polygon=None):
+    # Open the compressed csv that contains the FRP data for the full disk and extract the data from inside the bbox
+    # (and inside the polygon, if any: a prepared shapely geometry, as returned by f_load_polygon)
+    print(f"         Running: {f_get_frp.__name__}()")
+
+    aoi = {"name": "bbox", "bbox": lonlat_bbox}
+    if polygon is not None:
+        aoi["polygon"] = polygon
+    number_of_pixels, sum_frp = f_get_frp_aois(route_to_the_file, name_of_the_file, [aoi], cache, metrics)["bbox"]
+    
+    return sum_frp
+
+
+def f_get_frp_aois(route_to_the_file, name_of_the_file, aois, cache=None, metrics=None, pixels=None, stats=None, grid=None):
+    # Open the compressed csv (or its columnar copy) that contains the FRP data for the full disk (only once)
+    # and extract the data from inside every area of interest through a spatial index built once per product.
+    # The areas with a polygon are filtered first by their bbox (index) and then by the polygon (only those pixels).
+    # Return a dictionary with the number of pixels and the sum of the FRP of every area of interest
+    # The time and the rows parsed per second are recorded in the metrics (if any)
+    # If pixels is a dictionary, the pixels of every area of interest are added to it ({name: {column: array}})
+    # If stats is a dictionary, the rows parsed are added to stats["rows"]
+    # If grid is a dictionary with a resolution, the pixels of the full disk are added up by cell (f_grid_product) into it
+    print(f"         Running: {f_get_frp_aois.__name__}()")
+
+    time_start = time.perf_counter()
+
+    # Open the file with the FRP data
+    stats = stats if stats is not None else {}
+    stats.setdefault("rows", 0)
+    rows_before = stats["rows"]
+    frp = f_read_product(route_to_the_file, name_of_the_file, cache, [aoi["bbox"] for aoi in aois] if grid is None else None, stats)
+
+    # Add up the pixels of the full disk by cell of the grid of the cube (if any)
+    if grid is not None:
+        grid.update(f_grid_product(frp, grid["resolution"]))
+
+    # Index the pixels by latitude
+    index = f_build_spatial_index(frp)
+
+    results = {}
+    for aoi in aois:
+        rows = f_query_aoi(index, frp, aoi) # Pixels inside the bbox (and the polygon)
+        number_of_pixels = len(rows) # Count the excited pixels within the bbox
+        sum_frp = float(np.nansum(np.asarray(frp['FRP'][rows], dtype=float))) # Sum the FRP (in MW). NaN does not add FRP (as in pandas .sum())
+        results[aoi["name"]] = (number_of_pixels, sum_frp)
+        if pixels is not None:
+            pixels[aoi["name"]] = {column: np.asarray(frp[column][rows]) for column in FRP_COLUMNS}
+        print(f"          - {aoi['name']}: active wildfire in {number_of_pixels} pixels. Total FRP: {sum_frp:.2f} MW")
+
+    if metrics is not None:
+        seconds = time.perf_counter() - time_start
+        rows = stats["rows"] - rows_before
+        rows_per_second = round(rows / max(seconds, 1e-9), 1)
+        f_record_metric(metrics, "parse", seconds, file=name_of_the_file, rows=rows,
+                        rows_per_second=rows_per_second, aois=len(aois))
+        f_update_metrics(metrics, counters={"parsed_rows_total": rows}, gauges={"parse_rows_per_second": rows_per_second})
+
+    return results
+
+
+def f_init_reprocess_worker():
+    # Silence the processes of the pool (the progress is reported by the main process)
+    sys.stdout = open(os.devnull, "w")
+
+
+def f_reprocess_product(context, task):
+    # Read a downloaded product in a process of the pool and extract the data from inside every area of interest.
+    # Return compact results (no DataFrames), so they are cheap to send back to the main process:
+    # (acquisition time, {name: (number of pixels, sum of the FRP)}, {name: {column: array}} or None,
+    #  seconds, rows parsed, columnar cache hits, columnar cache misses, cells of the cube or None)
+    # A product that is not valid (corrupted, and then deleted to download it again, or that cannot be parsed) is not
+    # read: the results are None and the reason is returned instead of the pixels, so the rest of the pool goes on
+    acquisition_time, filename = task
+
+    time_start = time.perf_counter()
+
+    if not f_check_product(os.path.join(context["route"], filename), {"Columnar": context["columnar"]}):
+        return acquisition_time, None, "corrupted", 0.0, 0, 0, 0, None
+
+    # The polygons arrive without their preparation (it is not sent between processes). Prepare them again
+    for aoi in context["aois"]:
+        if aoi.get("polygon") is not None:
+            import shapely as shapely
+            shapely.prepare(aoi["polygon"])
+
+    cache = {"route": context["cache"], "hits": 0, "misses": 0} if context["cache"] is not None else None
+    pixels = {} if context["pixels"] else None
+    stats = {"rows": 0}
+    grid = {"resolution": context["grid"]} if context["grid"] is not None else None
+    try:
+        results = f_get_frp_aois(context["route"], filename, context["aois"], cache, None, pixels, stats, grid)
+    except (OSError, EOFError, zlib.error, ValueError, KeyError) as e: # e.g. a truncated or malformed csv
+        return acquisition_time, None, f"{type(e).__name__}: {e}", time.perf_counter() - time_start, 0, 0, 0, None
+
+    return (acquisition_time, results, pixels, time.perf_counter() - time_start, stats["rows"],
+            cache["hits"] if cache is not None else 0, cache["misses"] if cache is not None else 0, grid)
+
+
+def f_reprocess(timesteps, directories, aois, workers, cache=None, pixels=False, metrics=None, cube=None):
+    # Read the downloaded products of a list of timesteps with a pool of processes (e.g. one per core), that
+    # receive them in chunks of REPROCESS_CHUNKSIZE timesteps. Generator that yields the results of every timestep
+    # in chronological order, (acquisition time, {name: (number of pixels, sum of the FRP)}, pixels or None),
+    # so that the main process saves them in order. The timesteps that were not downloaded are skipped, and so are
+    # the products that are not valid (they are reported, and requested again in order).
+    # The time and the rows parsed of every timestep are recorded in the metrics (if any).
+    # If there is a cube, the processes also add up the full disk by cell, and every timestep is added to the cube
+    print(f"         Running: {f_reprocess.__name__}()")
+
+    tasks = []
+    downloaded = set(os.listdir(directories["Raw_data"]))
+    for dt in timesteps:
+        link_to_download_file, filename = f_define_the_filename(dt)
+        if filename in downloaded:
+            tasks.append((dt, filename))
+
+    workers = max(1, min(workers, len(tasks)))
+    print(f"          - Reprocessing {len(tasks)} timesteps with {workers} processes")
+    if len(tasks) < len(timesteps):
+        print(f"          - {len(timesteps) - len(tasks)} timesteps were not downloaded. They will be requested in order")
+    if not tasks:
+        return
+
+    context = {
+        "route": directories["Raw_data"],
+        "columnar": directories["Columnar"],
+        "aois": aois,
+        "cache": cache["route"] if cache is not None else None,
+        "pixels": pixels,
+        "grid": cube["resolution"] if cube is not None else None,
+    }
+
+    number_of_rows = 0
+    not_valid = 0
+    time_start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=f_init_reprocess_worker) as executor:
+        for acquisition_time, results, pixels_aois, seconds, rows, hits, misses, grid in executor.map(
+                functools.partial(f_reprocess_product, context), tasks, chunksize=REPROCESS_CHUNKSIZE):
+            if results is None: # Not valid: pixels_aois has the reason
+                print(f"          - {f_define_the_filename(acquisition_time)[1]} is not valid ({pixels_aois}). Skipping it")
+                not_valid += 1
+                continue
+            number_of_rows += rows
+            if cube is not None:
+                f_append_cube(cube, acquisition_time, grid)
+            if cache is not None:
+                cache["hits"] += hits
+                cache["misses"] += misses
+            if metrics is not None:
+                f_record_metric(metrics, "parse", seconds, timestep=acquisition_time, rows=rows,
+                                rows_per_second=round(rows / max(seconds, 1e-9), 1), aois=len(aois), reprocess=True)
+                f_update_metrics(metrics, counters={"parsed_rows_total": rows})
+            yield acquisition_time, results, pixels_aois
+
+    elapsed = max(time.perf_counter() - time_start, 1e-9)
+    print(f"          - Reprocessed {len(tasks) - not_valid} timesteps ({number_of_rows} rows) in {elapsed:.1f} s")
+    print(f"          - Throughput: {(len(tasks) - not_valid)/elapsed:.2f} timesteps/s, {number_of_rows/elapsed:.0f} rows/s")
+    if not_valid:
+        print(f"          - {not_valid} products were not valid. They will be processed in order (the corrupted ones, downloaded again)")
+
+    if metrics is not None:
+        f_record_metric(metrics, "reprocess", elapsed, timesteps=len(tasks), rows=number_of_rows, workers=workers,
+                        not_valid=not_valid)
+        f_export_metrics(metrics)
+
+
+def f_cube_grid(resolution):
+    # Return the number of rows (latitudes, from -90 to 90) and columns (longitudes, from -180 to 180)
+    # of the global grid of the cube
+    return int(round(180 / resolution)), int(round(360 / resolution))
+
+
+def f_grid_product(product, resolution):
+    """
+    Add up the active pixels of a product (full disk) by cell of the global grid of the
+    cube. Cells are numbered row * columns + column, from the south-west corner. Pixels
+    without FRP count as pixels but do not add FRP (as in f_get_frp_aois).
+
+    Returns
+    -------
+    grid : dict
+        Dictionary with the cells with active pixels (int32, sorted), their number of
+        pixels (int32) and their sum of the FRP (float32, MW).
+    """
+    print(f"         Running: {f_grid_product.__name__}()")
+
+    number_of_rows, number_of_columns = f_cube_grid(resolution)
+
+    lat = np.asarray(product["LATITUDE"], dtype=float)
+    lon = np.asarray(product["LONGITUDE"], dtype=float)
+    valid = np.isfinite(lat) & np.isfinite(lon)
+
+    row = np.clip(np.floor((lat[valid] + 90) / resolution), 0, number_of_rows - 1).astype(np.int64)
+    column = np.clip(np.floor((lon[valid] + 180) / resolution), 0, number_of_columns - 1).astype(np.int64)
+
+    cells, inverse = np.unique(row * number_of_columns + column, return_inverse=True)
+    frp = np.nan_to_num(np.asarray(product["FRP"], dtype=float)[valid])
+
+    grid = {
+        "cells": cells.astype(np.int32),
+        "pixels": np.bincount(inverse, minlength=len(cells)).astype(np.int32),
+        "frp": np.bincount(inverse, weights=frp, minlength=len(cells)).astype(np.float32),
+    }
+
+    return grid
+
+
+def f_open_cube(directories, resolution=CUBE_RESOLUTION):
+    """
+    Open (or create) the gridded FRP cube of a resolution ("Outputs/Cube_<resolution>"): the
+    number of active pixels and the sum of the FRP of every cell of a global grid at every
+    timestep. Only the cells with pixels are kept, appended timestep by timestep to raw binary
+    files (described in cube.json) that are memory-mapped by the queries (f_query_cube).
+    A timestep is committed when its acquisition time is written, so whatever was written
+    after the last committed timestep (e.g. by a crash) is dropped here. The cube is locked
+    (cube.lock) while it is repaired or appended, so several processes can update it.
+
+    Returns
+    -------
+    cube : dict
+        Dictionary with the route to the cube, its resolution, the number of rows and columns
+        of its grid, the number of cells stored and the acquisition times in it (seconds, set).
+    """
+    print(f"         Running: {f_open_cube.__name__}()")
+
+    route = Path(directories["Outputs"]) / f"Cube_{resolution:g}"
+    route.mkdir(parents=True, exist_ok=True)
+    number_of_rows, number_of_columns = f_cube_grid(resolution)
+
+    route_header = route / "cube.json"
+    if not route_header.is_file():
+        header = {
+            "resolution": resolution,
+            "rows": number_of_rows,
+            "columns": number_of_columns,
+            "cell": "row * columns + column, from (-90, -180)",
+            "files": {f"{name}.bin": np.dtype(dtype).str for name, dtype in CUBE_FILES.items()},
+        }
+        route_temporary = f"{route_header}.tmp-{os.getpid()}"
+        with open(route_temporary, "w", encoding="utf-8") as f:
+            json.dump(header, f, indent=2)
+        os.replace(route_temporary, route_header)
+
+    lock = f_lock_cube(route)
+    try:
+        length, times = f_recover_cube(route)
+    finally:
+        f_unlock_cube(lock)
+
+    cube = {
+        "route": route,
+        "resolution": resolution,
+        "rows": number_of_rows,
+        "columns": number_of_columns,
+        "length": length,
+        "times": times,
+    }
+    print(f"          - Cube ({resolution:g}°): {len(cube['times'])} timesteps, {length} cells with fire")
+
+    return cube
+
+
+def f_lock_cube(route):
+    # Lock the cube for this process (waiting for the others), so that only one process repairs or
+    # appends to it at a time. Return the lock file, to be released with f_unlock_cube
+    lock = open(route / "cube.lock", "a+b")
+    if os.name == "nt":
+        import msvcrt
+        lock.seek(0)
+        while True:
+            try:
+                msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1) # It gives up after 10 seconds
+                break
+            except OSError:
+                continue
+    else:
+        import fcntl
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+    return lock
+
+
+def f_unlock_cube(lock):
+    # Release the lock of the cube taken by f_lock_cube
+    if os.name == "nt":
+        import msvcrt
+        lock.seek(0)
+        msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+    lock.close() # Also releases the flock
+
+
+def f_recover_cube(route):
+    # Drop whatever was written after the last committed timestep (with the cube locked).
+    # Return the number of cells stored and the acquisition times in the cube (seconds, set).
+    # The files are copied, so they are not mapped while they are truncated
+    times = np.array(f_read_cube_file(route, "times"))
+    offsets = np.array(f_read_cube_file(route, "offsets"))
+    number_of_timesteps = min(len(times), len(offsets))
+    length = int(offsets[number_of_timesteps - 1]) if number_of_timesteps else 0
+    for name, size in [("times", number_of_timesteps), ("offsets", number_of_timesteps),
+                       ("cells", length), ("pixels", length), ("frp", length)]:
+        route_to_the_file = route / f"{name}.bin"
+        if route_to_the_file.is_file() and route_to_the_file.stat().st_size > size * np.dtype(CUBE_FILES[name]).itemsize:
+            print(f"          - Dropping the data of {name}.bin after the last committed timestep")
+            os.truncate(route_to_the_file, size * np.dtype(CUBE_FILES[name]).itemsize)
+
+    return length, set(times[:number_of_timesteps].tolist())
+
+
+def f_read_cube_file(route, name):
+    # Return a file of the cube as a read-only array, memory-mapped (empty if it does not exist yet)
+    route_to_the_file = route / f"{name}.bin"
+    if not route_to_the_file.is_file() or route_to_the_file.stat().st_size == 0:
+        return np.empty(0, dtype=CUBE_FILES[name])
+    return np.memmap(route_to_the_file, dtype=CUBE_FILES[name], mode="r")
+
+
+def f_append_cube(cube, acquisition_time, grid):
+    # Add a timestep to the cube (incremental update): its cells first, then where they end and, last, its
+    # acquisition time, which commits it. The timesteps that are already in the cube are not added again.
+    # The cube is locked meanwhile, and its length and times are read again, as other processes may have
+    # appended to it since it was opened
+    print(f"         Running: {f_append_cube.__name__}()")
+
+    seconds = int(acquisition_time.timestamp())
+    if seconds in cube["times"]:
+        print("          - Already in the cube")
+        return
+
+    lock = f_lock_cube(cube["route"])
+    try:
+        cube["length"], cube["times"] = f_recover_cube(cube["route"])
+        if seconds in cube["times"]:
+            print("          - Already in the cube")
+            return
+
+        for name in ("cells", "pixels", "frp"):
+            with open(cube["route"] / f"{name}.bin", "ab") as f:
+                np.asarray(grid[name], dtype=CUBE_FILES[name]).tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+
+        cube["length"] += len(grid["cells"])
+        for name, value in [("offsets", cube["length"]), ("times", seconds)]:
+            with open(cube["route"] / f"{name}.bin", "ab") as f:
+                np.array([value], dtype=CUBE_FILES[name]).tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+
+        cube["times"].add(seconds)
+    finally:
+        f_unlock_cube(lock)
+
+    print(f"          - {len(grid['cells'])} cells with fire added to the cube")
+
+
+def f_build_cube(cube, directories, start_time, end_time, workers, cache=None):
+    # Add to the cube every product already downloaded between start_time and end_time (excluded, now if None)
+    # that is not in it yet, reading them with a pool of processes (f_reprocess)
+    print(f"         Running: {f_build_cube.__name__}()")
+
+    end_time = datetime.now(tz=timezone.utc) if end_time is None else end_time
+    downloaded = set(os.listdir(directories["Raw_data"]))
+    timesteps = [dt for dt in f_define_the_timesteps(start_time, end_time)
+                 if int(dt.timestamp()) not in cube["times"] and f_define_the_filename(dt)[1] in downloaded]
+    print(f"          - {len(timesteps)} downloaded timesteps to add to the cube")
+
+    for _ in f_reprocess(timesteps, directories, [], workers, cache, cube=cube):
+        pass
+
+
+def f_query_cube(cube, aois, start_time=None, end_time=None, freq=None):
+    """
+    Get the FRP of one area of interest (or of a list of them) from the cube, without reading
+    any product: the cells whose centre is inside the bbox (and the polygon, if any) of every
+    area are added up at every timestep in the cube between start_time and end_time (excluded).
+    The areas are thus taken at the resolution of the cube. With freq (e.g. "1h" or "1D"),
+    the timesteps are grouped into bins of that length (every timestep stands for 10 minutes).
+
+    Returns
+    -------
+    arrays : dict
+        Dictionary with the acquisition times (datetime64[s], UTC) of the timesteps in the cube
+        (or the start of every bin), and the number of pixels (int64) and the sum of the FRP
+        (float64, MW) of every area of interest ({name: array}). With freq, the FRP is the mean
+        of the bin, and there are also the number of timesteps of every bin, the maximum FRP
+        ("frp_max", MW) and the fire radiative energy ("fre", MJ) of every area.
+    """
+    print(f"         Running: {f_query_cube.__name__}()")
+
+    aois = [aois] if isinstance(aois, dict) else list(aois)
+    resolution, number_of_columns = cube["resolution"], cube["columns"]
+
+    # Timesteps in the range, in chronological order
+    times = np.array(f_read_cube_file(cube["route"], "times"))
+    offsets = np.array(f_read_cube_file(cube["route"], "offsets"))[:len(times)]
+    times = times[:len(offsets)]
+    start = f_check_datetime(start_time).timestamp() if start_time is not None else -np.inf
+    end = f_check_datetime(end_time).timestamp() if end_time is not None else np.inf
+    selected = np.flatnonzero((times >= start) & (times < end))
+    selected = selected[np.argsort(times[selected], kind="stable")]
+
+    # Cells of those timesteps (a single slice of the files when the timesteps were added in order)
+    begins = np.concatenate(([0], offsets[:-1]))[selected]
+    ends = offsets[selected]
+    counts = ends - begins
+    if len(selected) and np.all(begins[1:] == ends[:-1]):
+        records = slice(int(begins[0]), int(ends[-1]))
+    else:
+        records = f_concatenate_ranges(begins, ends)
+    cells = np.asarray(f_read_cube_file(cube["route"], "cells")[records]) if counts.sum() else np.empty(0, dtype=np.int32)
+    timestep_of_cell = np.repeat(np.arange(len(selected)), counts)
+
+    # The cells of every timestep are sorted, so the cells of a band of rows (latitudes) are contiguous in it.
+    # As in f_query_bbox, a binary search finds the band in every timestep and only its columns are checked
+    size = cube["rows"] * number_of_columns
+    keys = timestep_of_cell * size + cells
+    first_of_timestep = np.arange(len(selected)) * size
+
+    arrays = {
+        "acquisition_time": times[selected].astype("datetime64[s]"),
+        "pixels": {},
+        "frp": {},
+    }
+
+    for aoi in aois:
+        # Rows and columns of the cells whose centre is inside the bbox
+        W, S, E, N = aoi["bbox"]
+        row_S, row_N = np.ceil((S + 90) / resolution - 0.5), np.floor((N + 90) / resolution - 0.5)
+        column_W, column_E = np.ceil((W + 180) / resolution - 0.5), np.floor((E + 180) / resolution - 0.5)
+
+        band = f_concatenate_ranges(np.searchsorted(keys, first_of_timestep + int(row_S) * number_of_columns),
+                                    np.searchsorted(keys, first_of_timestep + int(row_N + 1) * number_of_columns))
+        column = cells[band] % number_of_columns
+        inside = band[(column >= column_W) & (column <= column_E)]
+
+        # Only the cells inside the bbox are checked against the polygon (once per cell)
+        if aoi.get("polygon") is not None and len(inside):
+            import shapely as shapely
+            candidates = np.unique(cells[inside])
+            lat = (candidates // number_of_columns + 0.5) * resolution - 90
+            lon = (candidates % number_of_columns + 0.5) * resolution - 180
+            inside = inside[np.isin(cells[inside], candidates[shapely.intersects_xy(aoi["polygon"], lon, lat)])]
+
+        # Only the pixels and the FRP of the cells inside are read
+        positions = inside + records.start if isinstance(records, slice) else records[inside]
+        number_of_pixels = f_read_cube_file(cube["route"], "pixels")[positions] if len(inside) else np.empty(0)
+        frp = f_read_cube_file(cube["route"], "frp")[positions] if len(inside) else np.empty(0)
+        arrays["pixels"][aoi["name"]] = np.bincount(timestep_of_cell[inside], weights=number_of_pixels,
+                                                    minlength=len(selected)).astype(np.int64)
+        arrays["frp"][aoi["name"]] = np.bincount(timestep_of_cell[inside], weights=frp, minlength=len(selected)).astype(np.float64)
+
+    print(f"          - {len(selected)} timesteps and {len(cells)} cells read from the cube")
+
+    if freq is not None:
+        arrays = f_resample_cube(arrays, freq)
+
+    return arrays
+
+
+def f_concatenate_ranges(begins, ends):
+    # Return the positions of several ranges [begin, end) one after the other, without a loop
+    counts = np.maximum(np.asarray(ends) - np.asarray(begins), 0)
+    return np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(begins, counts)
+
+
+def f_resample_cube(arrays, freq):
+    # Group the timesteps of a query of the cube into bins of length freq (e.g. "1h" or "1D"): number of timesteps,
+    # pixels, mean and maximum FRP (MW) and fire radiative energy (MJ, every timestep stands for 10 minutes)
+    seconds = int(pd.Timedelta(freq).total_seconds())
+    times = arrays["acquisition_time"].astype(np.int64)
+    bins, inverse = np.unique(times // seconds * seconds, return_inverse=True)
+    timesteps = np.bincount(inverse, minlength=len(bins))
+
+    resampled = {
+        "acquisition_time": bins.astype("datetime64[s]"),
+        "timesteps": timesteps,
+        "pixels": {},
+        "frp": {},
+        "frp_max": {},
+        "fre": {},
+    }
+    for name, frp in arrays["frp"].items():
+        frp_max = np.zeros(len(bins))
+        np.maximum.at(frp_max, inverse, frp)
+        fre = np.bincount(inverse, weights=frp, minlength=len(bins))
+        resampled["pixels"][name] = np.bincount(inverse, weights=arrays["pixels"][name], minlength=len(bins)).astype(np.int64)
+        resampled["frp"][name] = fre / np.maximum(timesteps, 1)
+        resampled["frp_max"][name] = frp_max
+        resampled["fre"][name] = fre * 600 # MW * s = MJ
+
+    return resampled
+
+
+def f_cluster_pixels(lat, lon, frp, cell=CLUSTER_CELL):
+    """
+    Group the active pixels into fires (clusters of adjacent pixels). Every pixel is hashed
+    into a cell of a grid of `cell` degrees (sinusoidal, so the cells have the same size in
+    km at any latitude), and the occupied cells that touch (8 neighbours) are joined.
+    It is vectorized, so a full-disk product takes a fraction of a second.
+
+    Returns
+    -------
+    labels : numpy.ndarray
+        Cluster of every pixel (from 0 to the number of clusters - 1).
+    clusters : dict
+        Dictionary with the centroid (weighted by the FRP), the number of pixels and the
+        sum of the FRP of every cluster, and the cells (hash keys, sorted) that they occupy.
+    """
+    print(f"         Running: {f_cluster_pixels.__name__}()")
+
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    frp = np.nan_to_num(np.asarray(frp, dtype=float)) # NaN does not add FRP
+
+    if len(lat) == 0:
+        empty = np.empty(0)
+        clusters = {"lat": empty, "lon": empty, "pixels": np.empty(0, dtype=np.int64), "frp": empty,
+                    "cells": np.empty(0, dtype=np.int64), "cell_cluster": np.empty(0, dtype=np.int64)}
+        return np.empty(0, dtype=np.int64), clusters
+
+    # Hash every pixel into its cell (row and column packed in an integer key)
+    row = np.floor(lat / cell).astype(np.int64)
+    col = np.floor(lon * np.cos(np.radians(lat)) / cell).astype(np.int64)
+    cells, cell_of_pixel = np.unique(f_cell_key(row, col), return_inverse=True)
+    cell_of_pixel = cell_of_pixel.ravel()
+
+    # Pairs of occupied cells that touch. Only 4 neighbours are looked for: the other 4 are the same pairs backwards
+    first, second = [], []
+    for d_row, d_col in ((0, 1), (1, -1), (1, 0), (1, 1)):
+        neighbour = cells + f_cell_key(d_row, d_col) - f_cell_key(0, 0)
+        position = np.minimum(np.searchsorted(cells, neighbour), len(cells) - 1)
+        found = cells[position] == neighbour
+        first.append(np.flatnonzero(found))
+        second.append(position[found])
+    first = np.concatenate(first)
+    second = np.concatenate(second)
+
+    # Connected cells: every cell takes the lowest label among its neighbours (and the label of its label)
+    # until nothing changes. It takes a few iterations, as fires are small
+    labels = np.arange(len(cells))
+    while len(first):
+        lowest = np.minimum(labels[first], labels[second])
+        new_labels = labels.copy()
+        np.minimum.at(new_labels, first, lowest)
+        np.minimum.at(new_labels, second, lowest)
+        new_labels = new_labels[new_labels]
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+
+    _, cell_cluster = np.unique(labels, return_inverse=True)
+    cell_cluster = cell_cluster.ravel()
+    pixel_cluster = cell_cluster[cell_of_pixel]
+    number_of_clusters = int(cell_cluster.max()) + 1
+
+    # Sum of the FRP, number of pixels and centroid of every cluster (weighted by the FRP, if there is any)
+    sum_frp = np.bincount(pixel_cluster, weights=frp, minlength=number_of_clusters)
+    weights = np.where(sum_frp[pixel_cluster] > 0, frp, 1.0)
+    sum_weights = np.bincount(pixel_cluster, weights=weights, minlength=number_of_clusters)
+
+    clusters = {
+        "lat": np.bincount(pixel_cluster, weights=weights * lat, minlength=number_of_clusters) / sum_weights,
+        "lon": np.bincount(pixel_cluster, weights=weights * lon, minlength=number_of_clusters) / sum_weights,
+        "pixels": np.bincount(pixel_cluster, minlength=number_of_clusters),
+        "frp": sum_frp,
+        "cells": cells,
+        "cell_cluster": cell_cluster,
+    }
+
+    return pixel_cluster, clusters
+
+
+def f_cell_key(row, col):
+    # Pack the row and the column of a cell of the grid in a single integer (sortable and searchable)
+    return (np.asarray(row, dtype=np.int64) + 2**20) * 2**21 + (np.asarray(col, dtype=np.int64) + 2**20)
+
+
+def f_open_tracker():
+    """
+    Returns
+    -------
+    tracker : dict
+        Dictionary with the cells occupied by the fires in the previous timestep (hash keys,
+        sorted), the fire of every cell, the names of these fires, and that timestep.
+    """
+    print(f"         Running: {f_open_tracker.__name__}()")
+
+    tracker = {
+        "cells": np.empty(0, dtype=np.int64),
+        "fire": np.empty(0, dtype=np.int64),
+        "names": {},
+        "next": 0,
+        "last": None,
+    }
+
+    return tracker
+
+
+def f_restore_tracker(tracker, store, acquisition_time):
+    # Take the fires from the timestep saved in the store just before this one, if the tracker does not come
+    # from it (e.g. when a run is resumed, or when a gap is filled), so that they keep their names
+    Date = str(acquisition_time.replace(tzinfo=None))
+    previous = store["connection"].execute("SELECT MAX(Date_UTC) FROM frp WHERE Date_UTC < ?", (Date,)).fetchone()[0]
+    if previous is None or previous == tracker["last"]:
+        return
+
+    print(f"         Running: {f_restore_tracker.__name__}()")
+
+    rows = store["connection"].execute(
+        "SELECT CELL, FIRE_ID FROM fire_cells WHERE Date_UTC = ? ORDER BY CELL", (previous,)
+    ).fetchall()
+    cells = np.array([row[0] for row in rows], dtype=np.int64)
+    names = [row[1] for row in rows]
+
+    # Oldest fires first (the numbers of the fires tell which one continues when they merge)
+    unique_names = sorted(set(names), key=lambda name: (name.split("_")[0], int(name.split("_")[1])))
+    fire_of_name = {name: fire for fire, name in enumerate(unique_names)}
+
+    tracker.update({
+        "cells": cells,
+        "fire": np.array([fire_of_name[name] for name in names], dtype=np.int64),
+        "names": dict(enumerate(unique_names)),
+        "next": len(unique_names),
+        "last": previous,
+    })
+    print(f"          - {len(unique_names)} fires taken from {previous}")
+
+
+def f_track_clusters(tracker, clusters, acquisition_time):
+    # Give a name to every cluster of this timestep. A cluster that occupies (or touches) a cell of a fire
+    # of the previous timestep continues that fire. If it touches several ones (they merged), it continues
+    # the oldest one. If several clusters continue the same fire (it split), the one with more FRP keeps it.
+    # New fires are named after the timestep when they were first detected (e.g. 202508151410_3)
+    # Return the name of every cluster
+    print(f"         Running: {f_track_clusters.__name__}()")
+
+    number_of_clusters = len(clusters["frp"])
+    no_fire = np.iinfo(np.int64).max
+
+    # Fire of the previous timestep that every cluster continues (if any)
+    continued = np.full(number_of_clusters, no_fire, dtype=np.int64)
+    if len(tracker["cells"]):
+        for d_row in (-1, 0, 1):
+            for d_col in (-1, 0, 1):
+                neighbour = clusters["cells"] + f_cell_key(d_row, d_col) - f_cell_key(0, 0)
+                position = np.minimum(np.searchsorted(tracker["cells"], neighbour), len(tracker["cells"]) - 1)
+                found = tracker["cells"][position] == neighbour
+                np.minimum.at(continued, clusters["cell_cluster"][found], tracker["fire"][position[found]])
+
+    fire = np.empty(number_of_clusters, dtype=np.int64)
+    names = {}
+    born = 0
+    for cluster in np.argsort(-clusters["frp"], kind="stable"):
+        if continued[cluster] == no_fire or continued[cluster] in names:
+            fire[cluster] = tracker["next"]
+            tracker["next"] += 1
+            names[fire[cluster]] = f"{acquisition_time:%Y%m%d%H%M}_{born}"
+            born += 1
+        else:
+            fire[cluster] = continued[cluster]
+            names[fire[cluster]] = tracker["names"][continued[cluster]]
+
+    # Keep the cells of this timestep for the next one
+    tracker["cells"] = clusters["cells"]
+    tracker["fire"] = fire[clusters["cell_cluster"]]
+    tracker["names"] = names
+
+    return np.array([names[f] for f in fire], dtype=str)
+
+    
+def f_open_store(route_to_save_file, name_of_the_file):
+    """
+    Open (or create) the store of the results of an area of interest: a SQLite database
+    (<name>.sqlite, in WAL mode) indexed by timestep, next to the csv (<name>.csv).
+    If the store is new and the csv already exists (results of a previous version of the
+    script), the csv is imported, dropping the duplicated timesteps.
+
+    Returns
+    -------
+    store : dict
+        Dictionary with the connection to the database, the route to the csv and the last
+        timestep written in the csv.
+    """
+    print(f"         Running: {f_open_store.__name__}()")
+
+    connection = sqlite3.connect(os.path.join(route_to_save_file, str(name_of_the_file)+".sqlite"))
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS frp (Date_UTC TEXT PRIMARY KEY, FRP_MTG_MW REAL NOT NULL, Pixels INTEGER)"
+    )
+
+    # Pixels, fires and cells of the fires, saved by timestep (see TIMESTEP_TABLES)
+    for table, columns in TIMESTEP_TABLES.items():
+        connection.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(f'{column} {kind}' for column, kind in columns.items())})")
+        connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_Date_UTC ON {table} (Date_UTC)")
+
+    store = {
+        "connection": connection,
+        "csv": os.path.join(route_to_save_file, str(name_of_the_file)+".csv"),
+        "last": connection.execute("SELECT MAX(Date_UTC) FROM frp").fetchone()[0],
+        "last_tables": {table: connection.execute(f"SELECT MAX(Date_UTC) FROM {table}").fetchone()[0]
+                        for table in TIMESTEP_TABLES},
+    }
+
+    # Import the csv of previous runs
+    if store["last"] is None and os.path.isfile(store["csv"]):
+        with open(store["csv"], "r", encoding="utf-8") as f:
+            reader = csv.reader(f, delimiter=";")
+            next(reader) # Header
+            rows = [(str(datetime.fromisoformat(row[0])), float(row[1])) for row in reader if row]
+        with connection:
+            connection.executemany("INSERT OR REPLACE INTO frp (Date_UTC, FRP_MTG_MW) VALUES (?, ?)", rows)
+        print(f"          - Imported {len(rows)} rows from {store['csv']}")
+        f_export_csv(store)
+
+    # Import the csv of the pixels and of the fires of previous runs (they were only appended, so a timestep could
+    # be written more than once: only its last rows are kept, and a pixel or a fire, told by its position, only once)
+    for table, position in (("pixels", slice(1, 3)), ("fires", slice(2, 6))):
+        route_csv = f_timestep_csv(store, table)
+        if store["last_tables"][table] is not None or not os.path.isfile(route_csv):
+            continue
+        timesteps = {}
+        with open(route_csv, "r", encoding="utf-8") as f:
+            reader = csv.reader(f, delimiter=";")
+            next(reader) # Header
+            Date = None
+            for row in reader:
+                if row and row[0] != Date: # A new block of rows of a timestep replaces the previous one
+                    Date = row[0]
+                    timesteps[Date] = {}
+                if row:
+                    timesteps[Date][tuple(row[position])] = row
+        rows = [row for Date in sorted(timesteps) for row in timesteps[Date].values()]
+        columns = TIMESTEP_TABLES[table]
+        with connection:
+            connection.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})", rows)
+        print(f"          - Imported {len(rows)} rows from {route_csv}")
+        f_export_timestep_csv(store, table)
+
+    return store
+
+
+def f_close_store(store):
+    # Close the connection to the store
+    print(f"         Running: {f_close_store.__name__}()")
+
+    store["connection"].close()
+
+
+def f_export_csv(store):
+    # Write the csv again from the store (sorted by timestep, without duplicates)
+    print(f"         Running: {f_export_csv.__name__}()")
+
+    rows = store["connection"].execute("SELECT Date_UTC, FRP_MTG_MW FROM frp ORDER BY Date_UTC").fetchall()
+
+    route_temporary = f"{store['csv']}.tmp-{os.getpid()}"
+    with open(route_temporary, mode="w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(["Date_UTC", "FRP_MTG_MW"])
+        writer.writerows(rows)
+    os.replace(route_temporary, store["csv"])
+
+    store["last"] = rows[-1][0] if rows else None
+
+
+def f_timestep_csv(store, table):
+    # Route to the csv of a table saved by timestep (e.g. <name>_pixels.csv)
+    return store["csv"].removesuffix(".csv") + f"_{table}.csv"
+
+
+def f_export_timestep_csv(store, table):
+    # Write the csv of a table saved by timestep again from the store (sorted by timestep, without duplicates)
+    print(f"         Running: {f_export_timestep_csv.__name__}()")
+
+    columns = list(TIMESTEP_TABLES[table])
+    rows = store["connection"].execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY Date_UTC, rowid").fetchall()
+
+    route_csv = f_timestep_csv(store, table)
+    route_temporary = f"{route_csv}.tmp-{os.getpid()}"
+    with open(route_temporary, mode="w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(columns)
+        writer.writerows(rows)
+    os.replace(route_temporary, route_csv)
+
+    store["last_tables"][table] = rows[-1][0] if rows else None
+
+
+def f_save_timestep_rows(store, table, acquisition_time, rows, write_csv=True):
+    # Save the rows of a timestep in a table of the store, replacing the ones saved before for that timestep
+    # (if any), so a timestep is never written twice. New timesteps are added at the end of the csv (if write_csv).
+    # If a timestep fills a gap or changes, the csv is written again in order
+    connection = store["connection"]
+    columns = list(TIMESTEP_TABLES[table])
+
+    Date = str(acquisition_time.replace(tzinfo=None)) # Transform form datetime aware into datetime naive
+    rows = [(Date, *row) for row in rows]
+
+    previous = connection.execute(
+        f"SELECT {', '.join(columns)} FROM {table} WHERE Date_UTC = ? ORDER BY rowid", (Date,)
+    ).fetchall()
+    if previous and previous == rows:
+        return
+
+    with connection:
+        connection.execute(f"DELETE FROM {table} WHERE Date_UTC = ?", (Date,))
+        connection.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})", rows)
+
+    last = store["last_tables"][table]
+    if not previous and (last is None or Date > last):
+        store["last_tables"][table] = Date
+        if not write_csv:
+            return
+
+        route_csv = f_timestep_csv(store, table)
+        exist_file = os.path.isfile(route_csv)
+        with open(route_csv, mode="a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, delimiter=";")
+            if not exist_file:
+                writer.writerow(columns)
+            writer.writerows(rows)
+
+    elif write_csv:
+        f_export_timestep_csv(store, table)
+
+
+def f_processed_timesteps(store):
+    # Return the set of timesteps (datetime aware, in UTC) already saved in the store
+    print(f"         Running: {f_processed_timesteps.__name__}()")
+
+    rows = store["connection"].execute("SELECT Date_UTC FROM frp").fetchall()
+
+    return {datetime.fromisoformat(row[0]).replace(tzinfo=timezone.utc) for row in rows}
+
+
+def f_find_gaps(processed, start_time):
+    # Find the timesteps between start_time and the last processed one that are missing
+    print(f"         Running: {f_find_gaps.__name__}()")
+
+    processed = {dt for dt in processed if dt >= start_time}
+    if not processed:
+        return []
+
+    gaps = [dt for dt in f_define_the_timesteps(start_time, max(processed)) if dt not in processed]
+
+    print(f"          - {len(processed)} timesteps already processed (until {max(processed)})")
+    if gaps:
+        print(f"          - {len(gaps)} missing timesteps will be filled (first: {gaps[0]})")
+
+    return gaps
+
+
+def f_save_frp(store, acquisition_time, frp, number_of_pixels=None, metrics=None):
+    # Save frp data into the store and the csv.
+    # Saving a timestep twice does not duplicate it (the value is updated).
+    # New timesteps are added at the end of the csv. If a timestep fills a gap, the csv is written again in order.
+    # The time and the saved values are recorded in the metrics (if any)
+    print(f"         Running: {f_save_frp.__name__}()")
+
+    time_start = time.perf_counter()
+
+    connection = store["connection"]
+
+    Date = str(acquisition_time.replace(tzinfo=None)) # Transform form datetime aware into datetime naive
+    Value = float(frp)
+
+    previous = connection.execute("SELECT FRP_MTG_MW FROM frp WHERE Date_UTC = ?", (Date,)).fetchone()
+    with connection:
+        connection.execute(
+            "INSERT INTO frp (Date_UTC, FRP_MTG_MW, Pixels) VALUES (?, ?, ?) "
+            "ON CONFLICT(Date_UTC) DO UPDATE SET FRP_MTG_MW = excluded.FRP_MTG_MW, Pixels = excluded.Pixels",
+            (Date, Value, number_of_pixels)
+        )
+
+    if previous is None and (store["last"] is None or Date > store["last"]):
+        # Check if the file already exists
+        exist_file = os.path.isfile(store["csv"])
+
+        # Start writing the file
+        with open(store["csv"], mode="a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, delimiter=";")
+
+            # If this is the first entry, write the header
+            if not exist_file:
+                writer.writerow(["Date_UTC", "FRP_MTG_MW"])
+
+            # Write new line
+            writer.writerow([Date, Value])
+        store["last"] = Date
+
+    elif previous is None or previous[0] != Value:
+        f_export_csv(store)
+           
+    print("          - Results saved in:")
+    print(f"            {store['csv']}")
+
+    if metrics is not None:
+        aoi = Path(store["csv"]).stem
+        f_record_metric(metrics, "save", time.perf_counter() - time_start, timestep=acquisition_time, aoi=aoi,
+                        frp=Value, pixels=number_of_pixels)
+        f_update_metrics(metrics, gauges={"frp_mw": Value,
+                                          "pixels": number_of_pixels if number_of_pixels is not None else "NaN",
+                                          "last_timestep_timestamp_seconds": acquisition_time.timestamp()}, aoi=aoi)
+
+
+def f_open_aggregator(store, start_time):
+    """
+    Prepare the incremental statistics of the FRP of an area of interest, updated in O(1)
+    per timestep from start_time on: fire radiative energy (FRE, trapezoidal, in MJ) since
+    start_time and since the beginning of the day (UTC), rolling mean and maximum FRP
+    (ROLLING_WINDOWS), peak FRP and missing timesteps. They are kept in the store (table
+    stats) and in <name>_stats.csv, so nobody has to read the whole series again.
+
+    Returns
+    -------
+    aggregator : dict
+        Dictionary with the store, the route to the csv, the columns, and the state of the
+        statistics (updated by f_save_stats).
+    """
+    print(f"         Running: {f_open_aggregator.__name__}()")
+
+    columns = ["Date_UTC", "FRP_MTG_MW", "FRE_MJ", "FRE_DAY_MJ"]
+    for label in ROLLING_WINDOWS:
+        columns += [f"FRP_MEAN_{label}_MW", f"FRP_MAX_{label}_MW"]
+    columns += ["FRP_PEAK_MW", "MISSING_TIMESTEPS"]
+
+    store["connection"].execute(
+        "CREATE TABLE IF NOT EXISTS stats (Date_UTC TEXT PRIMARY KEY, "
+        + ", ".join(f"{column} REAL" for column in columns[1:]) + ")"
+    )
+
+    aggregator = {
+        "store": store,
+        "csv": store["csv"].removesuffix(".csv") + "_stats.csv",
+        "columns": columns,
+        "start": start_time,
+        "last_csv": store["connection"].execute("SELECT MAX(Date_UTC) FROM stats").fetchone()[0],
+    }
+    f_reset_aggregator(aggregator)
+
+    return aggregator
+
+
+def f_reset_aggregator(aggregator):
+    # Empty the state of the statistics (as at start_time)
+    aggregator.update({
+        "last": None,  # Last timestep added
+        "frp": None,   # and its FRP
+        "fre": 0.0,
+        "day": None,
+        "fre_day": 0.0,
+        "peak": 0.0,
+        "missing": 0,
+        "windows": {label: {"span": span, "values": deque(), "sum": 0.0, "max": deque()}
+                    for label, span in ROLLING_WINDOWS.items()},
+    })
+
+
+def f_aggregate_frp(aggregator, acquisition_time, frp):
+    # Add the FRP of the next timestep to the statistics (O(1), amortized) and return their row
+    if aggregator["last"] is not None:
+        gap = acquisition_time - aggregator["last"]
+        aggregator["missing"] += int(gap / timedelta(minutes=10)) - 1
+
+        # Energy (MW × s = MJ) from the last timestep to this one: trapezoidal. Through short gaps, the FRP is
+        # interpolated linearly. Through longer gaps, nothing is known, so no energy is added
+        energy = (aggregator["frp"] + frp) / 2 * gap.total_seconds() if gap <= FRE_MAX_GAP else 0.0
+        aggregator["fre"] += energy
+
+        # The energy of every interval is added to the day when it ends
+        if acquisition_time.date() != aggregator["day"]:
+            aggregator["fre_day"] = 0.0
+        aggregator["fre_day"] += energy
+
+    aggregator["last"] = acquisition_time
+    aggregator["frp"] = frp
+    aggregator["day"] = acquisition_time.date()
+    aggregator["peak"] = max(aggregator["peak"], frp)
+
+    row = [str(acquisition_time.replace(tzinfo=None)), frp, aggregator["fre"], aggregator["fre_day"]]
+
+    # Rolling windows: running sum (mean) and decreasing queue (maximum) of the values inside the window
+    for window in aggregator["windows"].values():
+        window["values"].append((acquisition_time, frp))
+        window["sum"] += frp
+        while window["max"] and window["max"][-1][1] <= frp:
+            window["max"].pop()
+        window["max"].append((acquisition_time, frp))
+
+        while window["values"][0][0] <= acquisition_time - window["span"]:
+            window["sum"] -= window["values"].popleft()[1]
+        while window["max"][0][0] <= acquisition_time - window["span"]:
+            window["max"].popleft()
+
+        row += [window["sum"] / len(window["values"]), window["max"][0][1]]
+
+    row += [aggregator["peak"], aggregator["missing"]]
+
+    return row
+
+
+def f_replay_stats(aggregator, until=None):
+    # Add to the statistics the timesteps of the store after the last one added (and from start_time on),
+    # up to until (excluded), e.g. the ones saved in previous runs. Return their rows
+    since = aggregator["last"] if aggregator["last"] is not None else aggregator["start"] - timedelta(minutes=10)
+    until = str(until.replace(tzinfo=None)) if until is not None else "9999"
+
+    previous = aggregator["store"]["connection"].execute(
+        "SELECT Date_UTC, FRP_MTG_MW FROM frp WHERE Date_UTC > ? AND Date_UTC < ? ORDER BY Date_UTC",
+        (str(since.replace(tzinfo=None)), until)
+    ).fetchall()
+
+    return [f_aggregate_frp(aggregator, datetime.fromisoformat(Date).replace(tzinfo=timezone.utc), Value)
+            for Date, Value in previous]
+
+
+def f_save_stats(aggregator, acquisition_time, frp):
+    # Update the statistics with a new timestep and save them (store and csv). The timesteps between the last
+    # one added and this one that were saved in previous runs are added first (from the store), in order.
+    # If the timestep is older than the last one added (e.g. a gap filled later), they are computed again from start_time
+    print(f"         Running: {f_save_stats.__name__}()")
+
+    if aggregator["last"] is not None and acquisition_time <= aggregator["last"]:
+        f_reset_aggregator(aggregator)
+
+    rows = f_replay_stats(aggregator, until=acquisition_time)
+    rows.append(f_aggregate_frp(aggregator, acquisition_time, float(frp)))
+
+    f_write_stats(aggregator, rows)
+
+
+def f_flush_stats(aggregator):
+    # Update the statistics with the timesteps of the store after the last one added (e.g. the ones that
+    # follow a gap filled in this run) and save them, so that the statistics of the whole series are right
+    print(f"         Running: {f_flush_stats.__name__}()")
+
+    f_write_stats(aggregator, f_replay_stats(aggregator))
 
-    if not cred_path.exists():
-        raise FileNotFoundError(
-            f"           - Credentials file not found: {cred_path}"
+
+def f_write_stats(aggregator, rows):
+    # Save the rows of the statistics (store and csv)
+    connection = aggregator["store"]["connection"]
+
+    # Save only the rows that changed
+    changed = []
+    for row in rows:
+        saved = connection.execute("SELECT * FROM stats WHERE Date_UTC = ?", (row[0],)).fetchone()
+        if saved is None or any(abs(a - b) > 1e-9 for a, b in zip(saved[1:], row[1:])):
+            changed.append(row)
+    if not changed:
+        return
+
+    with connection:
+        connection.executemany(
+            f"INSERT OR REPLACE INTO stats ({', '.join(aggregator['columns'])}) VALUES ({', '.join('?' * len(aggregator['columns']))})",
+            changed
         )
 
-    config.read(cred_path)
+    # New timesteps are added at the end of the csv. Otherwise, the csv is written again in order
+    if len(changed) == 1 and (aggregator["last_csv"] is None or changed[0][0] > aggregator["last_csv"]) and os.path.isfile(aggregator["csv"]):
+        with open(aggregator["csv"], mode="a", newline="", encoding="utf-8") as f:
+            csv.writer(f, delimiter=";").writerow(f_round_stats(changed[0]))
+        aggregator["last_csv"] = changed[0][0]
+    else:
+        f_export_stats_csv(aggregator)
 
-    try:
-        _username = config["gitlab"]["username"]
-        _password = config["gitlab"]["password"]
-        
-    except KeyError as e:
-        raise KeyError(
-            "           - Missing [cdse] section or keys in credentials file"
-        ) from e
-    
-    return _username, _password
-    
-def f_scheduler(link_to_download_file, filename, directories, beeper, waiting_time):
-    # Wait and launch back f_call_to_lsasaf
-    print(f"         Running: {f_scheduler.__name__}()")
-    
-    print(f"          - Waiting {waiting_time} seconds")
-    print(f"          - New try at {datetime.now()+timedelta(seconds=waiting_time)}")
 
-    time.sleep(waiting_time)
+def f_round_stats(row):
+    # Round the statistics to write them in the csv (FRP and FRE with 2 decimals)
+    return [row[0]] + [round(value, 2) for value in row[1:-1]] + [int(row[-1])]
 
-    f_call_to_lsasaf(link_to_download_file, filename, directories, beeper, waiting_time)
-    
-    
-def f_call_to_lsasaf(link_to_download_file, filename, directories, beeper, waiting_time):
-    # Request the FRP data to its repository in gitlab and save it
-    print(f"         Running: {f_call_to_lsasaf.__name__}()") 
 
-    # Define the route to download the file (including its name and format)
-    Route_to_download_file = os.path.join(directories["Raw_data"],filename)
-        
-    # Check if the file already exists in the directory. Note that the product
-    # that this section downloads is the whole view from the satellite, not just 
-    # the area within the bbox. If it already exists, return to the main function.
-    if os.path.isfile(Route_to_download_file):
-        print(f"          - {filename} already exists in {directories["Raw_data"]}. Not requesting it.")
-        return       
-    
-    # Get user and password to access gitlab repository
-    _user, _password = f_get_credentials()  
-    
-    # Request the file 
-    req = requests.get(link_to_download_file, auth=(_user, _password))
-    
-    # If the file exists in the repository
-    if req.status_code==200: # 200 is the code for "everything went OK"
-        if beeper: # If beeper is on
-            winsound.Beep(1000, 500)  # BEEEP freq=1000 Hz, duration=500 ms
-            
-        with open(Route_to_download_file, "wb") as f:
-            f.write(req.content) # Write it in the appropriate directory
-    
-    # If the file doesn't exist yet (is not yet available at the repository)        
-    elif req.status_code==404:
-        print("          - Timestep not available yet")
-        # Launch the sceduler
-        f_scheduler(link_to_download_file, filename, directories, beeper, waiting_time) # Go into the Scheduler function, which will launch f_call_to_lsasaf back in [waiting_time] seconds
-        
-    else: # If the error is neither 200 nor 404
-        raise RuntimeError(f"          - Error for {link_to_download_file}: code {req.status_code}")
-    
+def f_export_stats_csv(aggregator):
+    # Write the csv of the statistics again from the store (sorted by timestep)
+    print(f"         Running: {f_export_stats_csv.__name__}()")
 
-def f_get_frp(route_to_the_file, name_of_the_file, lonlat_bbox):
-    # Open the compressed csv that contains the FRP data for the full disk and extract the data from inside the bbox
-    print(f"         Running: {f_get_frp.__name__}()")
-    
-    # Open the file with the FRP data
-    filename = os.path.join(route_to_the_file,name_of_the_file)
-    frp = pd.read_csv(filename, compression='gzip')
-    
-    # Extract the frp data inside the bbox
-    W, S, E, N = lonlat_bbox
-    filtered_frp = frp[
-    (frp['LONGITUDE'] >= W) & (frp['LONGITUDE'] <= E) &
-    (frp['LATITUDE']  >= S) & (frp['LATITUDE']  <= N)
-        ]   # Filter the data that fits with the bbox
-    
-    number_of_pixels = len(filtered_frp) # Count the number of rows, that equals the number of excited pixels within the bbox
-    sum_frp = filtered_frp['FRP'].sum() # Sum the FRP (in MW) detected in all the pixels
-    
-    print(f"          - Active wildfire in {number_of_pixels} pixels")
-    print(f"          - Total FRP: {sum_frp:.2f} MW")
-    
-    return sum_frp
+    rows = aggregator["store"]["connection"].execute(
+        f"SELECT {', '.join(aggregator['columns'])} FROM stats ORDER BY Date_UTC"
+    ).fetchall()
 
-    
-def f_save_frp(route_to_save_file, name_of_the_file, acquisition_time, frp):
-    # Save frp data into a csv.
-    # If the csv already exists, add a new line.
-    print(f"         Running: {f_save_frp.__name__}()")
-    
-    # Define the route and name of the file
-    filename = str(route_to_save_file)+"\\"+str(name_of_the_file)+".csv"
-    
-    # Check if the file already exists
-    exist_file = os.path.isfile(filename)
-    
-    # Start writing the file
-    with open(filename, mode="a", newline="", encoding="utf-8") as f:
+    route_temporary = f"{aggregator['csv']}.tmp-{os.getpid()}"
+    with open(route_temporary, mode="w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f, delimiter=";")
+        writer.writerow(aggregator["columns"])
+        writer.writerows(f_round_stats(row) for row in rows)
+    os.replace(route_temporary, aggregator["csv"])
 
-        # If this is the first entry, write the header
-        if not exist_file:
-            writer.writerow(["Date_UTC", "FRP_MTG_MW"])
+    aggregator["last_csv"] = rows[-1][0] if rows else None
 
-        # Write new line
-        Date = acquisition_time.replace(tzinfo=None) # Transform form datetime aware into datetime naive
-        Value = frp
-        writer.writerow([Date, Value])
 
-           
-    print("          - Results saved in:")
-    print(f"            {filename}")
+def f_save_pixels(store, acquisition_time, pixels, tracker=None, save_pixels=True):
+    # Save the active pixels of a timestep (store and <name>_pixels.csv) and, if there is a tracker, group them
+    # into fires, track them, and save the fires (store and <name>_fires.csv): centroid, number of pixels and FRP.
+    # Like the FRP, they are saved by timestep, so a timestep saved again (e.g. when a run is resumed) replaces its
+    # rows instead of duplicating them. The tracker goes on from the fires saved in the store (if needed)
+    print(f"         Running: {f_save_pixels.__name__}()")
+
+    fire_of_pixel = np.full(len(pixels["FRP"]), "", dtype=object)
+
+    if tracker is not None:
+        f_restore_tracker(tracker, store, acquisition_time)
+        labels, clusters = f_cluster_pixels(pixels["LATITUDE"], pixels["LONGITUDE"], pixels["FRP"])
+        names = f_track_clusters(tracker, clusters, acquisition_time)
+        tracker["last"] = str(acquisition_time.replace(tzinfo=None))
+        fire_of_pixel = names[labels]
+
+        f_save_timestep_rows(store, "fires", acquisition_time, zip(
+            names.tolist(), np.round(clusters["lat"], 4).tolist(), np.round(clusters["lon"], 4).tolist(),
+            clusters["pixels"].tolist(), np.round(clusters["frp"], 2).tolist()))
+        f_save_timestep_rows(store, "fire_cells", acquisition_time, zip(
+            tracker["cells"].tolist(), [tracker["names"][fire] for fire in tracker["fire"].tolist()]), write_csv=False)
+        print(f"          - {len(names)} fires in {Path(store['csv']).stem}")
+
+    if save_pixels:
+        f_save_timestep_rows(store, "pixels", acquisition_time, zip(
+            np.round(np.asarray(pixels["LATITUDE"], dtype=float), 5).tolist(), # float32 → 5 decimals (~1 m)
+            np.round(np.asarray(pixels["LONGITUDE"], dtype=float), 5).tolist(),
+            np.round(np.asarray(pixels["FRP"], dtype=float), 3).tolist(),
+            fire_of_pixel.tolist()))
 
     
-def f_plot_results(route_to_save_file, name_of_the_file, fig, ax, line):
-    # Plot the results
+def f_save_results(acquisition_time, results, pixels, stores, aggregators, trackers, save_pixels, series=None, metrics=None):
+    # Save the results of a timestep for every area of interest: its pixels and fires (if any), its FRP (store and csv),
+    # its statistics and its point in the series of the graph (if any)
+    for name, (number_of_pixels, frp) in results.items():
+        if pixels is not None: # Pixels and fires first, so that a timestep in the store is complete
+            f_save_pixels(stores[name], acquisition_time, pixels[name], trackers.get(name), save_pixels)
+        f_save_frp(stores[name], acquisition_time, frp, number_of_pixels, metrics)
+        f_save_stats(aggregators[name], acquisition_time, frp)
+        if series is not None:
+            f_append_series(series, name, acquisition_time, frp)
+
+
+def f_open_series(route_to_save_file, names_of_the_files):
+    """
+    Prepare the in-memory time series (one per area of interest) that feed the graph.
+    If the csv with the results already exists (i.e. the run is being resumed), it is read
+    only once, here.
+
+    Returns
+    -------
+    series : dict
+        Dictionary {name: {"dts", "values", "size"}}, with the datetimes (datetime64) and the
+        FRP values in arrays that grow by doubling their capacity.
+    """
+    print(f"         Running: {f_open_series.__name__}()")
+
+    series = {}
+    for name_of_the_file in names_of_the_files:
+        series[name_of_the_file] = {
+            "dts": np.empty(PLOT_CAPACITY, dtype="datetime64[s]"),
+            "values": np.empty(PLOT_CAPACITY, dtype=float),
+            "size": 0,
+        }
+
+        # Read the csv that contains the previous results (if any)
+        filename = os.path.join(route_to_save_file, str(name_of_the_file)+".csv")
+        if os.path.isfile(filename):
+            with open(filename, "r", encoding="utf-8") as f:
+                reader = csv.reader(f, delimiter=";")
+                next(reader) # Header
+                for row in reader:
+                    f_append_series(series, name_of_the_file, datetime.fromisoformat(row[0]), float(row[1]))
+            print(f"          - {name_of_the_file}: {series[name_of_the_file]['size']} previous results")
+
+    return series
+
+
+def f_append_series(series, name_of_the_file, acquisition_time, frp):
+    # Add a new value to a time series (doubling the capacity of its arrays when they are full).
+    # New timesteps go to the end. Timesteps that fill a gap are inserted in order, and repeated ones are updated
+    serie = series[name_of_the_file]
+    size = serie["size"]
+    dt = np.datetime64(acquisition_time.replace(tzinfo=None), "s")
+
+    position = size
+    if size and dt <= serie["dts"][size - 1]:
+        position = int(np.searchsorted(serie["dts"][:size], dt))
+        if serie["dts"][position] == dt:
+            serie["values"][position] = frp
+            return
+
+    if size == len(serie["values"]):
+        serie["dts"] = np.resize(serie["dts"], 2 * len(serie["dts"]))
+        serie["values"] = np.resize(serie["values"], 2 * len(serie["values"]))
+
+    serie["dts"][position + 1:size + 1] = serie["dts"][position:size]
+    serie["values"][position + 1:size + 1] = serie["values"][position:size]
+    serie["dts"][position] = dt
+    serie["values"][position] = frp
+    serie["size"] += 1
+
+
+def f_downsample_lttb(x, y, number_of_points):
+    # Choose the number_of_points (indices) that keep the shape of a long series with the
+    # Largest-Triangle-Three-Buckets algorithm, so that the cost to draw it does not grow with its length
+    length = len(x)
+    if number_of_points >= length or number_of_points < 3:
+        return np.arange(length)
+
+    bucket_size = (length - 2) / (number_of_points - 2)
+    indices = np.empty(number_of_points, dtype=np.int64)
+    indices[0], indices[-1] = 0, length - 1
+
+    a = 0 # Point chosen in the previous bucket
+    for i in range(number_of_points - 2):
+        first = int(i * bucket_size) + 1
+        last = int((i + 1) * bucket_size) + 1
+        next_last = min(int((i + 2) * bucket_size) + 1, length)
+
+        # Average point of the next bucket
+        x_next = x[last:next_last].mean()
+        y_next = y[last:next_last].mean()
+
+        # Point of the current bucket that makes the largest triangle with the previous point and the average
+        area = np.abs((x[a] - x_next) * (y[first:last] - y[a]) - (x[a] - x[first:last]) * (y_next - y[a]))
+        a = first + int(np.argmax(area))
+        indices[i + 1] = a
+
+    return indices
+
+
+def f_prepare_the_figure(names_of_the_files):
+    # Prepare the figure with one line per area of interest (importing the plotting libraries only now)
+    print(f"         Running: {f_prepare_the_figure.__name__}()")
+
+    import matplotlib.pyplot as plt
+
+    plt.ion()  # interactive mode
+    fig, ax = plt.subplots(figsize=(10, 5))
+    if len(names_of_the_files) == 1:
+        lines = {names_of_the_files[0]: ax.plot([], [], color="red")[0]}
+    else:
+        lines = {name: ax.plot([], [], label=name)[0] for name in names_of_the_files}
+
+    return fig, ax, lines
+
+
+def f_plot_results(series, names_of_the_files, fig, ax, lines, metrics=None):
+    # Plot the results (one line per area of interest) from the in-memory time series
+    # The time to draw them is recorded in the metrics (if any)
     print(f"         Running: {f_plot_results.__name__}()")
-    
-    # Define the route and name of the file that contains the data to plot
-    filename = str(route_to_save_file)+"\\"+str(name_of_the_file)+".csv"
-    
-    dts = []
-    values = []
-    
-    # Read the csv that contains the data to plot
-    with open(filename, "r", encoding="utf-8") as f:
-        reader = csv.reader(f, delimiter=";")
-        header = next(reader)
-        col_datetime, col_value = header[0], header[1]
 
-        for row in reader:
-            dts.append(datetime.fromisoformat(row[0]))
-            values.append(float(row[1]))
+    time_start = time.perf_counter()
 
-    line.set_xdata(dts)
-    line.set_ydata(values)
+    from IPython.display import clear_output as clear_output
+    from IPython.display import display as display
+
+    import matplotlib.dates as mdates
+
+    col_datetime, col_value = "Date_UTC", "FRP_MTG_MW"
+
+    for name_of_the_file in names_of_the_files:
+        serie = series[name_of_the_file]
+        dts = serie["dts"][:serie["size"]]
+        values = serie["values"][:serie["size"]]
+
+        # Long series are downsampled, so redrawing them costs the same every timestep
+        shown = f_downsample_lttb(dts.astype(np.int64).astype(float), values, PLOT_MAX_POINTS)
+
+        lines[name_of_the_file].set_xdata(dts[shown])
+        lines[name_of_the_file].set_ydata(values[shown])
 
     if not ax.get_xlabel():
         ax.grid(True)
@@ -531,7 +3692,11 @@ def f_plot_results(route_to_save_file, name_of_the_file, fig, ax, line):
         #---------
         ax.xaxis.set_major_formatter(mdates.DateFormatter("%Y-%m-%d %H:%M"))
         fig.autofmt_xdate()
-        fig.suptitle(name_of_the_file)
+        if len(names_of_the_files) == 1:
+            fig.suptitle(names_of_the_files[0])
+        else:
+            fig.suptitle(f"{len(names_of_the_files)} areas of interest")
+            ax.legend(loc="upper left")
         
 
 
@@ -541,79 +3706,704 @@ def f_plot_results(route_to_save_file, name_of_the_file, fig, ax, line):
     clear_output(wait=True)
     display(fig)
 
-    return fig, ax, line
+    f_record_metric(metrics, "plot", time.perf_counter() - time_start, lines=len(names_of_the_files))
+
+    return fig, ax, lines
+
+
+def f_load_subscriptions(route_to_the_control_file):
+    """
+    Read the fires monitored by the daemon from its control file: a CSV (separated by ;)
+    with the columns name;west;south;east;north (as --aoi-file, also with polygon) and,
+    optionally, start and end (ISO 8601 with time zone). Without start, the fire is monitored from now on.
+    Without end, it is monitored non-stop.
+
+    Returns
+    -------
+    subscriptions : dict
+        Dictionary {name: {"name", "bbox", "start", "end"}} with every fire of the file (and "polygon", if any)
+        (empty if the file does not exist).
+    """
+    print(f"         Running: {f_load_subscriptions.__name__}()")
+
+    subscriptions = {}
+    if not os.path.isfile(route_to_the_control_file):
+        return subscriptions
+
+    now = datetime.now(tz=timezone.utc)
+    with open(route_to_the_control_file, "r", encoding="utf-8") as f:
+        reader = csv.DictReader(f, delimiter=";")
+        for row in reader:
+            name = row["name"].strip()
+            if name in subscriptions:
+                raise ValueError(f"{name} is defined twice in {route_to_the_control_file}")
+
+            start = row.get("start") or ""
+            end = row.get("end") or ""
+            start = f_valid_datetime_tz(start.strip()) if start.strip() else now
+            end = f_valid_datetime_tz(end.strip()) if end.strip() else None
+
+            subscription = {
+                **f_aoi_from_row(row),
+                "start": start.replace(minute=start.minute//10*10, second=0, microsecond=0), # MTG captures data every 10 min
+                "end": end,
+            }
+            f_check_coordinates(subscription["bbox"])
+            subscriptions[name] = subscription
+
+    return subscriptions
+
+
+def f_update_subscriptions(daemon, subscriptions):
+    # Apply the fires of the control file to the daemon: open the stores of the new fires,
+    # close the stores of the removed ones, and update the bbox, start and end of the rest
+    print(f"         Running: {f_update_subscriptions.__name__}()")
+
+    f_check_region(daemon["raw_cache"], list(subscriptions.values()))
+
+    for name in list(daemon["subscriptions"]):
+        if name not in subscriptions:
+            subscription = daemon["subscriptions"].pop(name)
+            f_flush_stats(subscription["aggregator"])
+            f_close_store(subscription["store"])
+            print(f"          - Unsubscribed: {name}")
+
+    for name, subscription in subscriptions.items():
+        if name in daemon["subscriptions"]:
+            current = daemon["subscriptions"][name]
+            if subscription["start"] != current["start"]: # The statistics are computed again from the new start
+                current["aggregator"]["start"] = subscription["start"]
+                f_reset_aggregator(current["aggregator"])
+            daemon["subscriptions"][name] = {**subscription, "store": current["store"], "processed": current["processed"],
+                                             "aggregator": current["aggregator"]}
+        else:
+            store = f_open_store(daemon["directories"]["Outputs"], name)
+            daemon["subscriptions"][name] = {**subscription, "store": store, "processed": f_processed_timesteps(store),
+                                             "aggregator": f_open_aggregator(store, subscription["start"])}
+            print(f"          - Subscribed: {name} {subscription['bbox']} from {subscription['start']}"
+                  f"{' to ' + str(subscription['end']) if subscription['end'] is not None else ' (non-stop)'}")
+
+
+def f_next_timestep(daemon):
+    # Return the oldest timestep that any fire still needs (None if there is none),
+    # and the fires that need it
+    subscribers_by_timestep = {}
+    for subscription in daemon["subscriptions"].values():
+        dt = subscription["start"]
+        while (subscription["end"] is None or dt < subscription["end"]) and (dt in subscription["processed"] or dt in daemon["missing"]):
+            dt = dt + timedelta(minutes=10)
+        if subscription["end"] is None or dt < subscription["end"]:
+            subscribers_by_timestep.setdefault(dt, []).append(subscription)
+
+    if not subscribers_by_timestep:
+        return None, []
+
+    dt = min(subscribers_by_timestep)
+    return dt, subscribers_by_timestep[dt]
+
+
+async def f_wait_for_changes(daemon, seconds):
+    # Wait (without blocking the event loop) the given seconds, or less if the fires of the control file change
+    try:
+        await asyncio.wait_for(daemon["changed"].wait(), timeout=max(seconds, 0))
+    except asyncio.TimeoutError:
+        pass
+    daemon["changed"].clear()
+
+
+async def f_watch_control_file(daemon):
+    # Check the control file every CONTROL_POLL seconds, and apply it (without restarting) when it changes.
+    # If the new file is not valid, the daemon keeps monitoring the previous fires
+    print(f"         Running: {f_watch_control_file.__name__}()")
+
+    modified = None
+    while True:
+        route = daemon["control_file"]
+        current = os.stat(route).st_mtime_ns if os.path.isfile(route) else None
+        if current != modified:
+            modified = current
+            try:
+                f_update_subscriptions(daemon, f_load_subscriptions(route))
+                daemon["changed"].set()
+            except (ValueError, KeyError, argparse.ArgumentTypeError) as e:
+                print(f"          - WARNING: {route} is not valid ({e}). Keeping the previous fires")
+        await asyncio.sleep(CONTROL_POLL)
+
+
+async def f_run_pipeline(daemon, notifier, waiting_time, client, latency, cache, metrics, listings=None, cube=None):
+    # Get every timestep only once for all the fires: download it (as soon as it is published),
+    # read it once, and deliver the FRP of every fire that needs it to its store.
+    # The downloads and the parsing run in a worker thread, so the control file is still watched meanwhile.
+    # If there is a cube, every timestep is added to it (also when no fire needs it any more)
+    print(f"         Running: {f_run_pipeline.__name__}()")
+
+    directories = daemon["directories"]
+
+    while True:
+        dt, subscribers = f_next_timestep(daemon)
+
+        # Nothing to do until the control file changes
+        if dt is None:
+            await f_wait_for_changes(daemon, CONTROL_POLL)
+            continue
+
+        # Too early: wait until the moment when the timestep should be available, asked a bit earlier so that the
+        # latencies observed can also move earlier (or until the fires change)
+        expected_time = dt + timedelta(minutes=f_predict_latency(latency) - PUBLICATION_EARLY_PROBE)
+        now = datetime.now(tz=timezone.utc)
+        if now < expected_time:
+            print(f"          - Next timestep ({dt}) expected at {expected_time}")
+            await f_wait_for_changes(daemon, (expected_time - now).total_seconds())
+            continue
+
+        # Get the timestep. If it fails (e.g. the repository rejects every account), it is logged and left as a gap,
+        # and the fires go on with the next timestep
+        try:
+            print()
+            print(f"         ** Time step {dt} ({len(subscribers)} fires)")
+            time_timestep = time.perf_counter()
+
+            link_to_download_file, filename = f_define_the_filename(dt)
+            available = await asyncio.to_thread(f_call_to_lsasaf, link_to_download_file, filename, directories, notifier,
+                                                waiting_time, client, dt, latency, daemon["raw_cache"], metrics, listings)
+
+            # Missing in the repository: no fire will get it (it is left as a gap)
+            if not available:
+                daemon["missing"].add(dt)
+                continue
+
+            # The product has landed: deliver it to every fire that needs it now (including the ones added meanwhile)
+            subscribers = [s for s in daemon["subscriptions"].values() if dt not in s["processed"]
+                           and s["start"] <= dt and (s["end"] is None or dt < s["end"])]
+            aois = [{"name": s["name"], "bbox": s["bbox"], "polygon": s.get("polygon")} for s in subscribers]
+            grid = {"resolution": cube["resolution"]} if cube is not None and int(dt.timestamp()) not in cube["times"] else None
+            results = await asyncio.to_thread(f_get_frp_aois, directories["Raw_data"], filename, aois, cache, metrics,
+                                              grid=grid) if aois or grid is not None else {}
+            if grid is not None:
+                f_append_cube(cube, dt, grid)
+
+            for name, (number_of_pixels, frp) in results.items():
+                subscription = daemon["subscriptions"].get(name)
+                if subscription is None: # Removed while the product was read
+                    continue
+                f_save_frp(subscription["store"], dt, frp, number_of_pixels, metrics)
+                f_save_stats(subscription["aggregator"], dt, frp)
+                subscription["processed"].add(dt)
+
+            f_enforce_raw_cache(daemon["raw_cache"])
+
+            if metrics is not None:
+                lag = (datetime.now(tz=timezone.utc) - dt).total_seconds()
+                f_record_metric(metrics, "timestep", time.perf_counter() - time_timestep, timestep=dt,
+                                lag_seconds=round(lag, 1), fires=len(results))
+                f_update_metrics(metrics, counters={"timesteps_total": 1}, gauges={"lag_seconds": round(lag, 1)})
+                f_export_metrics(metrics)
+        except Exception as e:
+            print(f"          - WARNING: timestep {dt} failed ({e}). Leaving it as a gap")
+            daemon["missing"].add(dt)
+
+
+async def f_daemon(route_to_the_control_file, directories, notifier, waiting_time, client, latency, cache, raw_cache, metrics, listings=None, cube=None):
+    # Monitor non-stop the fires of the control file with one event loop: one download and one
+    # reading of every timestep for all of them, instead of one sleeping process per fire.
+    # The fires can be added, changed or removed at runtime by editing the control file.
+    # When it stops (e.g. Ctrl+C), the downloads of the worker thread are stopped too, so the event loop does not
+    # wait for them to end (only for the request or the reading in progress, bounded by their timeouts)
+    print(f"         Running: {f_daemon.__name__}()")
+
+    daemon = {
+        "control_file": route_to_the_control_file,
+        "directories": directories,
+        "raw_cache": raw_cache,
+        "subscriptions": {},
+        "missing": set(), # Timesteps missing in the repository
+        "changed": asyncio.Event(),
+    }
+
+    print(f"          - Control file: {route_to_the_control_file} (checked every {CONTROL_POLL} s)")
+
+    watcher = asyncio.create_task(f_watch_control_file(daemon))
+    try:
+        await f_run_pipeline(daemon, notifier, waiting_time, client, latency, cache, metrics, listings, cube)
+    finally:
+        client["stop"].set()
+        watcher.cancel()
+        for subscription in daemon["subscriptions"].values():
+            f_flush_stats(subscription["aggregator"])
+            f_close_store(subscription["store"])
+    
+    
+# %% DEFINE THE LIBRARY FUNCTIONS
+# To use the tool from Python (see LIBRARY above). The console (main) is a thin wrapper over them
+
+def f_open_frp_client(directories=None, credentials=None, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                      waiting_time=300, notifier=None, columnar_cache=True, listing=True, listing_ttl=LISTING_TTL,
+                      metrics=False, metrics_dir=None, raw_cache_max_mb=None, raw_cache_max_days=None, raw_region=None,
+                      rate_limit=RATE_LIMIT, rate_burst=RATE_BURST, account_cooldown=ACCOUNT_COOLDOWN, cube_resolution=None):
+    """
+    Open everything needed to get the FRP, once for many requests: the directories, the
+    session to the repository (with its rate limiter, unless rate_limit is 0), the
+    publication latencies, the listings of the repository, the columnar cache of the
+    products, the limits of the downloaded products, the metrics and the gridded FRP cube
+    of cube_resolution, if any (the arguments are the options of the console with the same name).
+
+    Returns
+    -------
+    frp_client : dict
+        Dictionary with the directories, the session to the repository (client), the
+        latencies, the listings (or None), the columnar cache (or None), the raw cache,
+        the metrics (or None), the cube (or None), the notifier (or None) and the maximum
+        waiting time.
+    """
+    print(f"         Running: {f_open_frp_client.__name__}()")
+
+    directories = f_define_the_directories() if directories is None else directories
+
+    frp_client = {
+        "directories": directories,
+        "raw_cache": f_open_raw_cache(directories, raw_cache_max_mb, raw_cache_max_days, raw_region),
+        "client": f_open_session(connect_timeout, read_timeout, credentials=credentials, cooldown=account_cooldown,
+                                 limiter=f_open_rate_limiter(directories, rate_limit, rate_burst) if rate_limit > 0 else None),
+        "latency": f_load_latency(directories),
+        "listings": f_open_listings(listing_ttl) if listing else None,
+        "metrics": f_open_metrics(directories, metrics_dir) if metrics else None,
+        "cache": f_open_columnar_cache(directories) if columnar_cache else None,
+        "cube": f_open_cube(directories, cube_resolution) if cube_resolution else None,
+        "notifier": notifier,
+        "waiting_time": waiting_time,
+    }
+
+    return frp_client
+
+
+def f_close_frp_client(frp_client):
+    # Close the session to the repository (and its rate limiter) and report the use of the columnar cache
+    print(f"         Running: {f_close_frp_client.__name__}()")
+
+    f_close_session(frp_client["client"])
+    limiter = frp_client["client"]["limiter"]
+    if limiter is not None:
+        print(f"          - Waited {limiter['waited']:.1f} seconds for the rate limit")
+        limiter["connection"].close()
+    if frp_client["cache"] is not None:
+        f_report_columnar_cache(frp_client["cache"])
+
+
+def f_define_an_aoi(name, bbox=None, polygon=None):
+    # Define an area of interest for the library functions: its name and its bbox ([W, S, E, N] in decimal degrees)
+    # or its polygon (a GeoJSON file, a WKT file or a WKT string), validated as in the console
+    print(f"         Running: {f_define_an_aoi.__name__}()")
+
+    if (bbox is None) == (polygon is None):
+        raise ValueError(f"Define either the bbox or the polygon of {name}")
+
+    aoi = {"name": name}
+    if polygon is not None:
+        aoi["polygon"], aoi["bbox"] = f_load_polygon(polygon)
+    else:
+        aoi["bbox"] = [float(c) for c in bbox]
+    f_check_coordinates(aoi["bbox"])
+
+    return aoi
+
+
+def f_check_datetime(dt):
+    # Accept a datetime with time zone or an ISO 8601 string (as in the console), and return it in UTC
+    if isinstance(dt, str):
+        return f_valid_datetime_tz(dt)
+
+    if dt.tzinfo is None:
+        raise ValueError("Datetime must include time zone (e.g.: tzinfo=timezone.utc)")
+
+    return dt.astimezone(timezone.utc)
+
+
+def f_iter_timesteps(frp_client, aois, start_time, end_time=None, processed=(), pixels=False, backfill=False, max_workers=4, workers=None, prefetch=PREFETCH):
+    # Generator that gets the FRP of every area of interest from start_time until end_time (excluded), or non-stop if
+    # there is no end_time: every timestep is downloaded (waiting until it is published) and read only once for all
+    # the areas, and its results are yielded as soon as they are ready, in chronological order:
+    # (acquisition time, {name: (number of pixels, sum of the FRP)}, {name: {column: array}} if pixels else None)
+    # The timesteps in processed are skipped, and so are the ones that are missing in the repository (gaps).
+    # If backfill is True, the past timesteps are downloaded first in parallel (max_workers).
+    # If workers is defined, the products already downloaded are read first with a pool of processes (f_reprocess)
+    # If the client has a cube, every timestep read is added to it.
+    # If prefetch is not 0, the next timesteps are downloaded and read while the results of this one are consumed
+    print(f"         Running: {f_iter_timesteps.__name__}()")
+
+    directories = frp_client["directories"]
+    metrics = frp_client["metrics"]
+    processed = set(processed)
+
+    start_time = f_check_start_datetime(f_check_datetime(start_time))
+    end_time = f_check_datetime(end_time) if end_time is not None else None
+    f_check_region(frp_client["raw_cache"], aois)
+
+    # Download in parallel all the timesteps that are already in the past (if backfill is True)
+    if backfill:
+        now = datetime.now(tz=timezone.utc)
+        timesteps = [t for t in f_define_the_timesteps(start_time, now if end_time is None else min(end_time, now)) if t not in processed]
+        f_backfill(timesteps, directories, max_workers, frp_client["client"], frp_client["raw_cache"], metrics, frp_client["listings"])
+
+    # Read the products already downloaded with a pool of processes (if workers is defined). The rest of the
+    # timesteps (not downloaded yet) are processed afterwards, one by one
+    if workers is not None:
+        now = datetime.now(tz=timezone.utc)
+        timesteps = [t for t in f_define_the_timesteps(start_time, now if end_time is None else end_time) if t not in processed]
+        for acquisition_time, results, pixels_aois in f_reprocess(timesteps, directories, aois, workers, frp_client["cache"], pixels, metrics, frp_client["cube"]):
+            f_release_product(frp_client["raw_cache"], f_define_the_filename(acquisition_time)[1])
+            processed.add(acquisition_time)
+            yield acquisition_time, results, pixels_aois
+
+    # Get the rest of the timesteps in order: download, read and yield them one after the other, or through a
+    # pipeline where the next timesteps are downloaded and read while the results of this one are saved (if prefetch)
+    timesteps = f_iter_pending_timesteps(start_time, end_time, processed)
+    if prefetch > 0:
+        yield from f_prefetch_timesteps(frp_client, aois, timesteps, pixels, prefetch)
+        return
+
+    for dt in timesteps:
+        filename, available = f_download_timestep(frp_client, dt)
+        if available:
+            yield (dt, *f_read_timestep(frp_client, aois, dt, filename, pixels))
+
+
+def f_iter_pending_timesteps(start_time, end_time, processed):
+    # Generator that yields every timestep from start_time until end_time (excluded), or non-stop if there is no
+    # end_time, except the ones already processed
+    dt = start_time
+    while end_time is None or dt < end_time:
+        print()
+        print(f"         ** Time step {dt}")
+
+        # Skip the timesteps already processed
+        if dt in processed:
+            print("          - Already processed. Skipping it")
+        else:
+            yield dt
+
+        # Go to the next timestep
+        dt = dt + timedelta(minutes=10)
+
+
+def f_download_timestep(frp_client, dt):
+    # Download the product of a timestep (first stage of the pipeline). Return its filename and whether it is available
+    link_to_download_file, filename = f_define_the_filename(dt)
+
+    # Request the FRP data to its repository in gitlab and save it (as an CSV compressed file).
+    # If the FRP is not yet available in the repository, this function waits (with a scheduler) and tries again
+    available = f_call_to_lsasaf(link_to_download_file, filename, frp_client["directories"], frp_client["notifier"],
+                                 frp_client["waiting_time"], frp_client["client"], dt, frp_client["latency"],
+                                 frp_client["raw_cache"], frp_client["metrics"], frp_client["listings"])
+
+    # Skip the timesteps that are missing in the repository (they are left as gaps). The available ones are not
+    # deleted until they are read (the pipeline may download several timesteps ahead)
+    if not available:
+        print(f"          - {dt} is missing in the repository. Skipping it")
+    else:
+        f_hold_product(frp_client["raw_cache"], filename)
+
+    return filename, available
+
+
+def f_read_timestep(frp_client, aois, dt, filename, pixels):
+    # Read the product of a timestep (second stage of the pipeline). Return the results of every area of interest,
+    # {name: (number of pixels, sum of the FRP)}, and their pixels, {name: {column: array}} (if pixels is True)
+
+    # Read the CSV compressed file (only once) to get the FRP data inside every bbox (and its pixels, if needed),
+    # and the full disk by cell of the cube (if any, and if the timestep is not in it yet)
+    cube = frp_client["cube"]
+    pixels_aois = {} if pixels else None
+    grid = {"resolution": cube["resolution"]} if cube is not None and int(dt.timestamp()) not in cube["times"] else None
+    results = f_get_frp_aois(frp_client["directories"]["Raw_data"], filename, aois, frp_client["cache"],
+                             frp_client["metrics"], pixels_aois, grid=grid)
+    if grid is not None:
+        f_append_cube(cube, dt, grid)
+
+    # Keep the downloaded products inside their limits (this one can be deleted now)
+    f_release_product(frp_client["raw_cache"], filename)
+    f_enforce_raw_cache(frp_client["raw_cache"])
+
+    return results, pixels_aois
+
+
+def f_put(stage_queue, item, stop):
+    # Put an item in the queue of the next stage of the pipeline, waiting while it is full (backpressure).
+    # Return False if the pipeline is stopped meanwhile
+    while not stop.is_set():
+        try:
+            stage_queue.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def f_get(stage_queue, stop):
+    # Take the next item from the queue of the previous stage of the pipeline, waiting while it is empty.
+    # Return None if the pipeline is stopped meanwhile
+    while not stop.is_set():
+        try:
+            return stage_queue.get(timeout=0.5)
+        except queue.Empty:
+            pass
+    return None
+
+
+def f_download_stage(frp_client, timesteps, downloaded, stop):
+    # Download the timesteps in order and pass them to the next stage: (timestep, filename), or None at the end.
+    # An error is passed on as well, so that it is raised where the results are consumed
+    try:
+        for dt in timesteps:
+            filename, available = f_download_timestep(frp_client, dt)
+            if available and not f_put(downloaded, (dt, filename), stop):
+                return
+            if stop.is_set():
+                return
+        f_put(downloaded, None, stop)
+    except Exception as e:
+        f_put(downloaded, e, stop)
+
+
+def f_read_stage(frp_client, aois, pixels, downloaded, read, stop):
+    # Read the downloaded timesteps in order and pass their results to the next stage: (timestep, results, pixels),
+    # or None at the end. An error is passed on as well
+    try:
+        while True:
+            item = f_get(downloaded, stop)
+            if item is None or isinstance(item, Exception):
+                f_put(read, item, stop)
+                return
+            dt, filename = item
+            if not f_put(read, (dt, *f_read_timestep(frp_client, aois, dt, filename, pixels)), stop):
+                return
+    except Exception as e:
+        f_put(read, e, stop)
+
+
+def f_prefetch_timesteps(frp_client, aois, timesteps, pixels, prefetch=PREFETCH):
+    # Generator that gets the timesteps through a pipeline of three stages: the downloads and the reading of the
+    # products run in their own threads, and the results are yielded (e.g. to be saved and plotted) in this one.
+    # Every stage passes its timesteps to the next one through a queue of up to prefetch timesteps: a faster stage
+    # waits when the queue is full, so the pipeline runs at the speed of its slowest stage (not at the sum of all of
+    # them) without piling up products. The results are yielded in chronological order, as without the pipeline
+    print(f"         Running: {f_prefetch_timesteps.__name__}()")
+    print(f"          - Pipeline: download → read → save, with up to {prefetch} timesteps between stages")
+
+    stop = threading.Event()
+    downloaded = queue.Queue(maxsize=prefetch)
+    read = queue.Queue(maxsize=prefetch)
+
+    stages = [
+        threading.Thread(target=f_download_stage, args=(frp_client, timesteps, downloaded, stop), name="download", daemon=True),
+        threading.Thread(target=f_read_stage, args=(frp_client, aois, pixels, downloaded, read, stop), name="read", daemon=True),
+    ]
+    for stage in stages:
+        stage.start()
+
+    # Stop the stages when the results are not consumed any more (end, error, or the consumer stops)
+    try:
+        while True:
+            item = f_get(read, stop)
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+def f_iter_frp(frp_client, aois, start_time, end_time=None, pixels=False, **kwargs):
+    # Generator that yields the FRP of one area of interest (or of a list of them) at every timestep, as soon as
+    # its product is processed: one dictionary per area and timestep with its name, the acquisition time (UTC),
+    # the number of pixels, the sum of the FRP (MW) and, if pixels is True, the pixels ({column: array}).
+    # Any other option of f_iter_timesteps (e.g. backfill=True) can be given too
+    print(f"         Running: {f_iter_frp.__name__}()")
+
+    aois = [aois] if isinstance(aois, dict) else list(aois)
+
+    for acquisition_time, results, pixels_aois in f_iter_timesteps(frp_client, aois, start_time, end_time, pixels=pixels, **kwargs):
+        for name, (number_of_pixels, frp) in results.items():
+            yield {
+                "name": name,
+                "acquisition_time": acquisition_time,
+                "pixels": number_of_pixels,
+                "frp": frp,
+                "data": pixels_aois[name] if pixels_aois is not None else None,
+            }
+
+
+def f_get_frp_arrays(frp_client, aois, start_time, end_time, **kwargs):
+    """
+    Get the FRP of one area of interest (or of a list of them) for every timestep between
+    start_time and end_time (excluded) at once, as NumPy arrays. Any option of
+    f_iter_timesteps can be given (e.g. backfill=True, or workers=8 to read the products
+    already downloaded with a pool of processes).
+
+    Returns
+    -------
+    arrays : dict
+        Dictionary with the acquisition times (datetime64[s], UTC) of every timestep, whether
+        it was available (bool), and the number of pixels (int64, 0 if missing) and the sum of
+        the FRP (float64, MW, NaN if missing) of every area of interest ({name: array}).
+    """
+    print(f"         Running: {f_get_frp_arrays.__name__}()")
+
+    aois = [aois] if isinstance(aois, dict) else list(aois)
+
+    timesteps = f_define_the_timesteps(f_check_start_datetime(f_check_datetime(start_time)), f_check_datetime(end_time))
+    position = {dt: i for i, dt in enumerate(timesteps)}
+
+    arrays = {
+        "acquisition_time": np.array([dt.replace(tzinfo=None) for dt in timesteps], dtype="datetime64[s]"),
+        "available": np.zeros(len(timesteps), dtype=bool),
+        "pixels": {aoi["name"]: np.zeros(len(timesteps), dtype=np.int64) for aoi in aois},
+        "frp": {aoi["name"]: np.full(len(timesteps), np.nan) for aoi in aois},
+    }
+
+    for acquisition_time, results, _ in f_iter_timesteps(frp_client, aois, start_time, end_time, **kwargs):
+        i = position[acquisition_time]
+        arrays["available"][i] = True
+        for name, (number_of_pixels, frp) in results.items():
+            arrays["pixels"][name][i] = number_of_pixels
+            arrays["frp"][name][i] = frp
+
+    return arrays
     
     
 # %% DEFINE THE MAIN FUNCTION
 def main():
-    
+
+    # Show the banner (only when the script is run, not when it is imported)
+    print(__doc__)
+    print("RUN THE SCRIPT:")
+    print()
+
     # Get the arguments
     args = f_parser()
-    
-    # Define the bbox
-    lonlat_bbox = [args.west, args.south, args.east, args.north] # in decimal degrees
 
-    # Validate the coordinates
-    f_check_coordinates(lonlat_bbox)
+    # Measure the time to import the libraries of the headless path (if profile_startup is True) and exit
+    if args.profile_startup:
+        f_profile_startup()
+        return
+
+    # Download the tiles of the map of a region into the cache (if seed_tiles is defined) and exit
+    if args.seed_tiles is not None:
+        tile_cache = f_open_tile_cache(f_define_the_directories(), args.tile_cache_max_mb)
+        f_seed_tiles(tile_cache, args.seed_tiles, *args.seed_zooms)
+        return
+
+    # Add the products already downloaded to the gridded FRP cube (if build_cube is True) and exit
+    if args.build_cube:
+        directories = f_define_the_directories()
+        cube = f_open_cube(directories, args.cube_resolution)
+        f_build_cube(cube, directories, f_check_start_datetime(args.start), args.end, args.workers,
+                     f_open_columnar_cache(directories) if args.columnar_cache else None)
+        return
+
+    # Define how to warn when new data is available
+    notifier = f_define_the_notifier(args)
+    
+    # Define the areas of interest (bboxes in decimal degrees) and validate their coordinates.
+    # In daemon mode, they are read from the control file instead (and can change at runtime)
+    aois = f_define_the_aois(args) if not args.daemon else []
+    names = [aoi["name"] for aoi in aois]
     
     # Validate the start time
-    args.start = f_check_start_datetime(args.start)
-    
-    # Show the area defined by the bbox (if show_map is True)
-    if args.show_map:
-        f_show_the_bbox(lonlat_bbox)
-
-    # Define the directories
-    directories = f_define_the_directories()
-       
-    # Define the datetime (that will incrase by 10 min in every loop)
-    dt = args.start
-    
-    # Define the end datetime:
-    if args.end is not None: # If args.end was defined ...
-        dt_end = args.end # ... directly pass it
-        Infinite_loop = False # and create a boolean that will inform that there is an end datetime
-    else: # If it was not defined (i.e. its value is defult=None) ...
-        dt_end = dt + timedelta(minutes=10) # ... force it to be larger than dt (for the very first loop)
-        Infinite_loop = True # and create a boolean that will inform that there is no end datetime
+    if not args.daemon:
+        args.start = f_check_start_datetime(args.start)
+    
+    # Open everything needed to get the FRP (once for every timestep): the directories, the limits of the downloaded
+    # products (and the region to keep, if any), the session to the repository, the publication latencies observed
+    # in previous runs, and the listings of the repository, the metrics and the columnar cache (if they are True)
+    frp_client = f_open_frp_client(None, None, args.connect_timeout, args.read_timeout, args.waiting_time, notifier,
+                                   args.columnar_cache, args.listing, args.listing_ttl, args.metrics, args.metrics_dir,
+                                   args.raw_cache_max_mb, args.raw_cache_max_days, args.raw_region,
+                                   args.rate_limit, args.rate_burst, args.account_cooldown,
+                                   args.cube_resolution if args.cube else None)
+    f_check_region(frp_client["raw_cache"], aois)
+    directories = frp_client["directories"]
+    metrics = frp_client["metrics"]
+
+    # Show the area defined by the bbox (if show_map is True), without blocking. The tiles of the basemap are fetched
+    # by another thread (from the cache of tiles, or downloaded into it), and drawn between timesteps once they arrive
+    bbox_map = None
+    if args.show_map and aois:
+        tile_cache = f_open_tile_cache(directories, args.tile_cache_max_mb)
+        bbox_map = f_show_the_bbox([aoi["bbox"] for aoi in aois], tile_cache)
+
+    # Monitor the fires of the control file non-stop (if daemon is True), until it is stopped (Ctrl+C)
+    if args.daemon:
+        route_to_the_control_file = args.control_file or directories["Inputs"] / "Fires.csv"
+        f_update_the_map(bbox_map, TILE_WAIT)
+        try:
+            asyncio.run(f_daemon(route_to_the_control_file, directories, notifier, args.waiting_time,
+                                 frp_client["client"], frp_client["latency"], frp_client["cache"],
+                                 frp_client["raw_cache"], metrics, frp_client["listings"], frp_client["cube"]))
+        except KeyboardInterrupt:
+            print("          - Daemon stopped")
+        f_close_frp_client(frp_client)
+        print()
+        print("         Endscript")
+        return
+
+    # Open the stores of the results (one per area of interest) and find the timesteps already processed.
+    # A timestep is processed only if it is saved for every area of interest
+    stores = {name: f_open_store(directories["Outputs"], name) for name in names}
+    processed = set.intersection(*(f_processed_timesteps(store) for store in stores.values()))
+    f_find_gaps(processed, args.start)
+
+    # Prepare the statistics of the FRP (energy, rolling windows, peak) of every area of interest, since the start time
+    aggregators = {name: f_open_aggregator(store, args.start) for name, store in stores.items()}
+    
+    # Prepare the trackers of the fires (one per area of interest) (if track_fires is True)
+    trackers = {name: f_open_tracker() for name in names} if args.track_fires else {}
     
     # Prepare the figure
     if args.show_graph:
-        plt.ion()  # interactive mode
-        fig, ax = plt.subplots(figsize=(10, 5))
-        line, = ax.plot([], [], color="red")
+        fig, ax, lines = f_prepare_the_figure(names)
+        series = f_open_series(directories["Outputs"], names)
     else:
-        fig = ax = line = None
+        fig = ax = lines = series = None
     
-    # While current-time is older than end-time, keep iterating
-    # If no end-time is defined, it will always be larger than dt
-    while dt < dt_end:
-        print()
-        print(f"         ** Time step {dt}")
+    # Check the start-up time of headless runs
+    if not args.show_map and not args.show_graph:
+        f_report_startup()
 
-        # Define the filename of the FRP data and the link to access it
-        link_to_download_file, filename = f_define_the_filename(dt)
-    
-        # Request the FRP data to its repository in gitlab and save it (as an CSV compressed file).
-        # If the FRP is not yet available in the repository, this function launchs a scheduler that will wait and try again
-        f_call_to_lsasaf(link_to_download_file, filename, directories, args.beeper, args.waiting_time)
-        
-        # Read the CSV compressed file to get the FRP data inside the bbox
-        frp = f_get_frp(directories["Raw_data"], filename, lonlat_bbox)
-    
-        # Save the FRP data
-        f_save_frp(directories["Outputs"], args.name, dt, frp)
-               
-        # Plot the frp (if show_graph is True)
+    # Get the FRP of every timestep from the start time until the end time (or non-stop, if there is no end time),
+    # as soon as it is published. The past timesteps are downloaded first in parallel (if backfill is True), and the
+    # products already downloaded are read first with a pool of processes (if reprocess is True). The next timesteps
+    # are downloaded and read while the results of this one are saved and plotted (up to prefetch timesteps ahead)
+    time_timestep = time.perf_counter()
+    for dt, results, pixels in f_iter_timesteps(frp_client, aois, args.start, args.end, processed,
+                                                args.save_pixels or args.track_fires, args.backfill, args.max_workers,
+                                                args.workers if args.reprocess else None, args.prefetch):
+
+        # Save the FRP data (one store and one file per area of interest)
+        f_save_results(dt, results, pixels, stores, aggregators, trackers, args.save_pixels, series, metrics)
+           
+        # Plot the frp (if show_graph is True), and the basemap of the map once its tiles are there (if show_map is True)
         if args.show_graph:
-            fig, ax, line = f_plot_results(directories["Outputs"], args.name, fig, ax, line)
+            fig, ax, lines = f_plot_results(series, names, fig, ax, lines, metrics)
+        bbox_map = f_update_the_map(bbox_map)
 
-        # If it is a non-stop loop, add 20 min to end_time 
-        if Infinite_loop:
-            dt_end = dt + timedelta(minutes=20)
-        
-        # Add 10 min and go to the next loop in the while bucle
-        dt = dt + timedelta(minutes=10)
+        # Record the whole timestep: how long it took, and how late its results are (acquisition-to-saved latency)
+        if metrics is not None:
+            lag = (datetime.now(tz=timezone.utc) - dt).total_seconds()
+            f_record_metric(metrics, "timestep", time.perf_counter() - time_timestep, timestep=dt, lag_seconds=round(lag, 1))
+            f_update_metrics(metrics, counters={"timesteps_total": 1}, gauges={"lag_seconds": round(lag, 1)})
+            f_export_metrics(metrics)
+        time_timestep = time.perf_counter()
+
+    # Close the session to the repository (reporting the use of the columnar cache) and the stores of the results
+    # (with the statistics of the whole series)
+    f_close_frp_client(frp_client)
+    for name, store in stores.items():
+        f_flush_stats(aggregators[name])
+        f_close_store(store)
+
+    # Draw the basemap of the map, if its tiles have not arrived yet
+    f_update_the_map(bbox_map, TILE_WAIT)
 
     # Endscript
     print()